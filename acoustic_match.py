@@ -0,0 +1,420 @@
+import base64
+import numpy as np
+
+# Décalage maximal testé entre deux empreintes, en trames (une trame Chromaprint ≈ 0,124 s)
+MAX_OFFSET = 80
+# Nombre minimal de trames superposées pour qu'un taux d'erreur binaire soit significatif
+MIN_OVERLAP = 20
+# Trames alignées (au même décalage) partageant une clé, requises avant la vérification
+MIN_VOTES = 2
+# Clés de l'index : chaque sous-empreinte est indexée une fois par octet, cet octet masqué
+# (il porte le numéro de la bande) ; deux trames alignées partagent une clé dès que leurs
+# bits différents tiennent dans un seul octet, ce qui garde des candidats jusqu'à un taux
+# d'erreur binaire d'environ 0,18 (voir MIN_SUPPORTED_SIMILARITY)
+_BAND_MASKS = np.array([0xFFFFFFFF ^ (0xFF << (8 * k)) for k in range(4)], dtype=np.uint32)
+_BAND_IDS = np.array([k << (8 * k) for k in range(4)], dtype=np.uint32)
+# Votes générés à la fois lors de la recherche des paires (borne la mémoire de travail)
+VOTE_CHUNK = 1 << 20
+# Similarité la plus basse pour laquelle l'index retrouve (presque) toutes les paires
+# qu'une comparaison exhaustive trouverait ; en dessous, les paires proches du seuil
+# manquent de clés communes
+MIN_SUPPORTED_SIMILARITY = 0.82
+# Une valeur présente dans plus de fichiers que cela (silence, bruit) n'est pas indexée
+MAX_POSTING = 64
+# Trames indexées en début d'empreinte (~37 s) : borne la taille de l'index
+INDEX_FRAMES = 300
+
+_UINT8_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(values):
+    """Nombre total de bits à 1 d'un tableau uint32."""
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(values).sum())
+    return int(_UINT8_POPCOUNT[values.view(np.uint8)].sum())
+
+
+def _unpack(payload, width):
+    """Dépaquette des entiers de `width` bits rangés bit de poids faible en premier."""
+    bits = np.unpackbits(payload, bitorder="little")
+    count = len(bits) // width
+    bits = bits[:count * width].reshape(count, width).astype(np.int64)
+    values = bits[:, 0].copy()
+    for k in range(1, width):
+        values |= bits[:, k] << k
+    return values
+
+
+def decode_fingerprint(fingerprint):
+    """
+    Décode une empreinte Chromaprint compressée (base64, telle que renvoyée par fpcalc)
+    en tableau uint32 de sous-empreintes.
+
+    Format : 1 octet d'algorithme, 3 octets de nombre de sous-empreintes, puis pour chaque
+    sous-empreinte (XOR avec la précédente) les écarts entre ses bits à 1, codés sur 3 bits
+    et terminés par 0 ; un écart de 7 est complété par une valeur de 5 bits placée après.
+
+    Raises:
+        ValueError: si l'empreinte est tronquée ou n'est pas au format Chromaprint.
+    """
+    return decode_packed(pack_fingerprint(fingerprint))
+
+
+def pack_fingerprint(fingerprint):
+    """
+    Forme compacte d'une empreinte compressée : ses octets, sans l'encodage base64
+    (un tiers de moins que la chaîne, et plus petite que le tableau uint32 décodé).
+
+    Raises:
+        ValueError: si l'empreinte n'est pas du base64.
+    """
+    if isinstance(fingerprint, str):
+        fingerprint = fingerprint.encode("ascii")
+    try:
+        # validate : un caractère hors de l'alphabet base64 n'est pas ignoré silencieusement
+        return base64.b64decode(fingerprint + b"=" * (-len(fingerprint) % 4), altchars=b"-_", validate=True)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"empreinte illisible : {e}")
+
+
+def unpack_fingerprint(packed):
+    """Inverse de `pack_fingerprint` : la chaîne base64 telle que renvoyée par fpcalc."""
+    return base64.urlsafe_b64encode(packed).rstrip(b"=").decode("ascii")
+
+
+def decode_packed(data):
+    """Comme `decode_fingerprint`, pour une empreinte déjà passée par `pack_fingerprint`."""
+    if len(data) < 4:
+        raise ValueError("empreinte tronquée")
+    count = int.from_bytes(data[1:4], "big")
+    if count == 0:
+        return np.zeros(0, dtype=np.uint32)
+    payload = np.frombuffer(data, dtype=np.uint8, offset=4)
+
+    normal = _unpack(payload, 3)
+    ends = np.flatnonzero(normal == 0)
+    if len(ends) < count:
+        raise ValueError("empreinte tronquée")
+    normal = normal[:ends[count - 1] + 1]
+    escapes = np.flatnonzero(normal == 7)
+    if len(escapes):
+        exceptions = _unpack(payload[(len(normal) * 3 + 7) // 8:], 5)
+        if len(exceptions) < len(escapes):
+            raise ValueError("empreinte tronquée")
+        normal[escapes] += exceptions[:len(escapes)]
+
+    # Position absolue de chaque bit : somme des écarts depuis le début de sa sous-empreinte
+    item = np.concatenate(([0], np.cumsum(normal == 0)[:-1]))
+    total = np.cumsum(normal)
+    base = np.concatenate(([0], total[ends[:count - 1]]))
+    set_bits = np.flatnonzero(normal)
+    positions = total[set_bits] - base[item[set_bits]] - 1
+    if len(positions) and positions.max() > 31:
+        raise ValueError("sous-empreinte hors limites")
+    # Bits distincts au sein d'une sous-empreinte : la somme des puissances de 2 vaut leur OU
+    xored = np.bincount(item[set_bits], weights=np.ldexp(1.0, positions), minlength=count)
+    return np.bitwise_xor.accumulate(xored.astype(np.uint32))
+
+
+def bit_error_rate(a, b, offset=0):
+    """
+    Taux d'erreur binaire entre deux tableaux de sous-empreintes, `b` étant décalé de
+    `offset` trames (a[i] comparé à b[i + offset]). Renvoie None si la zone commune
+    compte moins de MIN_OVERLAP trames.
+    """
+    if offset >= 0:
+        a, b = a, b[offset:]
+    else:
+        a, b = a[-offset:], b
+    overlap = min(len(a), len(b))
+    if overlap < MIN_OVERLAP:
+        return None
+    return _popcount(a[:overlap] ^ b[:overlap]) / (32.0 * overlap)
+
+
+def best_similarity(a, b, offsets=None, max_offset=MAX_OFFSET):
+    """
+    Similarité (1 - taux d'erreur binaire) au meilleur des décalages testés.
+
+    Args:
+        offsets (iterable): Décalages à essayer ; par défaut tous ceux de
+                            [-max_offset, max_offset].
+    """
+    if offsets is None:
+        offsets = range(-max_offset, max_offset + 1)
+    best = 0.0
+    for offset in offsets:
+        ber = bit_error_rate(a, b, offset)
+        if ber is not None:
+            best = max(best, 1.0 - ber)
+    return best
+
+
+def _pack_or_none(fingerprint):
+    try:
+        return pack_fingerprint(fingerprint) if fingerprint else None
+    except ValueError:
+        return None
+
+
+def _decode_or_none(packed):
+    try:
+        return decode_packed(packed) if packed else None
+    except ValueError:
+        return None
+
+
+def _band_keys(values):
+    """
+    Clés de bandes (voir _BAND_MASKS) des sous-empreintes `values`, sans doublon, et la
+    première position de chacune.
+    """
+    keys = ((values[None, :] & _BAND_MASKS[:, None]) | _BAND_IDS[:, None]).ravel()
+    unique, first = np.unique(keys, return_index=True)
+    return unique, (first % len(values)).astype(np.int16)
+
+
+def _distinct_votes(i, j, positions, offsets):
+    """Votes (voir `_candidates`) triés par paire, décalage et trame, sans doublon."""
+    if not len(i):
+        return i, j, positions, offsets
+    order = np.lexsort((positions, offsets, j, i))
+    i, j, positions, offsets = i[order], j[order], positions[order], offsets[order]
+    new = np.concatenate(([True], (i[1:] != i[:-1]) | (j[1:] != j[:-1]) | (offsets[1:] != offsets[:-1])
+                          | (positions[1:] != positions[:-1])))
+    return i[new], j[new], positions[new], offsets[new]
+
+
+def _candidates(i, j, positions, offsets):
+    """
+    Paires à vérifier d'après leurs votes, et leur meilleur décalage.
+
+    Chaque vote est une clé commune : trame `positions` de i, trame positions + offsets de j.
+    Une trame alignée ne compte qu'une fois (plusieurs bandes peuvent concorder) ; le soutien
+    d'un décalage inclut les votes des décalages voisins. Les paires soutenues par au moins
+    MIN_VOTES trames sont retenues, au décalage le plus soutenu (le plus petit à égalité).
+
+    Returns:
+        tuple: Tableaux (i, j, décalage), triés par paire.
+    """
+    if not len(i):
+        return i, j, offsets
+    i, j, positions, offsets = _distinct_votes(i, j, positions, offsets)
+    new_pair = np.concatenate(([True], (i[1:] != i[:-1]) | (j[1:] != j[:-1])))
+    new_offset = new_pair | np.concatenate(([True], offsets[1:] != offsets[:-1]))
+    # Votes par (paire, décalage), en trames distinctes
+    starts = np.flatnonzero(new_offset)
+    counts = np.diff(np.append(starts, len(i)))
+    gi, gj, go = i[starts], j[starts], offsets[starts]
+    neighbour = (gi[1:] == gi[:-1]) & (gj[1:] == gj[:-1]) & (go[1:] == go[:-1] + 1)
+    support = counts.copy()
+    support[1:] += np.where(neighbour, counts[:-1], 0)
+    support[:-1] += np.where(neighbour, counts[1:], 0)
+    pair = np.cumsum(new_pair[starts]) - 1
+    best = np.lexsort((go, -support, pair))
+    first = best[np.concatenate(([True], pair[best][1:] != pair[best][:-1]))]
+    first = first[support[first] >= MIN_VOTES]
+    return gi[first], gj[first], go[first]
+
+
+class AcousticIndex:
+    """
+    Index inversé des valeurs de sous-empreintes, pour trouver les empreintes proches
+    sans les comparer toutes.
+
+    Deux encodages d'un même morceau ont des trames presque identiques, à un décalage
+    constant. Chaque empreinte est indexée par les clés de bandes (un octet masqué, voir
+    _BAND_MASKS) de ses INDEX_FRAMES premières trames, avec leur première position ; les
+    paires dont au moins MIN_VOTES trames partagent une clé au même décalage (à une trame
+    près) sont vérifiées par taux d'erreur binaire autour de ce décalage. Les paires sont
+    retrouvées jusqu'à MIN_SUPPORTED_SIMILARITY.
+
+    L'index se construit en lot (`add` puis `pairs`) et reste modifiable ensuite
+    (`add`, `remove`, `query`) : les ajouts récents forment un segment trié à part,
+    fusionné avec le segment principal quand il grossit.
+
+    Pour tenir des millions d'empreintes en mémoire, chacune est gardée sous forme
+    compacte (`pack_fingerprint`) et décodée seulement pour vérifier une paire ; les
+    entrées de l'index sont des uint32 (clé), int32 (propriétaire) et int16 (position).
+    """
+    def __init__(self):
+        self.packed = []        # {id: empreinte compacte (pack_fingerprint)}, None si retirée ou illisible
+        self._segments = []     # [(valeurs, propriétaires, positions)] triés par valeur
+        self._pending = []      # ajouts non encore triés
+        self._pending_size = 0
+
+    def add(self, fingerprint):
+        """
+        Indexe une empreinte compressée et retourne son identifiant.
+
+        Args:
+            fingerprint (str | bytes): Chaîne fpcalc, ou sa forme compacte (`pack_fingerprint`).
+        """
+        fp_id = len(self.packed)
+        packed = fingerprint if isinstance(fingerprint, bytes) else _pack_or_none(fingerprint)
+        values = _decode_or_none(packed)
+        self.packed.append(packed if values is not None else None)
+        if values is not None and len(values) >= MIN_OVERLAP:
+            keys, first = _band_keys(values[:INDEX_FRAMES])
+            self._pending.append((keys, np.full(len(keys), fp_id, dtype=np.int32), first))
+            self._pending_size += len(keys)
+        return fp_id
+
+    def remove(self, fp_id):
+        """Retire une empreinte (ses entrées sont ignorées puis purgées à la prochaine fusion)."""
+        self.packed[fp_id] = None
+
+    def _sorted(self):
+        """Trie les ajouts en attente ; fusionne tout quand le segment récent dépasse 1/8 du principal."""
+        if self._pending:
+            self._segments.append(self._sort_entries(self._pending))
+            self._pending = []
+            self._pending_size = 0
+            if len(self._segments) > 1 and len(self._segments[-1][0]) * 8 > len(self._segments[0][0]):
+                self._segments = [self._sort_entries(self._segments)]
+        return self._segments
+
+    def _sort_entries(self, parts):
+        keys = np.concatenate([p[0] for p in parts])
+        owners = np.concatenate([p[1] for p in parts])
+        positions = np.concatenate([p[2] for p in parts])
+        alive = np.array([packed is not None for packed in self.packed], dtype=bool)
+        keep = alive[owners]
+        if not keep.all():
+            keys, owners, positions = keys[keep], owners[keep], positions[keep]
+        order = np.argsort(keys, kind="stable")
+        return keys[order], owners[order], positions[order]
+
+    def _verify(self, i, j, offset, threshold, decoded):
+        for k in (i, j):
+            if k not in decoded:
+                decoded[k] = _decode_or_none(self.packed[k])
+        similarity = best_similarity(decoded[i], decoded[j], (offset - 1, offset, offset + 1))
+        return similarity if similarity >= threshold else None
+
+    def pairs(self, threshold=0.85):
+        """
+        Toutes les paires d'empreintes indexées dont la similarité atteint threshold.
+
+        Returns:
+            list: Tuples (i, j, similarité) avec i < j.
+        """
+        segments = self._sorted()
+        if len(segments) > 1:
+            segments = self._segments = [self._sort_entries(segments)]
+        if not segments or not len(segments[0][0]):
+            return []
+        keys, owners, positions = segments[0]
+        alive = np.array([packed is not None for packed in self.packed], dtype=bool)
+        keep = alive[owners]
+        if not keep.all():
+            keys, owners, positions = keys[keep], owners[keep], positions[keep]
+        if not len(keys):
+            return []
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        sizes = np.diff(np.append(starts, len(keys)))
+
+        # Votes : toutes les paires d'entrées de chaque clé, par tailles de liste égales et par
+        # lots d'au plus VOTE_CHUNK votes, réduits aussitôt aux trames alignées distinctes
+        selected = (sizes > 1) & (sizes <= MAX_POSTING)
+        votes = []
+        for size in np.unique(sizes[selected]).tolist():
+            x, y = np.triu_indices(size, 1)
+            runs = starts[selected & (sizes == size)]
+            step = max(1, VOTE_CHUNK // len(x))
+            for chunk in range(0, len(runs), step):
+                chunk_runs = runs[chunk:chunk + step, None]
+                first, second = (chunk_runs + x).ravel(), (chunk_runs + y).ravel()
+                owner_a, owner_b = owners[first], owners[second]
+                position_a, position_b = positions[first].astype(np.int32), positions[second].astype(np.int32)
+                swap = owner_a > owner_b
+                owner_i = np.where(swap, owner_b, owner_a)
+                owner_j = np.where(swap, owner_a, owner_b)
+                position_i = np.where(swap, position_b, position_a)
+                offsets = np.where(swap, position_a, position_b) - position_i
+                keep = (owner_i != owner_j) & (np.abs(offsets) <= MAX_OFFSET)
+                votes.append(_distinct_votes(owner_i[keep], owner_j[keep], position_i[keep], offsets[keep]))
+        if not votes:
+            return []
+
+        pairs = []
+        decoded = {}
+        for i, j, offset in zip(*(a.tolist() for a in _candidates(*(np.concatenate(v) for v in zip(*votes))))):
+            similarity = self._verify(i, j, offset, threshold, decoded)
+            if similarity is not None:
+                pairs.append((i, j, similarity))
+        return pairs
+
+    def query(self, fp_id, threshold=0.85):
+        """
+        Empreintes indexées proches de l'empreinte `fp_id` (elle-même exclue).
+
+        Returns:
+            list: Tuples (autre identifiant, similarité).
+        """
+        return self._matches(_decode_or_none(self.packed[fp_id]), fp_id, threshold)
+
+    def match(self, fingerprint, threshold=0.85):
+        """
+        Empreintes indexées proches d'une empreinte qui ne l'est pas (chaîne fpcalc ou
+        forme compacte), sans l'ajouter à l'index.
+
+        Returns:
+            list: Tuples (identifiant, similarité).
+        """
+        packed = fingerprint if isinstance(fingerprint, bytes) else _pack_or_none(fingerprint)
+        return self._matches(_decode_or_none(packed), -1, threshold)
+
+    def _matches(self, values, fp_id, threshold):
+        """Empreintes indexées proches des sous-empreintes `values`, désignées par `fp_id` (exclu)."""
+        if values is None or len(values) < MIN_OVERLAP:
+            return []
+        keys, first = _band_keys(values)
+        alive = np.array([packed is not None for packed in self.packed], dtype=bool)
+        others, frames, offsets = [], [], []
+        for index_keys, owners, positions in self._sorted():
+            lo = np.searchsorted(index_keys, keys, side="left")
+            hi = np.searchsorted(index_keys, keys, side="right")
+            counts = hi - lo
+            counts[counts > MAX_POSTING] = 0
+            total = int(counts.sum())
+            if not total:
+                continue
+            # Développer les intervalles [lo, hi) de chaque clé en indices d'entrées
+            run_starts = np.repeat(lo, counts)
+            within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            entries = run_starts + within
+            others.append(owners[entries])
+            frames.append(np.repeat(first, counts).astype(np.int32))
+            offsets.append(positions[entries].astype(np.int32) - frames[-1])
+        if not others:
+            return []
+        others, frames, offsets = np.concatenate(others), np.concatenate(frames), np.concatenate(offsets)
+        keep = (others != fp_id) & alive[others] & (np.abs(offsets) <= MAX_OFFSET)
+        others, frames, offsets = others[keep], frames[keep], offsets[keep]
+        matches = []
+        decoded = {fp_id: values}
+        for _, other, offset in zip(*(a.tolist() for a in _candidates(np.full(len(others), fp_id, dtype=np.int32),
+                                                                      others, frames, offsets))):
+            similarity = self._verify(fp_id, other, offset, threshold, decoded)
+            if similarity is not None:
+                matches.append((other, similarity))
+        return matches
+
+
+def find_similar_pairs(fingerprints, threshold=0.85):
+    """
+    Trouve les paires d'empreintes acoustiquement proches (voir `AcousticIndex`).
+
+    Args:
+        fingerprints (list): Empreintes compressées (chaînes fpcalc, ou leur forme compacte
+                             `pack_fingerprint`) ; celles qui ne se décodent pas sont ignorées.
+        threshold (float): Similarité minimale (1 - taux d'erreur binaire), entre 0 et 1.
+
+    Returns:
+        list: Tuples (i, j, similarité) avec i < j, indices dans `fingerprints`.
+    """
+    index = AcousticIndex()
+    for fp in fingerprints:
+        index.add(fp)
+    return index.pairs(threshold)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Remplaçant déterministe de fpcalc pour les benchmarks : aucun décodage audio.
+
+Les fichiers de `synthetic_library` contiennent dans leurs données audio un marqueur
+`SYNTHAUDIO seed=<n> variant=<n> duration=<s>` ; l'empreinte (format Chromaprint
+compressé, comme fpcalc) est tirée de `seed`, et une `variant` non nulle y inverse
+quelques pour cent des bits (réencodage). Les copies exactes ou retaguées ont donc
+la même empreinte, les réencodages une empreinte proche.
+
+Même ligne de commande et même sortie que fpcalc (`-length`, `-json`, plusieurs
+fichiers). La variable d'environnement FAKE_FPCALC_LATENCY (secondes) ajoute une
+latence par fichier, pour simuler le coût du décodage : elle vaut pour 120 s
+décodées et suit la durée réellement décodée (`-length`, ou le fichier s'il est
+plus court).
+"""
+import os
+import re
+import sys
+import json
+import time
+import base64
+import random
+
+MARKER = re.compile(rb"SYNTHAUDIO seed=(\d+) variant=(\d+) duration=(\d+)")
+# Sous-empreintes par seconde d'audio (Chromaprint : ~7,8)
+FRAMES_PER_SECOND = 7.8
+# Durée décodée (s) à laquelle correspond FAKE_FPCALC_LATENCY
+LATENCY_REFERENCE_SECONDS = 120
+# Probabilité d'inversion de chaque bit pour une variante (réencodage)
+VARIANT_BIT_ERROR = 0.04
+
+
+def _pack(values, width):
+    acc = n = 0
+    out = bytearray()
+    for v in values:
+        acc |= v << n
+        n += width
+        while n >= 8:
+            out.append(acc & 255)
+            acc >>= 8
+            n -= 8
+    if n:
+        out.append(acc & 255)
+    return bytes(out)
+
+
+def encode_fingerprint(values, algorithm=1):
+    """Encode des sous-empreintes uint32 au format compressé de Chromaprint (base64 url-safe)."""
+    gaps = []
+    previous = 0
+    for v in values:
+        x = v ^ previous
+        previous = v
+        bit = 1
+        last = 0
+        while x:
+            if x & 1:
+                gaps.append(bit - last)
+                last = bit
+            x >>= 1
+            bit += 1
+        gaps.append(0)
+    header = bytes([algorithm]) + len(values).to_bytes(3, "big")
+    payload = _pack([min(g, 7) for g in gaps], 3) + _pack([g - 7 for g in gaps if g >= 7], 5)
+    return base64.urlsafe_b64encode(header + payload).decode("ascii").rstrip("=")
+
+
+def fingerprint_values(seed, variant, duration, length):
+    count = max(1, int(min(duration, length) * FRAMES_PER_SECOND))
+    rng = random.Random(seed)
+    values = [rng.getrandbits(32) for _ in range(count)]
+    if variant:
+        noise = random.Random(seed * 1000003 + variant)
+        shift = noise.randint(0, 8)
+        values = values[shift:] or values
+        for k in range(len(values)):
+            mask = 0
+            for b in range(32):
+                if noise.random() < VARIANT_BIT_ERROR:
+                    mask |= 1 << b
+            values[k] ^= mask
+    return values
+
+
+def main(argv):
+    length = 120
+    as_json = False
+    files = []
+    k = 0
+    while k < len(argv):
+        arg = argv[k]
+        if arg == "-length":
+            length = int(argv[k + 1])
+            k += 2
+            continue
+        if arg == "-json":
+            as_json = True
+        elif not arg.startswith("-"):
+            files.append(arg)
+        k += 1
+    latency = float(os.environ.get("FAKE_FPCALC_LATENCY", "0") or 0)
+    status = 0
+    for path in files:
+        try:
+            with open(path, "rb") as f:
+                match = MARKER.search(f.read())
+        except OSError:
+            match = None
+        if match is None:
+            sys.stderr.write(f"ERROR: Could not open the input file ({path})\n")
+            status = 2
+            continue
+        seed, variant, duration = (int(g) for g in match.groups())
+        if latency:
+            time.sleep(latency * min(duration, length) / LATENCY_REFERENCE_SECONDS)
+        fingerprint = encode_fingerprint(fingerprint_values(seed, variant, duration, length))
+        if as_json:
+            print(json.dumps({"duration": float(duration), "fingerprint": fingerprint}))
+        else:
+            if len(files) > 1:
+                print(f"FILE={path}")
+            print(f"DURATION={duration}\nFINGERPRINT={fingerprint}")
+            if len(files) > 1:
+                print()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,206 @@
+"""
+Benchmark de la lecture anticipée des étapes d'E/S du scan (`storage_devices.ReadAhead`).
+
+Les mêmes fichiers sont lus à froid (pages retirées du cache par POSIX_FADV_DONTNEED)
+par une étape d'E/S du pipeline, comme pendant le scan, dans trois modes :
+- none : sans lecture anticipée ;
+- reopen : lecture anticipée par une ouverture à part du fichier (deux ouvertures par fichier) ;
+- handoff : `ReadAhead`, dont l'étape reprend le descripteur (une ouverture par fichier).
+
+Chaque mode est mesuré `--repeat` fois, en alternance ; la médiane est retenue. Sans
+`--root`, des fichiers aléatoires de `--file-size` Mo sont créés dans le dossier de
+travail. `--open-latency` ajoute un délai à chaque ouverture, pour simuler l'aller-retour
+d'un partage réseau ; `--concurrency` remplace la limite de lectures simultanées du
+périphérique (1 : disque rotatif).
+
+    python benchmarks/run_prefetch_benchmark.py --files 300 --file-size 4 --stage full
+    python benchmarks/run_prefetch_benchmark.py --root /mnt/nas/musique --stage metadata --open-latency 0.002
+
+Le code de sortie vaut 1 si `handoff` est plus lent que `none`.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import datetime
+import tempfile
+import functools
+import statistics
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+import scanner  # noqa: E402
+import scan_pipeline  # noqa: E402
+from storage_devices import ReadAhead, device_of, device_kind  # noqa: E402
+
+MODES = ("none", "reopen", "handoff")
+# Octets lus à l'avance par étape, comme dans `scanner.scan_duplicates`
+STAGE_READ_AHEAD = {"sample": scanner.SAMPLE_SIZE, "full": 0, "metadata": scanner.METADATA_READ_AHEAD}
+
+_real_open = os.open
+
+
+class OpenCounter:
+    """Remplace `os.open` : compte les ouvertures et ajoute la latence simulée."""
+    def __init__(self, latency):
+        self.latency = latency
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return _real_open(*args, **kwargs)
+
+
+def make_files(folder, count, size_mb):
+    """Fichiers aléatoires réutilisés d'une exécution à l'autre."""
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    block = os.urandom(1024 * 1024)
+    for k in range(count):
+        path = os.path.join(folder, f"{k:06d}.bin")
+        if not os.path.exists(path) or os.path.getsize(path) != int(size_mb * 1024 * 1024):
+            with open(path, "wb") as f:
+                remaining = int(size_mb * 1024 * 1024)
+                while remaining:
+                    chunk = block[:min(remaining, len(block))]
+                    f.write(chunk)
+                    remaining -= len(chunk)
+        paths.append(path)
+    return paths
+
+
+def audio_files(root, executor):
+    return [path for path, _ in scanner.iter_audio_files([root], scanner.SUPPORTED_EXTENSIONS, executor)]
+
+
+def evict(paths):
+    """Retire les fichiers du cache de pages : chaque mesure part d'un cache froid."""
+    for path in paths:
+        fd = _real_open(path, os.O_RDONLY)
+        try:
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def reopen_prefetch(length):
+    """Ancienne lecture anticipée : ouverture à part, conseil au noyau, fermeture."""
+    def prefetch(path):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.posix_fadvise(fd, 0, length, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    return prefetch
+
+
+def run_stage(pipeline, stage_name, paths, stats, mode, counter):
+    ahead = ReadAhead(STAGE_READ_AHEAD[stage_name])
+    fn = {"sample": scanner.file_sample_hash, "full": scanner.file_sha1, "metadata": scanner.read_metadata}[stage_name]
+    prefetch = None
+    if mode == "reopen":
+        advise = reopen_prefetch(STAGE_READ_AHEAD[stage_name])
+        prefetch = lambda i: advise(paths[i])  # noqa: E731
+    elif mode == "handoff":
+        prefetch = lambda i: ahead(paths[i])  # noqa: E731
+    stage = pipeline.io_stage(stage_name, functools.partial(fn, read_ahead=ahead),
+                              device_of=lambda i: device_of(paths[i], stats[i]), prefetch=prefetch)
+    items = {}
+    for i, path in enumerate(paths):
+        args = (path, stats[i].st_size) if stage_name == "sample" else (path,)
+        items.setdefault(device_of(path, stats[i]), []).append((stage_name, i, args))
+    failures = []
+
+    def route(name, key, result):
+        if isinstance(result, BaseException) or result is None:
+            failures.append(paths[key])
+        return []
+
+    evict(paths)
+    counter.count = 0
+    started = time.perf_counter()
+    try:
+        pipeline.run(items, {stage_name: stage}, route)
+    finally:
+        ahead.close()
+    seconds = time.perf_counter() - started
+    return seconds, counter.count, len(failures)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la lecture anticipée des étapes d'E/S du scan.")
+    parser.add_argument("--root", help="dossier de fichiers audio à lire (défaut : fichiers aléatoires générés)")
+    parser.add_argument("--files", type=int, default=300, help="nombre de fichiers générés (défaut : 300)")
+    parser.add_argument("--file-size", type=float, default=4, help="taille des fichiers générés, en Mo (défaut : 4)")
+    parser.add_argument("--stage", choices=sorted(STAGE_READ_AHEAD), default="full",
+                        help="étape mesurée (défaut : full ; metadata demande des fichiers audio, voir --root)")
+    parser.add_argument("--repeat", type=int, default=3, help="mesures par mode (défaut : 3)")
+    parser.add_argument("--open-latency", type=float, default=0.0,
+                        help="délai simulé de chaque ouverture de fichier, en secondes")
+    parser.add_argument("--concurrency", type=int,
+                        help="lectures simultanées par périphérique (défaut : celle du périphérique détecté)")
+    parser.add_argument("--io-workers", type=int)
+    parser.add_argument("--workdir", help="dossier de travail conservé entre les exécutions (défaut : temporaire)")
+    args = parser.parse_args(argv)
+    if not hasattr(os, "posix_fadvise"):
+        print("posix_fadvise indisponible : la lecture anticipée est sans effet sur ce système.", file=sys.stderr)
+        return 0
+
+    if args.concurrency:
+        scan_pipeline.io_limit = lambda device: args.concurrency
+    pipeline = scan_pipeline.get_pipeline(args.io_workers, 1)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="prefetch-bench-")
+    if args.root:
+        paths = audio_files(args.root, pipeline.io_executor)
+    elif args.stage == "metadata":
+        parser.error("--stage metadata demande --root (dossier de fichiers audio)")
+    else:
+        paths = make_files(os.path.join(workdir, "files"), args.files, args.file_size)
+    stats = [os.stat(path) for path in paths]
+    devices = sorted({device_kind(device_of(path, stat)) for path, stat in zip(paths, stats)})
+    counter = OpenCounter(args.open_latency)
+    os.open = counter
+    measures = {mode: [] for mode in MODES}
+    try:
+        for _ in range(args.repeat):
+            for mode in MODES:
+                measures[mode].append(run_stage(pipeline, args.stage, paths, stats, mode, counter))
+    finally:
+        os.open = _real_open
+
+    megabytes = sum(stat.st_size for stat in stats) / 1e6
+    results = {
+        "meta": {
+            "files": len(paths), "megabytes": round(megabytes, 1), "stage": args.stage, "devices": devices,
+            "open_latency": args.open_latency, "concurrency": args.concurrency, "repeat": args.repeat,
+            "io_workers": pipeline.io_workers, "python": platform.python_version(), "platform": platform.platform(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        },
+        "modes": {},
+    }
+    for mode, runs in measures.items():
+        seconds = statistics.median(run[0] for run in runs)
+        results["modes"][mode] = {
+            "seconds": round(seconds, 4), "files_per_sec": round(len(paths) / seconds, 1),
+            "opens_per_file": round(runs[-1][1] / len(paths), 2), "failures": runs[-1][2],
+        }
+        print(f"{mode}: {seconds:.3f} s, {len(paths) / seconds:.0f} fichiers/s, "
+              f"{runs[-1][1] / len(paths):.2f} ouverture(s) par fichier", file=sys.stderr)
+    print(json.dumps(results, indent=2))
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 1 if results["modes"]["handoff"]["seconds"] > results["modes"]["none"]["seconds"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
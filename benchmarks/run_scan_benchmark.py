@@ -0,0 +1,193 @@
+"""
+Benchmark de bout en bout de `scanner.scan_duplicates` sur une bibliothèque synthétique.
+
+Chaque exécution relève le rapport du scan (`scan_stats` : temps par étape, travail
+des workers, taux de succès des caches, échecs), mesure le débit et vérifie que les
+doublons attendus (manifeste de `synthetic_library`) sont bien regroupés. Le scan
+« cold » part d'un index vide, le scan « warm » réutilise l'index du précédent.
+
+    python benchmarks/run_scan_benchmark.py --size 10000 --latency 0.01 --baseline base.json
+    python benchmarks/run_scan_benchmark.py --size 10000 --latency 0.01 --compare base.json
+
+Avec --compare, le code de sortie vaut 1 si une étape est plus lente que la
+référence au-delà de la tolérance, ou si le rappel d'un type de doublon baisse.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import datetime
+import tempfile
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+import scanner  # noqa: E402
+from synthetic_library import load_or_generate  # noqa: E402
+
+# Écart absolu (s) en dessous duquel une étape n'est jamais signalée comme régression
+MIN_REGRESSION_SECONDS = 0.05
+
+
+class CollectingQueue:
+    """File de messages conservés, à la place de celle de l'interface."""
+    def __init__(self):
+        self.messages = []
+
+    def put(self, message):
+        self.messages.append(message)
+
+
+def make_fpcalc_launcher(workdir):
+    """Exécutable appelant fake_fpcalc.py avec l'interpréteur courant (le scanner lance fpcalc directement)."""
+    script = os.path.join(BENCHMARK_DIR, "fake_fpcalc.py")
+    if os.name == "nt":
+        path = os.path.join(workdir, "fpcalc.cmd")
+        with open(path, "w") as f:
+            f.write(f'@"{sys.executable}" "{script}" %*\n')
+    else:
+        path = os.path.join(workdir, "fpcalc")
+        with open(path, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+        os.chmod(path, 0o755)
+    return path
+
+
+def recall(results, expected):
+    """Part des groupes attendus dont tous les fichiers sont dans un même groupe trouvé, par type."""
+    group_of = {}
+    for k, group in enumerate(results):
+        for f in group:
+            group_of[f["path"]] = k
+    scores = {}
+    for kind, groups in expected.items():
+        found = sum(1 for paths in groups
+                    if group_of.get(paths[0]) is not None
+                    and all(group_of.get(p) == group_of[paths[0]] for p in paths))
+        scores[kind] = round(found / len(groups), 4) if groups else None
+    return scores
+
+
+def run_scan(library, manifest, index_path, args):
+    queue = CollectingQueue()
+    started = time.perf_counter()
+    scanner.scan_duplicates([library], "modification", queue, args.title_threshold, index_path=index_path,
+                            io_workers=args.io_workers, cpu_workers=args.cpu_workers,
+                            acoustic_similarity_threshold=args.acoustic_threshold,
+                            tag_write_policy=args.tag_write, fingerprint_backend=args.backend,
+                            short_fingerprint_length=args.short_length)
+    total = round(time.perf_counter() - started, 4)
+    errors = [data[1] for msg_type, data in queue.messages if msg_type == "message" and data[0] == "error"]
+    if errors:
+        raise RuntimeError(errors[0])
+    results = next((data for msg_type, data in reversed(queue.messages) if msg_type == "results"), [])
+    report = next(data for msg_type, data in queue.messages if msg_type == "scan_stats")
+    return {
+        "total": total,
+        "stages": report["phases"],
+        "files": manifest["size"],
+        "files_per_sec": round(manifest["size"] / total, 1) if total else None,
+        "groups": len(results),
+        "recall": recall(results, manifest["expected"]),
+        "report": report,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Liste des régressions de `current` par rapport à `baseline`."""
+    regressions = []
+    for name, run in current["runs"].items():
+        reference = baseline.get("runs", {}).get(name)
+        if reference is None:
+            continue
+        timings = dict(run["stages"], total=run["total"])
+        reference_timings = dict(reference["stages"], total=reference["total"])
+        for stage, seconds in timings.items():
+            before = reference_timings.get(stage)
+            if before is not None and seconds > before * (1 + tolerance) and seconds - before > MIN_REGRESSION_SECONDS:
+                regressions.append(f"{name}/{stage}: {before:.3f} s -> {seconds:.3f} s")
+        for kind, score in run["recall"].items():
+            before = reference["recall"].get(kind)
+            if score is not None and before is not None and score < before:
+                regressions.append(f"{name}/rappel {kind}: {before} -> {score}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark du scan de doublons sur une bibliothèque synthétique.")
+    parser.add_argument("--size", type=int, default=1000, help="nombre de fichiers (1000 à 1000000, défaut : 1000)")
+    parser.add_argument("--seed", type=int, default=0, help="graine de la bibliothèque (défaut : 0)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="latence simulée de fpcalc pour 120 s décodées, en secondes")
+    parser.add_argument("--workdir", help="dossier de travail conservé entre les exécutions (défaut : temporaire)")
+    parser.add_argument("--runs", default="cold,warm", help="exécutions : cold (index vide), warm (index réutilisé)")
+    parser.add_argument("--tag-write", choices=scanner.TAG_WRITE_POLICIES, default=scanner.TAG_WRITE_OFF,
+                        help="politique d'écriture des tags (défaut : off, la bibliothèque reste intacte)")
+    parser.add_argument("--backend", choices=scanner.FINGERPRINT_BACKENDS, default="fpcalc",
+                        help="moteur d'empreinte (défaut : fpcalc ; seul fake_fpcalc.py reconnaît les doublons "
+                             "de la bibliothèque synthétique, libchromaprint calcule l'empreinte de son contenu)")
+    parser.add_argument("--short-length", type=int, default=scanner.SHORT_FINGERPRINT_LENGTH,
+                        help="secondes de la passe courte de l'empreinte (0 : une seule passe complète)")
+    parser.add_argument("--title-threshold", type=float, default=0.8)
+    parser.add_argument("--acoustic-threshold", type=float, default=0.85)
+    parser.add_argument("--io-workers", type=int)
+    parser.add_argument("--cpu-workers", type=int)
+    parser.add_argument("--baseline", help="écrire les résultats dans ce fichier JSON de référence")
+    parser.add_argument("--compare", help="comparer les résultats à ce fichier JSON de référence")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="ralentissement toléré (défaut : 0.2 = 20 %%)")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="scan-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    library = os.path.join(workdir, f"library-{args.size}-{args.seed}")
+    if args.tag_write != scanner.TAG_WRITE_OFF:
+        shutil.rmtree(library, ignore_errors=True)  # les tags écrits fausseraient le scan suivant
+    generated = time.perf_counter()
+    manifest = load_or_generate(library, args.size, args.seed)
+    print(f"Bibliothèque : {manifest['size']} fichiers ({time.perf_counter() - generated:.1f} s)", file=sys.stderr)
+
+    # Les workers du pipeline héritent de l'environnement à leur création
+    os.environ["FAKE_FPCALC_LATENCY"] = str(args.latency)
+    scanner.FPCALC_PATH = make_fpcalc_launcher(workdir)
+    index_path = os.path.join(workdir, "fingerprint_index.sqlite3")
+    results = {
+        "meta": {
+            "size": manifest["size"], "seed": args.seed, "latency": args.latency, "tag_write": args.tag_write,
+            "backend": args.backend, "short_length": args.short_length,
+            "io_workers": args.io_workers, "cpu_workers": args.cpu_workers, "cpu_count": os.cpu_count(),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        },
+        "runs": {},
+    }
+    for name in [r.strip() for r in args.runs.split(",") if r.strip()]:
+        if name == "cold":
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(index_path + suffix):
+                    os.remove(index_path + suffix)
+        run = results["runs"][name] = run_scan(library, manifest, index_path, args)
+        stages = ", ".join(f"{stage} {seconds:.2f} s" for stage, seconds in run["stages"].items())
+        print(f"{name}: {run['total']:.2f} s, {run['files_per_sec']} fichiers/s ({stages}) ; "
+              f"rappel {run['recall']}", file=sys.stderr)
+
+    print(json.dumps(results, indent=2))
+    if args.baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"RÉGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
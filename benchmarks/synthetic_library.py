@@ -0,0 +1,189 @@
+"""
+Génère une bibliothèque synthétique de fichiers taggués (WAV, FLAC, MP3) pour les benchmarks.
+
+Les fichiers sont écrits octet par octet (en-têtes valides pour mutagen, quelques
+centaines d'octets chacun) : un million de fichiers tient en ~1 Go et se génère en
+quelques minutes. Leurs données audio ne contiennent qu'un marqueur lu par
+`fake_fpcalc.py`, qui en tire une empreinte déterministe.
+
+La bibliothèque mélange des originaux et, parmi eux :
+- des copies exactes (mêmes octets, autre dossier) ;
+- des copies retaguées (même audio, tags différents) ;
+- des réencodages (empreinte proche, autre format) ;
+- des quasi-doublons par titre (titre proche, audio différent).
+
+`manifest.json`, à la racine, liste les groupes attendus par type.
+
+Usage : python benchmarks/synthetic_library.py DOSSIER --size 10000 [--seed 0]
+"""
+import os
+import sys
+import json
+import random
+import struct
+import argparse
+
+MANIFEST_NAME = "manifest.json"
+# Fichiers par dossier (artiste/album)
+FILES_PER_FOLDER = 200
+# Part de chaque type de doublon dans la bibliothèque
+DUPLICATE_MIX = {"exact": 0.04, "retag": 0.03, "reencode": 0.02, "title": 0.03}
+FORMATS = ("mp3", "flac", "wav")
+
+_SYLLABLES = [c + v for c in "bcdfghjklmnprstvz" for v in "aeiou"]
+
+
+def _word(rng):
+    return "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def _title(rng):
+    return " ".join(_word(rng) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def _marker(seed, variant, duration):
+    return f"SYNTHAUDIO seed={seed} variant={variant} duration={duration}".encode("ascii")
+
+
+def _synchsafe(n):
+    return bytes([(n >> 21) & 0x7F, (n >> 14) & 0x7F, (n >> 7) & 0x7F, n & 0x7F])
+
+
+def _id3v24(tags):
+    frames = b""
+    for frame_id, key in (("TIT2", "title"), ("TPE1", "artist"), ("TALB", "album")):
+        data = b"\x03" + tags[key].encode("utf-8")  # encodage 3 = UTF-8
+        frames += frame_id.encode("ascii") + _synchsafe(len(data)) + b"\x00\x00" + data
+    return b"ID3\x04\x00\x00" + _synchsafe(len(frames)) + frames
+
+
+def _mp3(tags, marker, duration):
+    # MPEG-1 Layer III, 128 kb/s, 44,1 kHz, stéréo : trames de 417 octets
+    header = b"\xff\xfb\x90\x00"
+    frame_size = 417
+    frames = int(duration * 44100 / 1152)
+    # Première trame : en-tête Xing (nombre de trames) pour que mutagen connaisse la durée
+    xing = header + b"\x00" * 32 + b"Xing" + struct.pack(">II", 1, frames)
+    audio = xing.ljust(frame_size, b"\x00")
+    audio += (header + marker).ljust(frame_size, b"\x00")
+    audio += (header + b"\x00" * (frame_size - 4)) * 2
+    return _id3v24(tags) + audio
+
+
+def _flac(tags, marker, duration):
+    sample_rate, channels, bits = 44100, 2, 16
+    samples = duration * sample_rate
+    info = struct.pack(">HH", 4096, 4096) + b"\x00" * 6
+    packed = (sample_rate << 44) | ((channels - 1) << 41) | ((bits - 1) << 36) | samples
+    info += packed.to_bytes(8, "big") + b"\x00" * 16
+    vendor = b"synthetic"
+    comments = [f"TITLE={tags['title']}", f"ARTIST={tags['artist']}", f"ALBUM={tags['album']}"]
+    vorbis = struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", len(comments))
+    for comment in comments:
+        data = comment.encode("utf-8")
+        vorbis += struct.pack("<I", len(data)) + data
+    blocks = bytes([0]) + len(info).to_bytes(3, "big") + info
+    blocks += bytes([0x80 | 4]) + len(vorbis).to_bytes(3, "big") + vorbis  # dernier bloc
+    return b"fLaC" + blocks + b"\xff\xf8" + marker
+
+
+def _wav(tags, marker, duration):
+    # PCM 8 kHz mono 8 bits ; seules quelques secondes sont écrites (la durée vient de fpcalc)
+    fmt = struct.pack("<HHIIHH", 1, 1, 8000, 8000, 1, 8)
+    data = marker.ljust(8000, b"\x80")
+    id3 = _id3v24(tags)
+    if len(id3) % 2:
+        id3 += b"\x00"
+    chunks = (b"fmt " + struct.pack("<I", len(fmt)) + fmt
+              + b"data" + struct.pack("<I", len(data)) + data
+              + b"id3 " + struct.pack("<I", len(id3)) + id3)
+    return b"RIFF" + struct.pack("<I", 4 + len(chunks)) + b"WAVE" + chunks
+
+
+_WRITERS = {"mp3": _mp3, "flac": _flac, "wav": _wav}
+
+
+def generate_library(root, size, seed=0):
+    """
+    Écrit `size` fichiers sous `root` et retourne le manifeste.
+
+    Returns:
+        dict: {"size", "seed", "expected": {type: [[chemins d'un groupe attendu], ...]}}
+    """
+    rng = random.Random(seed)
+    counts = {kind: int(size * share) for kind, share in DUPLICATE_MIX.items()}
+    originals = max(1, size - sum(counts.values()))
+    written = []
+    expected = {kind: [] for kind in DUPLICATE_MIX}
+
+    def write(index, fmt, tags, seed_, variant, duration):
+        folder = os.path.join(root, f"artist_{index // (FILES_PER_FOLDER * 10):04d}",
+                              f"album_{index // FILES_PER_FOLDER:05d}")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{index:07d} {tags['title'][:40]}.{fmt}")
+        with open(path, "wb") as f:
+            f.write(_WRITERS[fmt](tags, _marker(seed_, variant, duration), duration))
+        written.append((path, fmt, tags, seed_, variant, duration))
+        return path
+
+    for k in range(originals):
+        tags = {"title": _title(rng), "artist": _title(rng), "album": _title(rng)}
+        write(k, rng.choice(FORMATS), tags, seed * 10_000_000 + k, 0, rng.randint(90, 420))
+
+    index = originals
+    for kind, count in counts.items():
+        for _ in range(count):
+            path, fmt, tags, seed_, _, duration = written[rng.randrange(originals)]
+            if kind == "exact":
+                with open(path, "rb") as f:
+                    content = f.read()
+                copy = write(index, fmt, tags, seed_, 0, duration)
+                with open(copy, "wb") as f:
+                    f.write(content)
+            elif kind == "retag":
+                copy = write(index, fmt, dict(tags, album=tags["album"] + " (Remaster)"), seed_, 0, duration)
+            elif kind == "reencode":
+                other = rng.choice([f for f in FORMATS if f != fmt])
+                copy = write(index, other, tags, seed_, rng.randint(1, 1000), duration)
+            else:
+                copy = write(index, fmt, dict(tags, title=tags["title"] + " (Live)"),
+                             seed_ + 5_000_000, 0, duration + rng.randint(-5, 5))
+            expected[kind].append([path, copy])
+            index += 1
+
+    manifest = {"size": index, "seed": seed, "expected": expected}
+    with open(os.path.join(root, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def load_or_generate(root, size, seed=0):
+    """Réutilise la bibliothèque de `root` si elle a été générée avec les mêmes paramètres."""
+    try:
+        with open(os.path.join(root, MANIFEST_NAME), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("seed") == seed and manifest.get("requested_size") == size:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    manifest = generate_library(root, size, seed)
+    manifest["requested_size"] = size
+    with open(os.path.join(root, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère une bibliothèque musicale synthétique.")
+    parser.add_argument("root", help="dossier de destination")
+    parser.add_argument("--size", type=int, default=1000, help="nombre de fichiers (défaut : 1000)")
+    parser.add_argument("--seed", type=int, default=0, help="graine du générateur (défaut : 0)")
+    args = parser.parse_args(argv)
+    manifest = load_or_generate(args.root, args.size, args.seed)
+    kinds = ", ".join(f"{len(groups)} {kind}" for kind, groups in manifest["expected"].items())
+    print(f"{manifest['size']} fichiers dans {args.root} (doublons attendus : {kinds})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
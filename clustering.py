@@ -0,0 +1,84 @@
+# Sortes d'indices reliant deux fichiers dans un même groupe de doublons
+EVIDENCE_CONTENT_HASH = "content_hash"  # contenu identique (même SHA-1)
+EVIDENCE_FINGERPRINT = "fingerprint"    # empreintes Chromaprint identiques
+EVIDENCE_ACOUSTIC = "acoustic"          # empreintes acoustiquement proches
+EVIDENCE_TITLE = "title"                # titres nettoyés proches
+EVIDENCE_KINDS = (EVIDENCE_CONTENT_HASH, EVIDENCE_FINGERPRINT, EVIDENCE_ACOUSTIC, EVIDENCE_TITLE)
+# Indices faibles : ils rattachent des fichiers à un groupe, sans jamais fusionner deux groupes
+# établis par des indices forts (deux titres « Intro » ne font pas de deux albums un seul groupe)
+WEAK_EVIDENCE = frozenset((EVIDENCE_TITLE,))
+
+
+class DisjointSet:
+    """
+    Union-find sur les entiers 0..n-1 (union par taille, compression de chemin par moitié) :
+    une suite de m unions et recherches coûte O(m α(n)), quasi linéaire.
+    """
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        """Réunit les ensembles de a et b ; retourne le représentant commun."""
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return a
+
+
+def cluster(count, edges, weak=WEAK_EVIDENCE):
+    """
+    Regroupe des éléments reliés par des indices de toutes sortes.
+
+    Les liens forts sont appliqués d'abord, puis les liens faibles (`weak`) dans leur
+    ordre d'arrivée : un lien faible entre deux ensembles contenant chacun un lien fort
+    est ignoré. Le résultat ne dépend donc que des liens et de leur ordre.
+
+    Args:
+        count (int): Nombre d'éléments, désignés par leur indice 0..count-1.
+        edges (iterable): Liens (a, b, sorte) ; la sorte est l'une de EVIDENCE_KINDS
+                          (ou toute autre chaîne, pour une nouvelle source d'indices).
+        weak (set): Sortes d'indices faibles.
+
+    Returns:
+        list: (indices triés, {sorte: nombre de liens retenus}) par groupe d'au moins deux
+              éléments, dans l'ordre de leur plus petit indice.
+    """
+    sets = DisjointSet(count)
+    strong = bytearray(count)  # {représentant: 1 si l'ensemble contient un lien fort}
+    linked = []
+    weak_edges = []
+    for a, b, kind in edges:
+        if kind in weak:
+            weak_edges.append((a, b, kind))
+            continue
+        root = sets.union(a, b)
+        strong[root] = 1
+        linked.append((a, kind))
+    for a, b, kind in weak_edges:
+        root_a, root_b = sets.find(a), sets.find(b)
+        if root_a != root_b and strong[root_a] and strong[root_b]:
+            continue
+        strong[sets.union(a, b)] = strong[root_a] | strong[root_b]
+        linked.append((a, kind))
+    evidence = {}
+    for a, kind in linked:
+        counts = evidence.setdefault(sets.find(a), {})
+        counts[kind] = counts.get(kind, 0) + 1
+    members = {}
+    for x in range(count):
+        root = sets.find(x)
+        if root in evidence:
+            members.setdefault(root, []).append(x)
+    return [(indices, evidence[root]) for root, indices in members.items() if len(indices) > 1]
@@ -1,6 +1,8 @@
 import os, datetime, json
 from typing import TYPE_CHECKING, Any
 from translations import translate
+from scanner import TAG_WRITE_POLICIES
+from fingerprint_backend import FINGERPRINT_BACKENDS
 
 if TYPE_CHECKING:  # Aide pour l'analyse statique uniquement
     from tksheet import Sheet
@@ -202,6 +204,11 @@ class ColumnManagerMixin:
                 "timestamp": datetime.datetime.now().isoformat(),
                 "version": 1,
                 "language": self.language,
+                "tag_write_policy": getattr(self, 'tag_write_policy', None),
+                "watch_folders": getattr(self, 'watch_folders', False),
+                "fingerprint_backend": getattr(self, 'fingerprint_backend', None),
+                "two_phase_fingerprint": getattr(self, 'two_phase_fingerprint', True),
+                "short_fingerprint_length": getattr(self, 'short_fingerprint_length', None),
             }
             with open(self.config_path, 'w', encoding='utf-8') as f:
                 json.dump(data, f, indent=2, ensure_ascii=False)
@@ -218,6 +225,17 @@ class ColumnManagerMixin:
             lang = data.get('language')
             if isinstance(lang, str) and lang in ('fr', 'en'):
                 self.language = lang
+            policy = data.get('tag_write_policy')
+            if policy in TAG_WRITE_POLICIES:
+                self.tag_write_policy = policy
+            self.watch_folders = bool(data.get('watch_folders', False))
+            backend = data.get('fingerprint_backend')
+            if backend in FINGERPRINT_BACKENDS:
+                self.fingerprint_backend = backend
+            self.two_phase_fingerprint = bool(data.get('two_phase_fingerprint', True))
+            length = data.get('short_fingerprint_length')
+            if isinstance(length, int) and length > 0:
+                self.short_fingerprint_length = length
             cols = [c for c in data.get('visible_columns', []) if c in self.all_columns]
             if cols:
                 if 'select' in cols:
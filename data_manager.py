@@ -1,21 +1,48 @@
+import os
 import datetime
 from translations import translate
+from scanner import passes_duration_filter
+from result_model import ResultModel
+
+# Délai (ms) entre la dernière frappe dans le champ de filtre et le filtrage des résultats
+FILTER_DEBOUNCE_MS = 200
+# Champs dans lesquels le filtre texte cherche
+FILTER_FIELDS = ('title', 'artist', 'album', 'path')
+# Lignes formatées et chargées dans la feuille à la fois (par groupes entiers), au plus près de la zone visible
+PAGE_ROWS = 500
 
 class DataManagerMixin:
     """Construction et rafraîchissement des données affichées dans la feuille."""
     def _init_data_state(self):
         self.all_groups = []
-        self.row_to_path_map = {}
+        # Lignes affichées (fichiers, cases cochées, groupes), chargées page par page dans la feuille
+        self.result_model = ResultModel()
         self.hidden_items = set()
+        # Groupes tenus à jour par le scanner (scan en cours, surveillance) : {clé: liste de file_info}
+        self.streamed_groups = {}
+        self.displayed_group_count = 0
+        # Champs calculés une fois par fichier : {chemin: (file_info, texte de recherche en minuscules)}
+        # et {chemin: (file_info, chemin affiché, date, durée)} ; recalculés si le file_info change
+        self.search_index = {}
+        self.display_fields = {}
+        self._display_base = None
+        # Dernier filtrage : (texte, chemins retenus), repris si le texte suivant le prolonge
+        self._filter_cache = None
+        # Groupes retenus par le filtre de durée au dernier affichage (repris quand seul le filtre texte change)
+        self._duration_groups = None
+        self._filter_job = None
+        self._loading_rows = False
 
     def clear_results_data(self):
         self.all_groups = []
         self.hidden_items.clear()
-        self.row_to_path_map.clear()
-        if hasattr(self, 'checkbox_states'):
-            self.checkbox_states.clear()
-        if hasattr(self, 'row_metadata'):
-            self.row_metadata.clear()
+        self.result_model.clear(keep_masks=False)
+        self.streamed_groups.clear()
+        self.displayed_group_count = 0
+        self.search_index.clear()
+        self.display_fields.clear()
+        self._filter_cache = None
+        self._duration_groups = None
         if hasattr(self, 'dynamic_group_reference'):
             self.dynamic_group_reference.clear()
         try:
@@ -31,100 +58,279 @@ class DataManagerMixin:
         except Exception:
             pass
 
-    def redisplay_results(self, preserve_selection=True):
-        selected_paths = set()
-        if preserve_selection:
-            try:
-                for row_idx, is_checked in enumerate(self.sheet.get_column_data(0)):
-                    if is_checked and row_idx in self.row_to_path_map:
-                        selected_paths.add(self.row_to_path_map[row_idx])
-            except Exception:
-                pass
+    def _duration_tolerance(self):
+        duration_similarity = getattr(self, 'duration_similarity_var', None)
+        return (duration_similarity.get() / 100.0) if duration_similarity else 0.95
+
+    def _passes_duration_filter(self, group):
+        return passes_duration_filter(group, self._duration_tolerance())
+
+    def _search_text(self, info):
+        path = info['path']
+        cached = self.search_index.get(path)
+        if cached is None or cached[0] is not info:
+            text = "\n".join(str(info.get(k, '')) for k in FILTER_FIELDS).lower()
+            cached = self.search_index[path] = (info, text)
+        return cached[1]
+
+    def _display_fields(self, info):
+        """Chemin affiché, date et durée formatées d'un fichier (calculés à sa première apparition)."""
+        path = info['path']
+        cached = self.display_fields.get(path)
+        if cached is None or cached[0] is not info:
+            display_path = path
+            if self._display_base:
+                try:
+                    display_path = os.path.relpath(path, self._display_base)
+                except Exception:
+                    pass
+            date_str = datetime.datetime.fromtimestamp(info['date']).strftime('%Y-%m-%d %H:%M:%S')
+            dur_sec = info.get('duration', 0) or 0
+            dur_str = f"{int(dur_sec // 60)}:{int(dur_sec % 60):02d}" if dur_sec > 0 else '-'
+            cached = self.display_fields[path] = (info, display_path, date_str, dur_str)
+        return cached[1:]
+
+    def _check_display_base(self):
+        """Oublie les chemins affichés si le premier dossier (base des chemins relatifs) a changé."""
+        folder_paths = getattr(self, 'folder_paths', None)
+        base = os.path.dirname(folder_paths[0]) if folder_paths else None
+        if base != self._display_base:
+            self._display_base = base
+            self.display_fields.clear()
+
+    def _filter_matches(self, query):
+        """
+        Chemins des fichiers de `all_groups` dont le titre, l'artiste, l'album ou le chemin
+        contient `query` (None si le filtre est vide). Si `query` prolonge le texte du
+        filtrage précédent, seuls les fichiers qu'il avait retenus sont examinés.
+        """
+        if not query:
+            return None
+        cache = self._filter_cache
+        if cache is not None and query.startswith(cache[0]):
+            search_index = self.search_index
+            matches = {path for path in cache[1] if query in search_index[path][1]}
+        else:
+            matches = {info['path'] for group in self.all_groups for info in group
+                       if query in self._search_text(info)}
+        self._filter_cache = (query, matches)
+        return matches
+
+    def schedule_filter(self):
+        """Filtre les résultats FILTER_DEBOUNCE_MS après la dernière frappe (une seule fois par rafale)."""
+        if self._filter_job is not None:
+            try: self.after_cancel(self._filter_job)
+            except Exception: pass
+        self._filter_job = self.after(FILTER_DEBOUNCE_MS, self._run_filter)
+
+    def _run_filter(self):
+        self._filter_job = None
+        self.redisplay_results(filter_only=True)
+
+    def _build_group_rows(self, group, selected_paths=(), known_selection=None, matches=None):
+        """
+        Choisit les lignes d'un groupe (filtre texte et éléments masqués appliqués) et leur
+        état coché. Rien n'est formaté ici : voir `_format_row`.
+
+        Args:
+            matches (set): Chemins retenus par le filtre texte (`_filter_matches`) ; à défaut,
+                           le filtre est appliqué ici.
+
+        Returns:
+            tuple: (file_info des lignes, état coché de chaque ligne, position du fichier à
+                   conserver parmi les lignes ou -1).
+        """
+        filter_query = self.filter_var.get().lower() if matches is None else ''
+        group.sort(key=lambda f: f.get('bitrate', 0), reverse=True)
+        group.sort(key=lambda f: f['date'])
+        file_to_keep = group[-1] if self.keep_type_var.get() == 'recent' else group[0]
+        files, states, reference = [], [], -1
+        for info in group:
+            path = info['path']
+            if path in self.hidden_items:
+                continue
+            if matches is not None and path not in matches:
+                continue
+            if filter_query and filter_query not in self._search_text(info):
+                continue
+            is_dup = info is not file_to_keep
+            if known_selection and path in known_selection:
+                checked = known_selection[path]
+            else:
+                checked = is_dup if not selected_paths else (path in selected_paths)
+            if not is_dup:
+                reference = len(files)
+            files.append(info)
+            states.append(checked)
+        return files, states, reference
+
+    def _format_row(self, row):
+        """Valeurs affichées de la ligne `row` du modèle, dans l'ordre des colonnes visibles."""
+        model = self.result_model
+        info = model.files[row]
+        display_path, date_str, dur_str = self._display_fields(info)
+        row_values = {
+            'select': '✔' if model.checked[row] else '', 'title': info.get('title', 'N/A'),
+            'artist': info.get('artist', 'N/A'), 'album': info.get('album', 'N/A'),
+            'bitrate': info.get('bitrate', 0), 'duration': dur_str, 'path': display_path,
+            'group': model.labels[model.row_group[row]], 'date': date_str
+        }
+        return [row_values[c] for c in self.visible_columns]
+
+    def _load_rows(self, until):
+        """
+        Formate et ajoute à la feuille les lignes du modèle jusqu'à `until` (arrondi à la
+        fin d'un groupe), après celles déjà chargées.
+        """
+        model = self.result_model
+        start = model.loaded
+        end = model.group_end(until - 1) if until > start else start
+        if end <= start and start:
+            return
+        rows = [self._format_row(r) for r in range(start, end)]
+        if start == 0:
+            self.sheet.set_sheet_data(rows, reset_col_positions=True, reset_row_positions=True, redraw=False,
+                                      reset_highlights=True)
+            try: self._apply_readonly_except_select()
+            except Exception: pass
+        else:
+            self.sheet.insert_rows(rows, idx=start, undo=False, redraw=False)
+        model.loaded = end
+        if end > start:
+            try: self._apply_difference_highlighting(range(model.row_group[start], model.row_group[end - 1] + 1),
+                                                      redraw=False)
+            except Exception: pass
+        self.sheet.redraw()
+
+    def load_visible_rows(self, _event=None):
+        """
+        Charge la page suivante quand la zone visible de la feuille approche de la fin des
+        lignes chargées (défilement, redimensionnement, groupe reçu pendant le scan).
+        """
+        model = self.result_model
+        if self._loading_rows or model.loaded >= len(model):
+            return
+        try:
+            end = self.sheet.visible_rows[1]
+        except Exception:
+            end = model.loaded
+        if end + PAGE_ROWS // 2 <= model.loaded:
+            return
+        self._loading_rows = True
+        try:
+            self._load_rows(end + PAGE_ROWS)
+        finally:
+            self._loading_rows = False
+
+    def redisplay_results(self, preserve_selection=True, known_selection=None, filter_only=False):
+        """
+        Reconstruit le modèle de lignes à partir de `all_groups`, puis ne charge dans la
+        feuille que la première page.
+
+        Args:
+            filter_only (bool): Seul le texte du filtre a changé depuis l'affichage précédent
+                                (le filtrage précédent peut alors être repris).
+        """
+        if not filter_only:
+            self._filter_cache = None
+            self._duration_groups = None
+        self._check_display_base()
+        matches = self._filter_matches(self.filter_var.get().lower())
+        model = self.result_model
+        selected_paths = set(model.checked_paths()) if preserve_selection else set()
+        model.clear()
         self.sheet.set_sheet_data([[]])
-        self.row_to_path_map.clear()
-        if hasattr(self, 'row_metadata'):
-            self.row_metadata.clear()
+        self.displayed_group_count = 0
         if hasattr(self, 'dynamic_group_reference'):
             self.dynamic_group_reference.clear()
         if not self.all_groups:
             try: self.update_delete_button()
             except Exception: pass
             return
-        filter_query = self.filter_var.get().lower()
-        keep_type = self.keep_type_var.get()
-        duration_similarity = getattr(self, 'duration_similarity_var', None)
-        duration_similarity = (duration_similarity.get() / 100.0) if duration_similarity else 0.95
-        data_matrix = []
-        any_duration = False
         group_id = 1
-        new_states = {}
-        current_row = 0
         lang = getattr(self, 'language', 'fr')
         group_prefix = translate(lang, 'group.prefix')
-        for group in self.all_groups:
-            durations = [f.get('duration', 0) or 0 for f in group]
-            if durations:
-                min_d = min(durations); max_d = max(durations)
-                ratio = min(min_d, max_d) / max(max_d, min_d) if max_d and min_d else 1.0
-                if ratio < duration_similarity:
-                    continue
-            group.sort(key=lambda f: f.get('bitrate', 0), reverse=True)
-            group.sort(key=lambda f: f['date'])
-            file_to_keep = group[-1] if keep_type == 'recent' else group[0]
+        if self._duration_groups is None:
+            self._duration_groups = [g for g in self.all_groups if self._passes_duration_filter(g)]
+        for group in self._duration_groups:
             group_label = f"{group_prefix} {group_id}"
-            for info in group:
-                path = info['path']
-                if path in self.hidden_items:
-                    continue
-                if filter_query and not any(
-                        filter_query in str(info.get(k, '')).lower() for k in ('title', 'artist', 'album', 'path')
-                ):
-                    continue
-                self.row_to_path_map[current_row] = path
-                if getattr(self, 'folder_paths', None):
-                    try:
-                        base = self.folder_paths[0]
-                        display_path = os.path.relpath(path, os.path.dirname(base))
-                    except Exception:
-                        display_path = path
-                else:
-                    display_path = path
-                date_str = datetime.datetime.fromtimestamp(info['date']).strftime('%Y-%m-%d %H:%M:%S')
-                is_dup = (info != file_to_keep)
-                checked = is_dup if not selected_paths else (path in selected_paths)
-                dur_sec = info.get('duration', 0) or 0
-                any_duration = any_duration or (dur_sec > 0)
-                dur_str = f"{int(dur_sec // 60)}:{int(dur_sec % 60):02d}" if dur_sec > 0 else '-'
-                row_values = {
-                    'select': '✔' if checked else '', 'title': info.get('title', 'N/A'),
-                    'artist': info.get('artist', 'N/A'), 'album': info.get('album', 'N/A'),
-                    'bitrate': info.get('bitrate', 0), 'duration': dur_str, 'path': display_path,
-                    'group': group_label, 'date': date_str
-                }
-                data_matrix.append([row_values[c] for c in self.visible_columns])
-                new_states[current_row] = bool(checked)
-                if hasattr(self, 'row_metadata'):
-                    self.row_metadata.append({
-                        'group': group_label, 'is_reference': (info == file_to_keep),
-                        'values': {
-                            'title': info.get('title', '') or '', 'artist': info.get('artist', '') or '',
-                            'album': info.get('album', '') or '', 'bitrate': info.get('bitrate', 0) or 0,
-                            'duration': dur_str
-                        }
-                    })
-                current_row += 1
+            if matches is not None and not any(info['path'] in matches for info in group):
+                files, states, reference = [], [], -1
+            else:
+                files, states, reference = self._build_group_rows(group, selected_paths, known_selection, matches)
+            model.append_group(group, group_label, files, states, reference)
             group_id += 1
-        self.sheet.set_sheet_data(data_matrix, reset_col_positions=True, reset_row_positions=True)
-        try: self._apply_readonly_except_select()
-        except Exception: pass
-        if hasattr(self, 'checkbox_states'):
-            self.checkbox_states = new_states
+        self.displayed_group_count = group_id - 1
+        self._load_rows(PAGE_ROWS)
+        any_duration = any(info.get('duration') for info in model.files)
         if not any_duration and 'duration' in self.visible_columns:
             try: self.status_label.config(text=translate(lang,'msg.no_duration'))
             except Exception: pass
+        scan_tolerance = getattr(self, 'scan_duration_tolerance', None)
+        if scan_tolerance and self._duration_tolerance() < scan_tolerance:
+            # Le scan n'a pas empreinté les fichiers sans durée proche à sa tolérance
+            try: self.status_label.config(text=translate(lang, 'msg.duration_rescan', percent=round(scan_tolerance * 100)))
+            except Exception: pass
         try: self.update_delete_button()
         except Exception: pass
-        try: self._apply_difference_highlighting()
-        except Exception: pass
 
-import os  # placé en bas pour ne pas polluer espace global avant définition
+    def remove_streamed_group(self, key):
+        """Retire un groupe disparu (surveillance des dossiers) et ses lignes de la feuille."""
+        group = self.streamed_groups.get(key)
+        if group is None:
+            return
+        self.show_streamed_group(key, [])
+        del self.streamed_groups[key]
+        # Le groupe garde son numéro (sans ligne) ; un groupe recréé sous cette clé en reçoit un nouveau
+        self.result_model.index.pop(id(group), None)
+        self.all_groups = [g for g in self.all_groups if g is not group]
+
+    def show_streamed_group(self, key, files):
+        """
+        Ajoute ou met à jour un groupe reçu pendant le scan ou de la surveillance des
+        dossiers. Seules ses lignes changent dans le modèle ; dans la feuille, elles ne
+        sont remplacées que si elles y sont déjà chargées (sinon, elles le seront en
+        défilant) : l'utilisateur peut examiner et cocher les groupes déjà trouvés pendant
+        que le scan continue. La feuille est redessinée par l'appelant, une fois par lot
+        de groupes.
+        """
+        self._filter_cache = None
+        self._duration_groups = None
+        self._check_display_base()
+        group = self.streamed_groups.get(key)
+        if group is None:
+            group = self.streamed_groups[key] = list(files)
+        else:
+            group[:] = files
+        if not any(g is group for g in self.all_groups):
+            self.all_groups.append(group)
+        model = self.result_model
+        gi = model.index.get(id(group))
+        # L'état des cases déjà affichées pour ce groupe est conservé
+        known = {model.files[r]['path']: bool(model.checked[r]) for r in model.group_rows(gi)} if gi is not None else {}
+        group_label = model.labels[gi] if gi is not None else None
+        rows, states, reference = [], [], -1
+        if group and self._passes_duration_filter(group):
+            if group_label is None:
+                self.displayed_group_count += 1
+                group_label = f"{translate(getattr(self, 'language', 'fr'), 'group.prefix')} {self.displayed_group_count}"
+            rows, states, reference = self._build_group_rows(group, known_selection=known)
+        if gi is None:
+            if rows:
+                model.append_group(group, group_label, rows, states, reference)
+                self.load_visible_rows()
+            return
+        loaded = model.starts[gi] < model.loaded
+        start, count = model.replace_group(gi, rows, states, reference)
+        try: self._restore_dynamic_reference(gi)
+        except Exception: pass
+        if not loaded:
+            self.load_visible_rows()
+            return
+        if count:
+            self.sheet.delete_rows(range(start, start + count), undo=False, redraw=False)
+        if rows:
+            self.sheet.insert_rows([self._format_row(r) for r in model.group_rows(gi)], idx=start,
+                                   undo=False, redraw=False)
+            try: self._apply_difference_highlighting([gi], redraw=False)
+            except Exception: pass
@@ -39,8 +39,9 @@ class DeletionMixin:
         if not messagebox.askyesno("Confirmation", "\n".join(lines)+"\nConfirmer ?"):
             return
         errors = []
+        trashed = []
         for p in existing:
-            try: send2trash(p)
+            try: send2trash(p); trashed.append(p)
             except Exception as e: errors.append(f"- {p}: {e}")
         if errors:
             messagebox.showwarning("Erreurs", "Certaines suppressions ont échoué :\n"+"\n".join(errors))
@@ -55,8 +56,12 @@ class DeletionMixin:
                 if normp not in deleted_norm:
                     kept.append(fi)
             if len(kept) > 1:
-                new_groups.append(kept)
+                # Mise à jour en place : un scan en cours peut encore compléter ce groupe
+                g[:] = kept
+                new_groups.append(g)
         self.all_groups = new_groups
+        # Les fichiers supprimés ne doivent pas réapparaître via un groupe reçu plus tard
+        self.hidden_items.update(trashed)
         try:
             self.redisplay_results(preserve_selection=False)
         except Exception:
@@ -0,0 +1,374 @@
+import os
+import sys
+import json
+import wave
+import ctypes
+import ctypes.util
+import functools
+import subprocess
+import numpy as np
+import acoustid
+from scan_pipeline import ScanCancelled, worker_cancelled, CONTROL_POLL_INTERVAL
+
+try:
+    import audioread
+except ImportError:  # dépendance de pyacoustid, mais facultative ici
+    audioread = None
+
+# Erreurs de décodage en cours de lecture : le fichier compte comme un échec d'empreinte
+_DECODE_ERRORS = (wave.Error, EOFError, ValueError) + ((audioread.DecodeError,) if audioread else ())
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Moteurs d'empreinte sélectionnables
+BACKEND_AUTO = "auto"                # libchromaprint si disponible, sinon fpcalc
+BACKEND_CHROMAPRINT = "chromaprint"  # libchromaprint en processus (fpcalc en repli par fichier)
+BACKEND_FPCALC = "fpcalc"            # un processus fpcalc par fichier
+FINGERPRINT_BACKENDS = (BACKEND_AUTO, BACKEND_CHROMAPRINT, BACKEND_FPCALC)
+
+# Bibliothèques cherchées à côté de l'application (comme fpcalc.exe), puis dans le système
+CHROMAPRINT_LIBRARIES = {
+    "win32": ("chromaprint.dll", "libchromaprint.dll"),
+    "darwin": ("libchromaprint.1.dylib", "libchromaprint.dylib"),
+}.get(sys.platform, ("libchromaprint.so.1", "libchromaprint.so"))
+# Algorithme par défaut de Chromaprint (celui de fpcalc)
+CHROMAPRINT_ALGORITHM = 1
+# Trames audio lues et transmises à libchromaprint par appel
+DECODE_BLOCK_FRAMES = 65536
+# Fichiers passés à un même appel `fpcalc -json` : amortit le lancement du processus
+FPCALC_BATCH_SIZE = 100
+# Longueur maximale des chemins d'un appel (la ligne de commande Windows est limitée à 32 767 caractères)
+FPCALC_MAX_COMMAND_CHARS = 24000
+
+
+class BackendUnavailable(Exception):
+    """Le moteur d'empreinte demandé ne peut pas être utilisé sur cette machine."""
+
+
+class UnsupportedAudio(Exception):
+    """Aucun décodeur en processus ne sait lire ce fichier : il passe au moteur de repli."""
+
+
+def _call_fpcalc(args, fpcalc_path):
+    """
+    Lance fpcalc et retourne sa sortie standard, en tuant le processus si le scan
+    est annulé pendant le calcul.
+
+    Raises:
+        acoustid.FingerprintGenerationError: si fpcalc échoue.
+        ScanCancelled: si le scan est annulé.
+    """
+    try:
+        proc = subprocess.Popen([fpcalc_path] + args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError as exc:
+        raise acoustid.FingerprintGenerationError(f"fpcalc invocation failed: {exc}")
+    while True:
+        try:
+            output, _ = proc.communicate(timeout=CONTROL_POLL_INTERVAL)
+            break
+        except subprocess.TimeoutExpired:
+            if worker_cancelled():
+                proc.kill()
+                proc.communicate()
+                raise ScanCancelled()
+    if proc.returncode:
+        raise acoustid.FingerprintGenerationError(f"fpcalc exited with status {proc.returncode}")
+    return output
+
+
+def _run_fpcalc(path, fpcalc_path, maxlength=acoustid.MAX_AUDIO_LENGTH):
+    """
+    Calcule l'empreinte d'un fichier avec fpcalc (même sortie que `acoustid.fingerprint_file`).
+
+    Returns:
+        tuple: (durée, empreinte en bytes)
+    """
+    output = _call_fpcalc(["-length", str(maxlength), path], fpcalc_path)
+    duration = fp = None
+    for line in output.splitlines():
+        key, _, value = line.partition(b'=')
+        if key == b'DURATION':
+            try:
+                duration = float(value)
+            except ValueError:
+                raise acoustid.FingerprintGenerationError("fpcalc duration not numeric")
+        elif key == b'FINGERPRINT':
+            fp = value
+    if duration is None or fp is None:
+        raise acoustid.FingerprintGenerationError("missing fpcalc output")
+    return duration, fp
+
+
+def _run_fpcalc_json(paths, fpcalc_path, maxlength=acoustid.MAX_AUDIO_LENGTH):
+    """
+    Empreintes de plusieurs fichiers en un seul appel `fpcalc -json` (un objet JSON par
+    ligne, dans l'ordre des fichiers).
+
+    Returns:
+        list: [(durée, empreinte), ...], une entrée par fichier.
+
+    Raises:
+        acoustid.FingerprintGenerationError: si fpcalc échoue pour au moins un fichier. La
+            sortie ne nomme pas les fichiers : elle n'est utilisable que complète.
+    """
+    output = _call_fpcalc(["-json", "-length", str(maxlength)] + list(paths), fpcalc_path)
+    try:
+        records = [json.loads(line) for line in output.splitlines() if line.strip()]
+        results = [(float(r["duration"]), r["fingerprint"]) for r in records]
+    except (ValueError, KeyError, TypeError) as exc:
+        raise acoustid.FingerprintGenerationError(f"unexpected fpcalc output: {exc}")
+    if len(results) != len(paths):
+        raise acoustid.FingerprintGenerationError(f"fpcalc returned {len(results)} results for {len(paths)} files")
+    return results
+
+
+def _command_chunks(paths, limit=FPCALC_MAX_COMMAND_CHARS):
+    """Découpe `paths` pour qu'aucune ligne de commande ne dépasse `limit` caractères de chemins."""
+    chunk, size = [], 0
+    for path in paths:
+        if chunk and size + len(path) + 3 > limit:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(path)
+        size += len(path) + 3  # séparateur et guillemets éventuels
+    if chunk:
+        yield chunk
+
+
+class FpcalcBackend:
+    """Moteur historique : un processus fpcalc par fichier (décodage compris)."""
+    name = BACKEND_FPCALC
+
+    def __init__(self, fpcalc_path):
+        self.fpcalc_path = fpcalc_path
+
+    def describe(self):
+        return f"fpcalc ({self.fpcalc_path})"
+
+    def fingerprint(self, path, maxlength=acoustid.MAX_AUDIO_LENGTH):
+        """Returns: tuple (durée, empreinte, nom du moteur utilisé)."""
+        duration, fp = _run_fpcalc(path, self.fpcalc_path, maxlength)
+        return duration, fp.decode("utf-8"), self.name
+
+    def fingerprint_in_process(self, path, maxlength=acoustid.MAX_AUDIO_LENGTH):
+        """Toujours None : chaque empreinte demande un processus fpcalc (voir `fingerprint_batch`)."""
+        return None
+
+    def fingerprint_batch(self, paths, maxlength=acoustid.MAX_AUDIO_LENGTH):
+        """
+        Empreintes de plusieurs fichiers avec un appel `fpcalc -json` par lot, au lieu
+        d'un processus par fichier.
+
+        Un lot dont la sortie ne peut pas être attribuée (un fichier a échoué) est coupé
+        en deux et chaque moitié relancée, jusqu'à isoler chaque fichier fautif, relancé
+        seul : son échec n'affecte pas les autres fichiers du lot.
+
+        Returns:
+            tuple: ([(durée, empreinte, nom du moteur) ou exception, par fichier],
+                    nombre de processus fpcalc lancés)
+        """
+        results = []
+        processes = 0
+        for chunk in _command_chunks(paths):
+            chunk_results, chunk_processes = self._fingerprint_chunk(chunk, maxlength)
+            results.extend(chunk_results)
+            processes += chunk_processes
+        return results, processes
+
+    def _fingerprint_chunk(self, paths, maxlength):
+        if len(paths) == 1:
+            try:
+                return [self.fingerprint(paths[0], maxlength)], 1
+            except acoustid.FingerprintGenerationError as exc:
+                return [exc if os.path.exists(paths[0]) else FileNotFoundError(paths[0])], 1
+        try:
+            records = _run_fpcalc_json(paths, self.fpcalc_path, maxlength)
+            return [(duration, fp, self.name) for duration, fp in records], 1
+        except acoustid.FingerprintGenerationError:
+            middle = len(paths) // 2
+            left, left_processes = self._fingerprint_chunk(paths[:middle], maxlength)
+            right, right_processes = self._fingerprint_chunk(paths[middle:], maxlength)
+            return left + right, 1 + left_processes + right_processes
+
+
+# ---- Décodeurs en processus (PCM 16 bits signé, entrelacé) ----
+
+def _to_int16(data, width):
+    """Convertit des échantillons PCM little-endian de `width` octets en int16."""
+    if width == 2:
+        return data
+    if width == 1:  # 8 bits non signé
+        return ((np.frombuffer(data, np.uint8).astype(np.int16) - 128) << 8).tobytes()
+    if width == 3:  # 24 bits : on garde les deux octets de poids fort
+        return np.frombuffer(data, np.uint8).reshape(-1, 3)[:, 1:].tobytes()
+    return (np.frombuffer(data, "<i4") >> 16).astype("<i2").tobytes()
+
+
+class _WaveReader:
+    """Lecture WAV PCM par le module standard `wave` : toujours disponible, même interface qu'audioread."""
+    def __init__(self, path):
+        try:
+            self._file = wave.open(path, "rb")
+        except (wave.Error, EOFError) as exc:  # WAV flottant, extensible, tronqué...
+            raise UnsupportedAudio(str(exc))
+        self.samplerate = self._file.getframerate()
+        self.channels = self._file.getnchannels()
+        self._width = self._file.getsampwidth()
+        if not self.samplerate or not self.channels or self._width not in (1, 2, 3, 4):
+            self._file.close()
+            raise UnsupportedAudio("format PCM non pris en charge")
+        self.duration = self._file.getnframes() / self.samplerate
+
+    def __iter__(self):
+        frame_size = self._width * self.channels
+        while True:
+            data = self._file.readframes(DECODE_BLOCK_FRAMES)
+            data = data[:len(data) - len(data) % frame_size]
+            if not data:
+                return
+            yield _to_int16(data, self._width)
+
+    def close(self):
+        self._file.close()
+
+
+def _audioread_backends():
+    """Décodeurs audioread qui décodent en processus (FFmpeg lancerait un processus par fichier)."""
+    if audioread is None:
+        return []
+    return [cls for cls in audioread.available_backends() if cls.__name__ != "FFmpegAudioFile"]
+
+
+def _open_audio(path, audioread_backends):
+    if path.lower().endswith(".wav"):
+        try:
+            return _WaveReader(path)
+        except UnsupportedAudio:
+            pass
+    if audioread_backends:
+        try:
+            return audioread.audio_open(path, backends=audioread_backends)
+        except audioread.DecodeError:
+            pass
+    raise UnsupportedAudio(path)
+
+
+def _load_chromaprint():
+    candidates = [os.path.join(APP_DIR, name) for name in CHROMAPRINT_LIBRARIES] + list(CHROMAPRINT_LIBRARIES)
+    found = ctypes.util.find_library("chromaprint")
+    if found:
+        candidates.append(found)
+    for candidate in candidates:
+        try:
+            lib = ctypes.CDLL(candidate)
+            break
+        except OSError:
+            continue
+    else:
+        raise OSError("libchromaprint introuvable")
+    lib.chromaprint_get_version.restype = ctypes.c_char_p
+    lib.chromaprint_new.argtypes = [ctypes.c_int]
+    lib.chromaprint_new.restype = ctypes.c_void_p
+    lib.chromaprint_free.argtypes = [ctypes.c_void_p]
+    lib.chromaprint_start.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int]
+    lib.chromaprint_feed.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+    lib.chromaprint_finish.argtypes = [ctypes.c_void_p]
+    lib.chromaprint_get_fingerprint.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_char_p)]
+    lib.chromaprint_dealloc.argtypes = [ctypes.c_void_p]
+    return lib
+
+
+class ChromaprintBackend:
+    """
+    Empreinte calculée dans le processus du worker : libchromaprint (via ctypes) reçoit
+    le PCM d'un décodeur en processus (`wave` pour les WAV, sinon les décodeurs
+    audioread sans sous-processus). Évite le lancement de fpcalc et de son décodeur
+    pour chaque fichier ; les empreintes sont identiques à celles de fpcalc pour un
+    même audio décodé. Les fichiers qu'aucun décodeur ne lit passent à `fallback`.
+    """
+    name = BACKEND_CHROMAPRINT
+
+    def __init__(self, fallback=None):
+        self._lib = _load_chromaprint()
+        self.version = self._lib.chromaprint_get_version().decode("ascii", "replace")
+        self.fallback = fallback
+        self._audioread_backends = _audioread_backends()
+
+    def describe(self):
+        decoders = ["wave"] + [cls.__name__ for cls in self._audioread_backends]
+        text = f"libchromaprint {self.version} [{', '.join(decoders)}]"
+        return f"{text} + {self.fallback.describe()}" if self.fallback else text
+
+    def fingerprint(self, path, maxlength=acoustid.MAX_AUDIO_LENGTH):
+        """Returns: tuple (durée, empreinte, nom du moteur utilisé)."""
+        result = self.fingerprint_in_process(path, maxlength)
+        return result if result is not None else self.fallback.fingerprint(path, maxlength)
+
+    def fingerprint_in_process(self, path, maxlength=acoustid.MAX_AUDIO_LENGTH):
+        """Comme `fingerprint`, mais retourne None au lieu de lancer fpcalc pour un format non décodable."""
+        try:
+            audio = _open_audio(path, self._audioread_backends)
+        except UnsupportedAudio:
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            if self.fallback is None:
+                raise acoustid.FingerprintGenerationError("format non décodable sans fpcalc")
+            return None
+        lib = self._lib
+        ctx = lib.chromaprint_new(CHROMAPRINT_ALGORITHM)
+        try:
+            if lib.chromaprint_start(ctx, audio.samplerate, audio.channels) != 1:
+                raise acoustid.FingerprintGenerationError("chromaprint_start failed")
+            remaining = int(maxlength * audio.samplerate) * audio.channels  # échantillons
+            try:
+                for block in audio:
+                    if worker_cancelled():
+                        raise ScanCancelled()
+                    count = min(len(block) // 2, remaining)
+                    if lib.chromaprint_feed(ctx, block, count) != 1:
+                        raise acoustid.FingerprintGenerationError("chromaprint_feed failed")
+                    remaining -= count
+                    if remaining <= 0:
+                        break
+            except _DECODE_ERRORS as exc:
+                raise acoustid.FingerprintGenerationError(f"decoding failed: {exc}")
+            if lib.chromaprint_finish(ctx) != 1:
+                raise acoustid.FingerprintGenerationError("chromaprint_finish failed")
+            result = ctypes.c_char_p()
+            if lib.chromaprint_get_fingerprint(ctx, ctypes.byref(result)) != 1:
+                raise acoustid.FingerprintGenerationError("chromaprint_get_fingerprint failed")
+            fp = result.value.decode("ascii")
+            lib.chromaprint_dealloc(result)
+        finally:
+            lib.chromaprint_free(ctx)
+            audio.close()
+        return audio.duration, fp, self.name
+
+
+def create_backend(name=BACKEND_AUTO, fpcalc_path=None):
+    """
+    Construit le moteur d'empreinte `name` (voir FINGERPRINT_BACKENDS).
+
+    Raises:
+        BackendUnavailable: si ni libchromaprint ni fpcalc ne permettent de l'utiliser.
+    """
+    fpcalc = FpcalcBackend(fpcalc_path) if fpcalc_path and os.path.exists(fpcalc_path) else None
+    if name == BACKEND_FPCALC:
+        if fpcalc is None:
+            raise BackendUnavailable("fpcalc.exe non trouvé. Veuillez le placer dans le dossier de l'application.")
+        return fpcalc
+    try:
+        return ChromaprintBackend(fallback=fpcalc)
+    except OSError as exc:
+        if name == BACKEND_CHROMAPRINT:
+            raise BackendUnavailable(f"Moteur chromaprint indisponible : {exc}.")
+        if fpcalc is None:
+            raise BackendUnavailable("Aucun moteur d'empreinte : placez fpcalc.exe dans le dossier de "
+                                     "l'application ou installez libchromaprint.")
+        return fpcalc
+
+
+@functools.lru_cache(maxsize=None)
+def get_backend(name=BACKEND_AUTO, fpcalc_path=None):
+    """`create_backend` mémorisé : chaque worker charge son moteur une seule fois."""
+    return create_backend(name, fpcalc_path)
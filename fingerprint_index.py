@@ -0,0 +1,158 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Base SQLite placée à côté de l'application (comme column_config.json)
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fingerprint_index.sqlite3")
+
+# Incrémenter lors d'un changement de schéma, avec sa migration dans _MIGRATIONS : un index
+# d'une version sans migration n'est qu'un cache, il est alors recréé
+SCHEMA_VERSION = 3
+
+# {version: instructions SQL passant l'index de cette version à la suivante}
+_MIGRATIONS = {
+    2: ("ALTER TABLE files ADD COLUMN tag_pending INTEGER",),
+}
+
+# Nombre d'écritures accumulées avant un commit automatique
+COMMIT_EVERY = 500
+# Délai maximal (s) entre deux commits : un scan interrompu ne perd que ce travail-là
+COMMIT_INTERVAL = 30
+
+_FIELDS = ("fingerprint", "duration", "title", "artist", "album", "bitrate", "content_hash",
+           "short_fingerprint", "short_length", "tag_pending")
+
+
+class FingerprintIndex:
+    """
+    Index persistant des empreintes et métadonnées déjà calculées.
+
+    Chaque entrée est indexée par chemin et n'est considérée valide que si
+    (taille, mtime_ns, inode) correspondent au `os.stat` courant du fichier :
+    un fichier inchangé ne coûte donc qu'un `stat` lors d'un nouveau scan.
+    Les écritures sont validées régulièrement, si bien que l'index sert aussi de
+    point de reprise : un scan annulé ou interrompu repart des fichiers déjà traités.
+
+    L'empreinte courte de l'empreinte en deux passes (`short_fingerprint`, calculée sur
+    les `short_length` premières secondes) est conservée à part de l'empreinte complète
+    (`fingerprint`) : un fichier sans doublon possible n'a que la première.
+
+    `tag_pending` marque une empreinte complète pas encore écrite dans les tags du fichier
+    (politique d'écriture différée) : l'écriture est reprise au scan suivant si celui-ci
+    est annulé avant, jusqu'à `tag_written` (ou `tag_abandoned` si l'écriture échoue).
+    """
+    def __init__(self, db_path=INDEX_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        while version in _MIGRATIONS:
+            for statement in _MIGRATIONS[version]:
+                self._conn.execute(statement)
+            version += 1
+        if version != SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS files")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " inode INTEGER NOT NULL,"
+            " fingerprint TEXT,"
+            " duration REAL,"
+            " title TEXT,"
+            " artist TEXT,"
+            " album TEXT,"
+            " bitrate INTEGER,"
+            " content_hash TEXT,"
+            " short_fingerprint TEXT,"
+            " short_length INTEGER,"
+            " tag_pending INTEGER)"
+        )
+        self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._conn.commit()
+
+    def lookup(self, path, stat):
+        """Retourne le dict des champs en cache si le fichier n'a pas changé, sinon None."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT size, mtime_ns, inode, {', '.join(_FIELDS)} FROM files WHERE path = ?",
+                (path,)
+            ).fetchone()
+        if row is None:
+            return None
+        size, mtime_ns, inode = row[:3]
+        if (size, mtime_ns, inode) != (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+            return None
+        return dict(zip(_FIELDS, row[3:]))
+
+    def store(self, path, stat, **fields):
+        """Enregistre (ou remplace) l'entrée d'un fichier ; les champs absents sont stockés à NULL."""
+        values = [fields.get(k) for k in _FIELDS]
+        if isinstance(values[0], bytes):
+            values[0] = values[0].decode('utf-8')
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, {', '.join(_FIELDS)}) "
+                f"VALUES (?, ?, ?, ?, {', '.join('?' for _ in _FIELDS)})",
+                (path, stat.st_size, stat.st_mtime_ns, stat.st_ino, *values)
+            )
+            self._pending += 1
+            if self._pending >= COMMIT_EVERY or time.monotonic() - self._last_commit >= COMMIT_INTERVAL:
+                self._commit_locked()
+
+    def _commit_locked(self):
+        self._conn.commit()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def tag_written(self, path, stat):
+        """Empreinte écrite dans les tags : l'entrée reste valide pour le nouveau `stat` du fichier."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE files SET size = ?, mtime_ns = ?, inode = ?, tag_pending = NULL WHERE path = ?",
+                (stat.st_size, stat.st_mtime_ns, stat.st_ino, path)
+            )
+            self._pending += 1
+
+    def content_hashed(self, path, content_hash):
+        """SHA-1 calculé après coup (copie apparue depuis) : l'entrée reste valide."""
+        with self._lock:
+            self._conn.execute("UPDATE files SET content_hash = ? WHERE path = ?", (content_hash, path))
+            self._pending += 1
+
+    def tag_abandoned(self, path):
+        """Écriture du tag en échec : l'entrée reste valide mais n'est plus en attente d'écriture."""
+        with self._lock:
+            self._conn.execute("UPDATE files SET tag_pending = NULL WHERE path = ?", (path,))
+            self._pending += 1
+
+    def forget(self, path):
+        with self._lock:
+            self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            self._pending += 1
+
+    def commit(self):
+        with self._lock:
+            self._commit_locked()
+
+    def close(self):
+        try:
+            self.commit()
+        finally:
+            with self._lock:
+                self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,22 +1,23 @@
 from typing import Any, TYPE_CHECKING
+from result_model import DIFF_FIELDS
 
 if TYPE_CHECKING:
     from tksheet import Sheet
+    from result_model import ResultModel
 
 class HighlightMixin:
     """Mise en évidence des différences intra-groupe."""
     # Attributs fournis par l'application principale / autres mixins
     sheet: 'Sheet'
     visible_columns: list[str]
-    row_metadata: list[dict]
-    dynamic_group_reference: dict[str, int]
+    result_model: 'ResultModel'
+    dynamic_group_reference: dict[int, str]
     highlight_differences: bool
-    checkbox_states: dict[int, bool]
     status_label: Any
 
     def _init_highlight_state(self):
         self.highlight_differences = True
-        self.row_metadata = []
+        # Référence choisie par clic : {numéro du groupe: chemin}
         self.dynamic_group_reference = {}
         self.debug_mode = False
 
@@ -28,84 +29,80 @@ class HighlightMixin:
             self._apply_difference_highlighting()
 
     def _set_dynamic_reference_from_row(self, row):
-        if row is None or "group" not in self.visible_columns:
+        """Compare le groupe de `row` à cette ligne : seuls ses masques et les cellules qui changent sont repeints."""
+        model = self.result_model
+        if row is None or not 0 <= row < len(model):
             return
         try:
-            g_idx = self.visible_columns.index("group")
-            g_val = self.sheet.get_cell_data(row, g_idx)
-            if g_val:
-                self.dynamic_group_reference[g_val] = row
-                self._apply_difference_highlighting()
+            gi = model.row_group[row]
+            self.dynamic_group_reference[gi] = model.path(row)
+            changes = model.set_compare_row(gi, row)
+            if self.highlight_differences and changes:
+                columns = self._difference_columns()
+                cleared = [(r, col) for r, old, new in changes if r < model.loaded
+                           for bit, col in columns if old & ~new & (1 << bit)]
+                painted = [(r, col) for r, old, new in changes if r < model.loaded
+                           for bit, col in columns if new & ~old & (1 << bit)]
+                self._paint_cells(cleared, painted)
         except Exception:
             pass
 
-    def _clear_difference_highlighting(self):
-        try:
-            keys = ["title", "artist", "album", "bitrate", "duration"]
-            indices = [self.visible_columns.index(k) for k in keys if k in self.visible_columns]
-            for r in range(len(self.sheet.get_sheet_data())):
-                for c in indices:
-                    try:
-                        self.sheet.highlight_cells(row=r, column=c, fg='black', redraw=False)
-                    except Exception:
-                        pass
-            self.sheet.redraw()
-        except Exception:
-            pass
-
-    def _apply_difference_highlighting(self):
-        if not (self.highlight_differences and self.row_metadata and "group" in self.visible_columns):
+    def _restore_dynamic_reference(self, gi):
+        """Après un remplacement des lignes du groupe `gi`, le compare de nouveau à la ligne choisie par clic."""
+        path = self.dynamic_group_reference.get(gi)
+        if path is None:
             return
+        model = self.result_model
+        for r in model.group_rows(gi):
+            if model.path(r) == path:
+                model.set_compare_row(gi, r)
+                return
+
+    def _difference_columns(self):
+        """(bit du masque, colonne) des champs comparés visibles."""
+        return [(bit, self.visible_columns.index(k)) for bit, k in enumerate(DIFF_FIELDS) if k in self.visible_columns]
+
+    def _difference_cells(self, rows):
+        """Cellules en rouge des lignes `rows` d'après leurs masques."""
+        masks = self.result_model.masks
+        columns = self._difference_columns()
+        return [(r, col) for r in rows if masks[r] for bit, col in columns if masks[r] & (1 << bit)]
+
+    def _paint_cells(self, cleared=(), painted=(), redraw=True):
+        """Efface / met en rouge des cellules en un appel chacun."""
         try:
-            keys = ["title", "artist", "album", "bitrate", "duration"]
-            key_to_col = {k: self.visible_columns.index(k) for k in keys if k in self.visible_columns}
-            # reset couleurs
-            for r in range(len(self.sheet.get_sheet_data())):
-                for col in key_to_col.values():
-                    try:
-                        self.sheet.highlight_cells(row=r, column=col, fg='black', redraw=False)
-                    except Exception:
-                        pass
-            # regrouper
-            groups = {}
-            for r, meta in enumerate(self.row_metadata):
-                g = meta.get('group')
-                groups.setdefault(g, {"rows": [], "ref": None})
-                groups[g]["rows"].append(r)
-                if meta.get('is_reference'):
-                    groups[g]["ref"] = r
-            for g, info in groups.items():
-                rows = info['rows']
-                if not rows:
-                    continue
-                dyn = self.dynamic_group_reference.get(g)
-                ref_row = dyn if (dyn in rows) else (info.get('ref') if info.get('ref') is not None else rows[0])
-                ref_vals = self.row_metadata[ref_row].get('values', {})
-                for r in rows:
-                    if r == ref_row:
-                        continue
-                    row_vals = self.row_metadata[r].get('values', {})
-                    for k, col in key_to_col.items():
-                        rv = row_vals.get(k, ""); rf = ref_vals.get(k, "")
-                        if k == 'bitrate':
-                            try:
-                                diff = int(rv) != int(rf)
-                            except Exception:
-                                diff = rv != rf
-                        else:
-                            diff = str(rv).strip().lower() != str(rf).strip().lower()
-                        if diff:
-                            try:
-                                self.sheet.highlight_cells(row=r, column=col, fg='red', redraw=False)
-                            except Exception:
-                                pass
-            try:
+            if cleared:
+                self.sheet.dehighlight_cells(cells=cleared, redraw=False)
+            if painted:
+                self.sheet.highlight_cells(cells=painted, fg='red', redraw=False)
+            if redraw and (cleared or painted):
                 self.sheet.redraw()
-            except Exception:
-                pass
         except Exception:
             pass
 
+    def _clear_difference_highlighting(self):
+        self._paint_cells(cleared=self._difference_cells(range(self.result_model.loaded)))
+
+    def _apply_difference_highlighting(self, groups=None, redraw=True):
+        """
+        Met en rouge, d'après les masques du modèle, les valeurs qui diffèrent de la ligne
+        de référence de leur groupe (ligne choisie par clic, sinon fichier à conserver,
+        sinon première ligne). Les lignes peintes ne doivent pas l'être déjà (lignes tout
+        juste chargées, ou après `_clear_difference_highlighting`).
+
+        Args:
+            groups (iterable): Numéros des groupes à peindre (par défaut : tous ceux dont
+                               les lignes sont chargées dans la feuille).
+        """
+        model = self.result_model
+        if not (self.highlight_differences and model.loaded):
+            return
+        if groups is None:
+            rows = range(model.loaded)
+        else:
+            rows = (r for gi in groups for r in model.group_rows(gi) if r < model.loaded)
+        self._paint_cells(painted=self._difference_cells(rows), redraw=redraw)
+
     # Debug helpers
     def _toggle_debug(self):
         self.debug_mode = not self.debug_mode
@@ -118,12 +115,12 @@ class HighlightMixin:
         try:
             col = self._select_column_index()
             lines = []
-            for r in range(min(50, len(self.sheet.get_sheet_data()))):
+            for r in range(min(50, self.result_model.loaded)):
                 try:
                     cell = self.sheet.get_cell_data(r, col)
                 except Exception:
                     cell = None
-                internal = self.checkbox_states.get(r, False)
+                internal = self.result_model.checked[r]
                 lines.append(f"{r}: cell={cell!r} internal={int(bool(internal))}")
             from tkinter import messagebox
             messagebox.showinfo("Debug sélection", "\n".join(lines) if lines else "(vide)")
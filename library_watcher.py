@@ -0,0 +1,251 @@
+import os
+import sys
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+
+# Délai sans nouvel événement (s) avant de traiter un lot : laisse finir copies et réencodages
+SETTLE_DELAY = 2.0
+# Un lot est traité au plus tard après ce délai (s), même si l'activité continue
+MAX_BATCH_DELAY = 30.0
+# Intervalle (s) entre deux parcours complets pour le repli par scrutation
+POLL_INTERVAL = 10.0
+
+# Constantes inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0)
+_WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+               | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class ChangeBatch:
+    """
+    Lot de modifications constatées dans les dossiers surveillés.
+
+    Attributes:
+        changed (set): Fichiers audio créés, modifiés ou déplacés vers les dossiers.
+        removed (set): Chemins supprimés ou déplacés hors des dossiers (fichiers ou dossiers).
+        resync (bool): Des événements ont été perdus : les appelants doivent vérifier
+                       eux-mêmes quels fichiers connus ont disparu.
+    """
+    def __init__(self):
+        self.changed = set()
+        self.removed = set()
+        self.resync = False
+
+    def __bool__(self):
+        return bool(self.changed or self.removed or self.resync)
+
+    def add_changed(self, path):
+        self.removed.discard(path)
+        self.changed.add(path)
+
+    def add_removed(self, path):
+        self.changed.discard(path)
+        self.removed.add(path)
+
+
+def _is_audio(name, extensions):
+    return name.lower().endswith(extensions)
+
+
+def _walk(paths, extensions):
+    """{chemin: (taille, mtime_ns, inode)} des fichiers audio sous `paths`."""
+    snapshot = {}
+    stack = list(paths)
+    while stack:
+        folder = stack.pop()
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif _is_audio(entry.name, extensions):
+                            st = entry.stat()
+                            snapshot[entry.path] = (st.st_size, st.st_mtime_ns, st.st_ino)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return snapshot
+
+
+class _InotifyBackend:
+    """Événements du noyau Linux (inotify via ctypes) : un watch par dossier, ajouté au fil des créations."""
+    def __init__(self, paths, extensions):
+        self.extensions = extensions
+        self._libc = _load_libc()
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.folders = {}  # {wd: dossier}
+        for path in paths:
+            self._watch_tree(path)
+
+    def _watch_tree(self, root, batch=None):
+        stack = [root]
+        while stack:
+            folder = stack.pop()
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(folder), _WATCH_MASK)
+            if wd < 0:
+                continue  # dossier disparu ou limite de watches atteinte
+            self.folders[wd] = folder
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif batch is not None and _is_audio(entry.name, self.extensions):
+                            batch.add_changed(entry.path)
+            except OSError:
+                continue
+
+    def read(self, batch, timeout):
+        """Ajoute au lot les événements arrivés dans le délai ; retourne vrai s'il y en a eu."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return False
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            self._handle(batch, wd, mask, name)
+        return True
+
+    def _handle(self, batch, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            # File d'événements débordée : reprendre tous les dossiers
+            batch.resync = True
+            for folder in list(self.folders.values()):
+                self._watch_tree(folder, batch)
+            return
+        if mask & IN_IGNORED:
+            self.folders.pop(wd, None)
+            return
+        folder = self.folders.get(wd)
+        if folder is None or not name:
+            return
+        path = os.path.join(folder, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._watch_tree(path, batch)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                batch.add_removed(path)
+        elif _is_audio(name, self.extensions):
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                batch.add_changed(path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                batch.add_removed(path)
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        raise OSError("inotify n'est disponible que sous Linux")
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+class _PollingBackend:
+    """Repli portable : compare deux parcours successifs (taille, mtime, inode) des dossiers."""
+    def __init__(self, paths, extensions, interval=POLL_INTERVAL):
+        self.paths = list(paths)
+        self.extensions = extensions
+        self.interval = interval
+        self.snapshot = _walk(self.paths, extensions)
+        self._next_poll = time.monotonic() + interval
+
+    def read(self, batch, timeout):
+        wait = self._next_poll - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return False
+        time.sleep(max(0.0, wait))
+        self._next_poll = time.monotonic() + self.interval
+        snapshot = _walk(self.paths, self.extensions)
+        found = False
+        for path, state in snapshot.items():
+            if self.snapshot.get(path) != state:
+                batch.add_changed(path)
+                found = True
+        for path in self.snapshot.keys() - snapshot.keys():
+            batch.add_removed(path)
+            found = True
+        self.snapshot = snapshot
+        return found
+
+    def close(self):
+        pass
+
+
+class LibraryWatcher:
+    """
+    Surveille des dossiers et regroupe leurs modifications en lots de fichiers audio.
+
+    Utilise inotify sous Linux (sans dépendance, via ctypes) et se replie sur une
+    scrutation périodique ailleurs, ou si inotify est indisponible. Un lot est rendu
+    quand l'activité s'est calmée depuis SETTLE_DELAY secondes (une copie en cours
+    produit de nombreux événements), ou au plus tard après MAX_BATCH_DELAY secondes.
+    """
+    def __init__(self, paths, extensions, poll_interval=POLL_INTERVAL):
+        extensions = tuple(ext.lower() for ext in extensions)
+        try:
+            self.backend = _InotifyBackend(paths, extensions)
+            self.backend_name = "inotify"
+        except (OSError, AttributeError):
+            self.backend = _PollingBackend(paths, extensions, poll_interval)
+            self.backend_name = "polling"
+
+    def wait_changes(self, control=None, poll=0.2):
+        """
+        Bloque jusqu'au prochain lot de modifications.
+
+        Args:
+            control (ScanControl): Jeton consulté toutes les `poll` secondes ; l'attente
+                                   s'arrête dès qu'il est annulé.
+
+        Returns:
+            ChangeBatch: Le lot, ou None si la surveillance a été annulée.
+        """
+        batch = ChangeBatch()
+        first_event = last_event = None
+        while True:
+            if control is not None and control.cancelled:
+                return None
+            if self.backend.read(batch, poll):
+                now = time.monotonic()
+                last_event = now
+                if first_event is None:
+                    first_event = now
+            if batch and last_event is not None:
+                now = time.monotonic()
+                if now - last_event >= SETTLE_DELAY or now - first_event >= MAX_BATCH_DELAY:
+                    return batch
+
+    def close(self):
+        self.backend.close()
@@ -0,0 +1,195 @@
+from array import array
+from itertools import compress
+
+# Champs comparés à la ligne de référence du groupe : bit i des masques de différences = DIFF_FIELDS[i]
+DIFF_FIELDS = ("title", "artist", "album", "bitrate", "duration")
+
+
+def _compare_key(info):
+    """Valeurs de DIFF_FIELDS d'un fichier, comparées comme à l'affichage (texte sans casse, durée à la seconde)."""
+    get = info.get
+    bitrate = get('bitrate', 0) or 0
+    if not isinstance(bitrate, int):
+        try:
+            bitrate = int(bitrate)
+        except (TypeError, ValueError):
+            pass
+    duration = get('duration', 0) or 0
+    return (str(get('title', '') or '').strip().lower(),
+            str(get('artist', '') or '').strip().lower(),
+            str(get('album', '') or '').strip().lower(),
+            bitrate,
+            int(duration) if duration > 0 else -1)
+
+
+def difference_masks(files, ref):
+    """
+    Masque de différences de chaque fichier de `files` avec le fichier de position `ref`
+    (bit i : le champ DIFF_FIELDS[i] diffère ; 0 pour la référence elle-même).
+    """
+    if not files:
+        return bytearray()
+    keys = [_compare_key(info) for info in files]
+    ref_key = keys[ref]
+    r0, r1, r2, r3, r4 = ref_key
+    return bytearray(0 if key == ref_key else
+                     (key[0] != r0) | (key[1] != r1) << 1 | (key[2] != r2) << 2 | (key[3] != r3) << 3
+                     | (key[4] != r4) << 4
+                     for key in keys)
+
+
+class ResultModel:
+    """
+    Lignes de la feuille de résultats, une par fichier affiché, gardées dans des tableaux
+    compacts plutôt qu'en dictionnaires par ligne :
+    - files : file_info de chaque ligne (référence, rien n'est copié) ;
+    - checked : case cochée de chaque ligne (bytearray) ;
+    - row_group : numéro du groupe affiché de chaque ligne (array 'I') ;
+    - masks : champs qui diffèrent de la ligne de référence du groupe (bytearray, voir
+      DIFF_FIELDS), calculés à l'ajout du groupe puis à chaque changement de référence.
+
+    Par groupe affiché, dans l'ordre : la liste source (`groups`), son libellé, sa première
+    ligne, son nombre de lignes, la position du fichier à conserver dans le groupe (-1 s'il
+    n'est pas affiché) et celle de la ligne de référence des comparaisons (`compare_refs` :
+    le fichier à conserver, sinon la première ligne, ou la ligne choisie par l'utilisateur).
+    Un groupe retiré garde son numéro, avec zéro ligne.
+
+    Les valeurs affichées ne sont pas stockées : l'interface formate les lignes quand elle
+    les charge dans la feuille, par groupes entiers ; `loaded` est le nombre de lignes
+    chargées (toujours une fin de groupe).
+    """
+    def __init__(self):
+        self._group_masks = {}
+        self.clear()
+
+    def clear(self, keep_masks=True):
+        # Masques de la construction précédente, repris pour un groupe aux mêmes lignes et à la
+        # même référence (reconstruction après un changement de tolérance, une suppression...)
+        self._previous_masks, self._group_masks = (self._group_masks if keep_masks else {}), {}
+        self.files = []
+        self.checked = bytearray()
+        self.row_group = array('I')
+        self.masks = bytearray()
+        self.groups = []
+        self.labels = []
+        self.starts = array('I')
+        self.counts = array('I')
+        self.references = array('i')
+        self.compare_refs = array('i')
+        self.index = {}  # {id(liste source): numéro du groupe}
+        self.loaded = 0
+
+    def __len__(self):
+        return len(self.files)
+
+    def path(self, row):
+        """Chemin du fichier de la ligne `row` (None hors des lignes)."""
+        return self.files[row]['path'] if 0 <= row < len(self.files) else None
+
+    def group_rows(self, gi):
+        return range(self.starts[gi], self.starts[gi] + self.counts[gi])
+
+    def reference_row(self, gi):
+        """Ligne du fichier à conserver du groupe `gi` (None s'il n'est pas affiché)."""
+        offset = self.references[gi]
+        return self.starts[gi] + offset if offset >= 0 else None
+
+    def loaded_groups(self):
+        """Numéros des groupes dont les lignes sont chargées dans la feuille."""
+        if not self.loaded:
+            return range(0)
+        return range(self.row_group[self.loaded - 1] + 1)
+
+    def group_end(self, row):
+        """Fin (exclue) du groupe de la ligne `row` : les pages s'arrêtent sur une fin de groupe."""
+        if row >= len(self.files):
+            return len(self.files)
+        gi = self.row_group[row]
+        return self.starts[gi] + self.counts[gi]
+
+    def append_group(self, group, label, files, checked, reference):
+        """
+        Ajoute un groupe après les autres.
+
+        Args:
+            group (list): Liste source du groupe (sa clé dans `index`).
+            files (list): file_info des lignes, dans l'ordre d'affichage.
+            checked (iterable): État coché de chaque ligne.
+            reference (int): Position du fichier à conserver dans `files` (-1 : aucun).
+
+        Returns:
+            int: Numéro du groupe.
+        """
+        gi = len(self.groups)
+        self.groups.append(group)
+        self.labels.append(label)
+        self.starts.append(len(self.files))
+        self.counts.append(len(files))
+        self.references.append(reference)
+        self.compare_refs.append(max(reference, 0))
+        self.index[id(group)] = gi
+        self.masks.extend(self._masks(group, files, max(reference, 0)))
+        self.files.extend(files)
+        self.checked.extend(bytes(map(bool, checked)))
+        self.row_group.extend(array('I', [gi]) * len(files))
+        return gi
+
+    def replace_group(self, gi, files, checked, reference):
+        """
+        Remplace les lignes du groupe `gi` (arguments de `append_group`) ; les lignes
+        suivantes sont décalées.
+
+        Returns:
+            tuple: (première ligne, ancien nombre de lignes).
+        """
+        start, count = self.starts[gi], self.counts[gi]
+        self.files[start:start + count] = files
+        self.checked[start:start + count] = bytes(map(bool, checked))
+        self.row_group[start:start + count] = array('I', [gi]) * len(files)
+        self.masks[start:start + count] = self._masks(self.groups[gi], files, max(reference, 0))
+        delta = len(files) - count
+        if delta:
+            starts = self.starts
+            for g in range(gi + 1, len(starts)):
+                starts[g] += delta
+            if start < self.loaded:
+                self.loaded += delta
+        self.counts[gi] = len(files)
+        self.references[gi] = reference
+        self.compare_refs[gi] = max(reference, 0)
+        return start, count
+
+    def _masks(self, group, files, ref):
+        cached = self._previous_masks.get(id(group))
+        if cached is not None and cached[1] == ref and cached[0] == files:
+            masks = cached[2]
+        else:
+            masks = difference_masks(files, ref)
+        self._group_masks[id(group)] = (files, ref, masks)
+        return masks
+
+    def set_compare_row(self, gi, row):
+        """
+        Compare le groupe `gi` à la ligne `row` et recalcule ses seuls masques.
+
+        Returns:
+            list: (ligne, ancien masque, nouveau masque) des lignes dont le masque a changé.
+        """
+        start, count = self.starts[gi], self.counts[gi]
+        if not start <= row < start + count or self.compare_refs[gi] == row - start:
+            return []
+        self.compare_refs[gi] = row - start
+        old = self.masks[start:start + count]
+        new = difference_masks(self.files[start:start + count], row - start)
+        self.masks[start:start + count] = new
+        return [(start + i, a, b) for i, (a, b) in enumerate(zip(old, new)) if a != b]
+
+    def checked_paths(self):
+        return [info['path'] for info in compress(self.files, self.checked)]
+
+    def checked_count(self):
+        return self.checked.count(1)
+
+    def path_states(self):
+        """{chemin: coché} de toutes les lignes (pour conserver les cases lors d'une reconstruction)."""
+        return {info['path']: bool(c) for info, c in zip(self.files, self.checked)}
@@ -1,11 +1,43 @@
-import threading, queue
+import threading, queue, time
 from tkinter import messagebox
-from scanner import scan_duplicates
+from scanner import scan_duplicates, watch_duplicates, DuplicateLibrary, SHORT_FINGERPRINT_LENGTH
+from scan_pipeline import ScanControl
+from scan_stats import REPORT_PATH, format_summary
+from fingerprint_backend import BACKEND_AUTO
+from translations import translate
+
+# Temps maximal (s) consacré aux messages du scan par passage de la boucle Tk
+QUEUE_TIME_BUDGET = 0.05
+# Délai (ms) avant le passage suivant : normal, ou quand des messages restent en attente
+QUEUE_POLL_MS = 150
+QUEUE_BACKLOG_POLL_MS = 10
+
+def _format_eta(seconds):
+    if seconds is None:
+        return '--:--'
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60}:{rest % 60:02d}"
+
+def _run_after(previous, target, *args, **kwargs):
+    """Exécute `target` une fois le thread `previous` (ou None) terminé, hors du thread Tk."""
+    if previous is not None:
+        previous.join()
+    target(*args, **kwargs)
 
 class ScanMixin:
     """Gestion du lancement du scan et du traitement de la file de messages."""
     def _init_scan_state(self):
         self.scan_in_progress = False
+        self.scan_control = None
+        self.scan_status_text = ''
+        self.last_scan_stats = None  # rapport du dernier scan (scan_stats.ScanStats.to_dict())
+        # Tolérance de durée du dernier scan : les fichiers sans durée proche n'y ont pas été empreintés
+        self.scan_duration_tolerance = None
+        # Surveillance des dossiers après le scan (voir scanner.watch_duplicates)
+        self.scan_library = None
+        self.watch_control = None
+        self.watch_thread = None
         self.queue = queue.Queue()
         # Démarrer boucle de traitement
         self.after(150, self.process_queue)
@@ -16,9 +48,16 @@ class ScanMixin:
         if not getattr(self, 'folder_paths', None):
             messagebox.showerror("Erreur", "Veuillez ajouter au moins un dossier.")
             return
+        # Le pipeline est partagé : le scan attend, dans son thread, la fin de la surveillance
+        previous_watch = self.stop_watching()
         self.scan_in_progress = True
+        self.scan_control = ScanControl()
+        self.scan_library = DuplicateLibrary() if getattr(self, 'watch_folders', False) else None
+        self.scan_duration_tolerance = self.duration_similarity_var.get() / 100.0
         try:
             self.scan_button.config(state='disabled')
+            self.pause_button.config(state='normal', text=translate(getattr(self, 'language', 'fr'), 'ui.pause'))
+            self.cancel_button.config(state='normal')
         except Exception:
             pass
         try:  # Désactiver ajout dossiers si présent
@@ -30,25 +69,122 @@ class ScanMixin:
         except Exception:
             pass
         t = threading.Thread(
-            target=scan_duplicates,
-            args=(self.folder_paths.copy(), self.keep_type_var.get(), self.queue, self.similarity_var.get() / 100.0),
+            target=_run_after,
+            args=(previous_watch, scan_duplicates, self.folder_paths.copy(), self.keep_type_var.get(), self.queue,
+                  self.similarity_var.get() / 100.0),
+            kwargs={"acoustic_similarity_threshold": self.acoustic_similarity_var.get() / 100.0,
+                    "tag_write_policy": self.tag_write_policy,
+                    "control": self.scan_control,
+                    "library": self.scan_library,
+                    "report_path": REPORT_PATH,
+                    "duration_tolerance": self.scan_duration_tolerance,
+                    "fingerprint_backend": getattr(self, 'fingerprint_backend', BACKEND_AUTO),
+                    "short_fingerprint_length": (getattr(self, 'short_fingerprint_length', SHORT_FINGERPRINT_LENGTH)
+                                                 if getattr(self, 'two_phase_fingerprint', True) else 0)},
             daemon=True
         )
         t.start()
 
+    def start_watching(self):
+        """Tient les résultats à jour quand des fichiers des dossiers scannés changent."""
+        if self.scan_library is None or self.watch_thread is not None:
+            return
+        self.watch_control = ScanControl()
+        self.watch_thread = threading.Thread(
+            target=watch_duplicates,
+            args=(self.scan_library, self.folder_paths.copy(), self.keep_type_var.get(), self.queue, self.watch_control),
+            kwargs={"tag_write_policy": self.tag_write_policy,
+                    "fingerprint_backend": getattr(self, 'fingerprint_backend', BACKEND_AUTO),
+                    "duration_tolerance": self.scan_duration_tolerance},
+            daemon=True
+        )
+        self.watch_thread.start()
+
+    def stop_watching(self):
+        """
+        Annule la surveillance sans l'attendre (elle consulte son jeton en continu et
+        s'arrête en quelques dixièmes de seconde).
+
+        Returns:
+            threading.Thread: Thread de surveillance en cours d'arrêt, ou None.
+        """
+        if self.watch_control is not None:
+            self.watch_control.cancel()
+        thread = self.watch_thread
+        self.watch_control = None
+        self.watch_thread = None
+        return thread
+
+    def toggle_pause_scan(self):
+        control = self.scan_control
+        if not self.scan_in_progress or control is None or control.cancelled:
+            return
+        lang = getattr(self, 'language', 'fr')
+        if control.paused:
+            control.resume()
+            try: self.pause_button.config(text=translate(lang, 'ui.pause'))
+            except Exception: pass
+        else:
+            control.pause()
+            try:
+                self.pause_button.config(text=translate(lang, 'ui.resume'))
+                self.status_label.config(text=translate(lang, 'ui.scan_paused'))
+            except Exception:
+                pass
+
+    def cancel_scan(self):
+        control = self.scan_control
+        if not self.scan_in_progress or control is None:
+            return
+        control.cancel()
+        try:
+            self.pause_button.config(state='disabled')
+            self.cancel_button.config(state='disabled')
+            self.status_label.config(text=translate(getattr(self, 'language', 'fr'), 'ui.scan_cancelling'))
+        except Exception:
+            pass
+
+    def show_scan_summary(self):
+        lang = getattr(self, 'language', 'fr')
+        text = format_summary(self.last_scan_stats, lang) if self.last_scan_stats else translate(lang, 'stats.none')
+        messagebox.showinfo(translate(lang, 'menu.scan_summary'), text)
+
+    def _show_progress_detail(self, detail):
+        lang = getattr(self, 'language', 'fr')
+        text = translate(lang, 'progress.detail', done=detail['done'], total=detail['total'],
+                         rate=detail['rate'], eta=_format_eta(detail['eta']))
+        stages = [f"{translate(lang, 'progress.stage.' + name)} {count}"
+                  for name, count in detail.get('stages', {}).items() if count]
+        if stages:
+            text += f" ({', '.join(stages)})"
+        try: self.status_label.config(text=f"{self.scan_status_text} — {text}" if self.scan_status_text else text)
+        except Exception: pass
+
     def process_queue(self):
+        streamed = False
+        backlog = False
+        # Budget de temps par passage : une rafale de messages ne gèle pas la boucle Tk
+        deadline = time.monotonic() + QUEUE_TIME_BUDGET
         try:
             while True:
+                if time.monotonic() >= deadline:
+                    backlog = True
+                    break
                 msg_type, data = self.queue.get_nowait()
                 if msg_type == 'status':
+                    self.scan_status_text = data
                     try: self.status_label.config(text=data)
                     except Exception: pass
+                elif msg_type == 'progress_detail':
+                    self._show_progress_detail(data)
                 elif msg_type == 'progress':
                     try: self.progress_bar['value'] = data
                     except Exception: pass
                 elif msg_type == 'progress_max':
                     try: self.progress_bar['maximum'] = data
                     except Exception: pass
+                elif msg_type == 'scan_stats':
+                    self.last_scan_stats = data
                 elif msg_type == 'message':
                     level, text = data
                     try:
@@ -56,20 +192,64 @@ class ScanMixin:
                             'Information' if level == 'info' else 'Erreur', text)
                     except Exception:
                         pass
+                elif msg_type in ('group_added', 'group_updated'):
+                    key, files = data
+                    try:
+                        self.show_streamed_group(key, files)
+                        streamed = True
+                    except Exception:
+                        pass
+                elif msg_type == 'group_removed':
+                    try:
+                        self.remove_streamed_group(data)
+                        streamed = True
+                    except Exception:
+                        pass
                 elif msg_type == 'results':
+                    # Résultat final (groupes acoustiques proches et par titre inclus) : les
+                    # cases déjà cochées/décochées pendant le scan sont conservées
+                    known = self.result_model.path_states() if self.streamed_groups else None
+                    # Les groupes finaux portent la clé des mises à jour de la surveillance
+                    self.streamed_groups = {g.key: g for g in data if getattr(g, 'key', None) is not None}
                     self.all_groups = data
-                    self.redisplay_results(preserve_selection=False)
+                    self.redisplay_results(preserve_selection=False, known_selection=known)
                 elif msg_type == 'finished':
+                    cancelled = self.scan_control is not None and self.scan_control.cancelled
                     self.scan_in_progress = False
+                    self.scan_control = None
+                    self.scan_status_text = ''
                     try: self.scan_button.config(state='normal')
                     except Exception: pass
-                    try: self.status_label.config(text='Analyse terminée.')
+                    try:
+                        self.pause_button.config(state='disabled', text=translate(getattr(self, 'language', 'fr'), 'ui.pause'))
+                        self.cancel_button.config(state='disabled')
+                    except Exception: pass
+                    watching = not cancelled and self.scan_library is not None
+                    if watching:
+                        self.start_watching()
+                    lang = getattr(self, 'language', 'fr')
+                    stats = self.last_scan_stats
+                    if watching:
+                        text = translate(lang, 'ui.watching')
+                    elif stats and stats.get('outcome') == 'completed':
+                        text = translate(lang, 'stats.status', total=stats['total_seconds'] or 0,
+                                         files=stats['counters'].get('files', 0))
+                    else:
+                        text = 'Analyse terminée.'
+                    try: self.status_label.config(text=text)
                     except Exception: pass
                     try: self.progress_bar['value'] = 0
                     except Exception: pass
         except queue.Empty:
             pass
         finally:
-            # Replanifier
-            self.after(150, self.process_queue)
+            if streamed:
+                # Une seule mise à jour visuelle par lot de messages (les groupes reçus sont
+                # déjà surlignés par show_streamed_group)
+                try: self.update_delete_button()
+                except Exception: pass
+                try: self.sheet.redraw()
+                except Exception: pass
+            # Replanifier (rapidement s'il reste des messages)
+            self.after(QUEUE_BACKLOG_POLL_MS if backlog else QUEUE_POLL_MS, self.process_queue)
 
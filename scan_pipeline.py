@@ -0,0 +1,369 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque
+from storage_devices import io_limit
+
+# Valeurs par défaut : le hachage / la lecture de tags attendent surtout le disque,
+# l'empreinte et le parsing consomment du CPU (un processus par cœur).
+DEFAULT_IO_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+DEFAULT_CPU_WORKERS = max(1, (os.cpu_count() or 1))
+
+# Nombre de tâches en vol (ou en attente d'une étape) par worker : borne la mémoire
+QUEUE_FACTOR = 4
+
+# Intervalle (s) de consultation du jeton de pause / annulation pendant l'attente des tâches
+CONTROL_POLL_INTERVAL = 0.2
+
+# Éléments suivants d'un même périphérique dont la lecture anticipée est demandée à chaque soumission
+PREFETCH_DEPTH = 2
+
+
+class ScanCancelled(Exception):
+    """Levée lorsque le scan est annulé par l'utilisateur."""
+
+
+class ScanControl:
+    """
+    Jeton partagé entre l'interface et le thread de scan : annulation et pause.
+
+    Le scan appelle `checkpoint()` entre deux fichiers : l'appel bloque tant que le
+    scan est en pause et lève ScanCancelled s'il a été annulé.
+    """
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()  # débloque un scan en pause pour qu'il s'arrête
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def checkpoint(self, on_pause=None):
+        if self.paused:
+            if on_pause is not None:
+                on_pause()
+            self._running.wait()
+        if self._cancelled.is_set():
+            raise ScanCancelled()
+
+
+# Événement d'annulation vu par les workers (hérité à la création des processus)
+_worker_cancel_event = None
+
+
+def _init_worker(cancel_event):
+    global _worker_cancel_event
+    _worker_cancel_event = cancel_event
+
+
+def worker_cancelled():
+    """Vrai si le scan en cours a été annulé ; à interroger par les tâches longues des workers."""
+    return _worker_cancel_event is not None and _worker_cancel_event.is_set()
+
+
+def _timed_call(fn, *args):
+    """Exécute une tâche dans le worker et mesure sa durée (hors attente dans les files)."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+class Stage:
+    """
+    Une étape du pipeline : un exécuteur, une fonction et une file bornée.
+    `completed` et `busy` (secondes cumulées passées dans les workers) servent
+    à l'instrumentation du scan.
+
+    Avec `batch_size`, l'étape traite ses éléments par lots : `fn` reçoit la liste
+    des arguments d'au plus `batch_size` éléments et retourne la liste de leurs
+    résultats (valeur ou exception), dans le même ordre. `max_pending` compte
+    alors des lots.
+
+    Avec `device_of` (clé -> périphérique), les places de l'étape sont réparties entre
+    les périphériques qui ont du travail : aucun ne peut en occuper plus que sa part,
+    de sorte qu'un disque lent n'immobilise pas les workers pendant que les autres
+    attendent. `device_limit` (périphérique -> nombre ou None) borne en plus les tâches
+    simultanées d'un périphérique (ex. : une seule lecture à la fois sur un disque
+    rotatif). Dans un périphérique, les éléments partent dans leur ordre d'arrivée ;
+    `prefetch` (clé -> None) demande la lecture anticipée des suivants.
+    """
+    def __init__(self, name, executor, fn, max_pending, batch_size=None, device_of=None, device_limit=None,
+                 prefetch=None):
+        self.name = name
+        self.executor = executor
+        self.fn = fn
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.device_of = device_of
+        self.device_limit = device_limit
+        self.prefetch = prefetch
+        self.backlog = deque()  # (clé, args, périphérique ou None)
+        self.in_flight = 0
+        self.device_backlog = {}  # {périphérique: éléments en attente}
+        self.device_in_flight = {}  # {périphérique: tâches en vol}
+        self.prefetched = set()  # clés en attente dont la lecture anticipée est demandée
+        self.completed = 0
+        self.busy = 0.0
+
+    @property
+    def max_backlog(self):
+        """Éléments en attente au-delà desquels la lecture de la source s'interrompt."""
+        return self.max_pending * (self.batch_size or 1)
+
+    def push(self, key, args, device=None):
+        """Met un élément en attente ; `device` : périphérique de sa source, si l'étape ne le calcule pas."""
+        if self.device_of is not None:
+            device = self.device_of(key)
+        self.backlog.append((key, args, device))
+        if device is not None:
+            self.device_backlog[device] = self.device_backlog.get(device, 0) + 1
+
+    def _taken(self, device):
+        if device is not None:
+            self.device_backlog[device] -= 1
+
+    def pop_batch(self):
+        batch = [self.backlog.popleft() for _ in range(min(self.batch_size, len(self.backlog)))]
+        for _, _, device in batch:
+            self._taken(device)
+        return batch
+
+    def pop_ready(self):
+        """Premier élément en attente dont le périphérique a une place libre, ou None."""
+        if self.device_of is None:
+            entry = self.backlog.popleft()
+            self._taken(entry[2])
+            return entry
+        busy = self.device_in_flight
+        devices = {device for _, _, device in self.backlog}
+        devices.update(device for device, count in busy.items() if count)
+        share = -(-self.max_pending // len(devices))
+        limits = {}
+        for k, (key, args, device) in enumerate(self.backlog):
+            if device not in limits:
+                own = self.device_limit(device) if self.device_limit is not None else None
+                limits[device] = min(share, own) if own else share
+            if busy.get(device, 0) < limits[device]:
+                del self.backlog[k]
+                self._taken(device)
+                self.prefetched.discard(key)
+                return key, args, device
+        return None
+
+    def upcoming(self, device, count):
+        """Clés des `count` prochains éléments de `device` dont la lecture anticipée n'est pas encore demandée."""
+        keys = []
+        for key, _, other in self.backlog:
+            if other == device and key not in self.prefetched:
+                keys.append(key)
+                if len(keys) == count:
+                    break
+        return keys
+
+
+class ScanPipeline:
+    """
+    Pools de workers persistants (restent chauds d'un scan à l'autre) :
+    - un pool de threads pour les étapes limitées par les E/S (hachage, lecture de tags) ;
+    - un pool de processus pour les étapes limitées par le CPU (empreinte, parsing).
+    """
+    def __init__(self, io_workers=DEFAULT_IO_WORKERS, cpu_workers=DEFAULT_CPU_WORKERS):
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="scan-io")
+        try:
+            self.cancel_event = multiprocessing.Event()
+            self.cpu_executor = ProcessPoolExecutor(max_workers=cpu_workers, initializer=_init_worker,
+                                                    initargs=(self.cancel_event,))
+        except (OSError, NotImplementedError, ImportError):
+            # Plateforme sans multiprocessing fonctionnel : repli sur des threads
+            self.cancel_event = threading.Event()
+            self.cpu_executor = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="scan-cpu")
+        # Les étapes exécutées dans ce processus (threads) voient le même événement
+        _init_worker(self.cancel_event)
+
+    def io_stage(self, name, fn, device_of=None, prefetch=None):
+        """
+        Étape dans le pool de threads. Avec `device_of` (clé -> périphérique, voir
+        `storage_devices.device_of`), les lectures sont réparties entre périphériques et
+        limitées selon leur sorte (`storage_devices.IO_CONCURRENCY`).
+        """
+        return Stage(name, self.io_executor, fn, self.io_workers * QUEUE_FACTOR, device_of=device_of,
+                     device_limit=io_limit, prefetch=prefetch)
+
+    def cpu_stage(self, name, fn, device_of=None, prefetch=None):
+        """
+        Étape dans le pool de processus. Avec `device_of`, les places sont réparties entre
+        périphériques, sans autre limite : le décodage garde tous les cœurs occupés même
+        quand la bibliothèque tient sur un seul disque rotatif.
+        """
+        return Stage(name, self.cpu_executor, fn, self.cpu_workers * QUEUE_FACTOR, device_of=device_of,
+                     prefetch=prefetch)
+
+    def batch_stage(self, name, fn, batch_size):
+        """
+        Étape par lots dans le pool de processus (un lot en vol par worker). Un lot part
+        dès qu'il est plein ; un lot incomplet part quand plus rien ne peut le compléter
+        (source épuisée, autres étapes vides).
+        """
+        return Stage(name, self.cpu_executor, fn, self.cpu_workers, batch_size=batch_size)
+
+    def run(self, items, stages, route, control=None, on_pause=None):
+        """
+        Fait circuler les éléments à travers les étapes.
+
+        Args:
+            items (iterable | dict): Séquence de (nom_étape, clé, args) à injecter, ou
+                                     {périphérique: séquence} : chaque périphérique est alors
+                                     lu à son rythme (voir `Stage`), sans qu'un disque lent
+                                     remplisse les files au détriment des autres.
+            stages (dict): {nom: Stage}.
+            route (callable): route(nom_étape, clé, résultat_ou_exception) -> itérable de
+                              (nom_étape_suivante, clé, args) à soumettre ensuite.
+            control (ScanControl): Jeton de pause / annulation, consulté avant chaque
+                                   soumission ; en pause, les tâches en vol se terminent
+                                   mais aucune nouvelle n'est lancée.
+            on_pause (callable): Appelé à l'entrée en pause (ex. : commit de l'index).
+
+        La lecture de `items` s'arrête tant que la file d'une étape est pleine
+        (contre-pression ; par périphérique avec un dict), de sorte que la mémoire reste
+        bornée quelle que soit la taille de la bibliothèque.
+
+        Raises:
+            ScanCancelled: si le scan est annulé ; les tâches en attente sont abandonnées
+                           et celles en vol sont interrompues (voir `worker_cancelled`).
+        """
+        futures = {}
+        try:
+            self._run(items, stages, route, control, on_pause, futures)
+        except BaseException:
+            # Annulation ou erreur : abandonner le travail en attente, interrompre celui en vol
+            self.cancel_event.set()
+            for fut in futures:
+                fut.cancel()
+            wait(futures)
+            raise
+        finally:
+            self.cancel_event.clear()
+
+    def _run(self, items, stages, route, control, on_pause, futures):
+        if isinstance(items, dict):
+            sources = {device: iter(source) for device, source in items.items()}
+        else:
+            sources = {None: iter(items)}
+        source_done = False
+
+        def backlog_full(device=None):
+            if device is None:
+                return any(len(s.backlog) >= s.max_backlog for s in stages.values())
+            return any(s.device_backlog.get(device, 0) >= s.max_backlog for s in stages.values())
+
+        def upstream_idle(stage):
+            # Plus aucun élément ne peut rejoindre le lot incomplet de `stage`
+            return source_done and all(not s.backlog and not s.in_flight for s in stages.values() if s is not stage)
+
+        while True:
+            paused = control is not None and control.paused
+            if control is not None and control.cancelled:
+                raise ScanCancelled()
+            if not paused:
+                for device, source in list(sources.items()):
+                    if backlog_full(device):
+                        continue
+                    for name, key, args in source:
+                        stages[name].push(key, args, device)
+                        if backlog_full(device):
+                            break
+                    else:
+                        del sources[device]
+                source_done = not sources
+                for stage in stages.values():
+                    while stage.backlog and stage.in_flight < stage.max_pending:
+                        device = None
+                        if stage.batch_size:
+                            if len(stage.backlog) < stage.batch_size and not upstream_idle(stage):
+                                break
+                            batch = stage.pop_batch()
+                            key = [k for k, _, _ in batch]
+                            args = ([a for _, a, _ in batch],)
+                        else:
+                            ready = stage.pop_ready()
+                            if ready is None:
+                                break  # tous les périphériques en attente sont à leur limite
+                            key, args, device = ready
+                            if stage.device_of is None:
+                                device = None
+                        fut = stage.executor.submit(_timed_call, stage.fn, *args)
+                        futures[fut] = (stage, key, device)
+                        stage.in_flight += 1
+                        if device is not None:
+                            stage.device_in_flight[device] = stage.device_in_flight.get(device, 0) + 1
+                            if stage.prefetch is not None:
+                                for next_key in stage.upcoming(device, PREFETCH_DEPTH):
+                                    stage.prefetched.add(next_key)
+                                    self.io_executor.submit(stage.prefetch, next_key)
+            if not futures:
+                if source_done and not any(s.backlog for s in stages.values()):
+                    return
+                if paused:
+                    # Tâches en vol terminées et traitées : attendre la reprise
+                    control.checkpoint(on_pause)
+                continue
+            # Attente bornée : une annulation est prise en compte même pendant une tâche longue
+            done, _ = wait(futures, timeout=CONTROL_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for fut in done:
+                stage, key, device = futures.pop(fut)
+                stage.in_flight -= 1
+                if device is not None:
+                    stage.device_in_flight[device] -= 1
+                exc = fut.exception()
+                if exc is None:
+                    result, elapsed = fut.result()
+                    stage.busy += elapsed
+                if stage.batch_size:
+                    outcomes = zip(key, [exc] * len(key) if exc else result)
+                else:
+                    outcomes = [(key, exc if exc else result)]
+                for item_key, item_result in outcomes:
+                    stage.completed += 1
+                    for next_name, next_key, next_args in route(stage.name, item_key, item_result) or ():
+                        stages[next_name].push(next_key, next_args)
+
+    def shutdown(self):
+        self.io_executor.shutdown(wait=False, cancel_futures=True)
+        self.cpu_executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline(io_workers=None, cpu_workers=None):
+    """Retourne le pipeline partagé, recréé seulement si le nombre de workers change."""
+    global _pipeline
+    io_workers = io_workers or DEFAULT_IO_WORKERS
+    cpu_workers = cpu_workers or DEFAULT_CPU_WORKERS
+    with _pipeline_lock:
+        if _pipeline is not None and (_pipeline.io_workers, _pipeline.cpu_workers) != (io_workers, cpu_workers):
+            _pipeline.shutdown()
+            _pipeline = None
+        if _pipeline is None:
+            _pipeline = ScanPipeline(io_workers, cpu_workers)
+        return _pipeline
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import datetime
+from contextlib import contextmanager
+from translations import translate
+
+# Rapport JSON du dernier scan, à côté de l'application (comme column_config.json)
+REPORT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scan_report.json")
+
+# Exemples de fichiers conservés par catégorie d'échec
+MAX_FAILURE_EXAMPLES = 20
+
+
+class ScanStats:
+    """
+    Instrumentation d'un scan : temps et volumes par étape, taux de succès des caches
+    et échecs par catégorie. Remplie par le thread de scan, puis envoyée à l'interface
+    (message "scan_stats") et écrite en JSON (`write_json`).
+
+    Deux sortes d'étapes :
+    - les phases du scan (parcours, empreintes, regroupements...), chronométrées en
+      temps réel avec `phase` ;
+    - les tâches des workers (échantillon, hachage complet, tags, fpcalc...), dont le
+      temps cumulé, le nombre de fichiers et les octets lus s'ajoutent avec `add_task`.
+      Elles s'exécutent en parallèle : leur somme peut dépasser le temps réel.
+    """
+    def __init__(self):
+        self.started_at = datetime.datetime.now()
+        self._started = time.perf_counter()
+        self.total_seconds = None
+        self.outcome = None
+        self.info = {}       # informations libres (ex. : moteur d'empreinte)
+        self.phases = {}     # {nom: secondes}
+        self.tasks = {}      # {nom: {"files", "bytes", "seconds"}}
+        self.counters = {}   # {nom: nombre}
+        self.failures = {}   # {catégorie: {"count", "examples": [[chemin, erreur], ...]}}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def add_task(self, name, seconds=0.0, files=1, bytes_read=0):
+        task = self.tasks.setdefault(name, {"files": 0, "bytes": 0, "seconds": 0.0})
+        task["files"] += files
+        task["bytes"] += bytes_read
+        task["seconds"] += seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def failure(self, category, path, error):
+        entry = self.failures.setdefault(category, {"count": 0, "examples": []})
+        entry["count"] += 1
+        if len(entry["examples"]) < MAX_FAILURE_EXAMPLES:
+            entry["examples"].append([path, str(error)])
+
+    def finish(self, outcome):
+        self.total_seconds = time.perf_counter() - self._started
+        self.outcome = outcome
+
+    def hit_rates(self):
+        """
+        Taux de succès (None si sans objet) :
+        - index : fichiers relus depuis l'index persistant, parmi tous les fichiers ;
+        - tag_fingerprint : empreintes trouvées en tag, parmi les fichiers analysés ;
+        - content_hash : fichiers dont l'empreinte a été reprise d'une copie identique
+          (hachage SHA-1), parmi ceux hachés ;
+        - fpcalc / chromaprint : fichiers dont l'empreinte a été calculée par fpcalc
+          (un processus par fichier) ou par libchromaprint en processus, parmi tous les fichiers
+          (empreinte courte ou complète de la première passe ; la passe complète des candidats
+          est comptée à part, dans `<moteur>_full_runs`).
+        """
+        c = self.counters.get
+
+        def rate(hits, total):
+            return round(hits / total, 4) if total else None
+
+        return {
+            "index": rate(c("index_hits", 0), c("files", 0)),
+            "tag_fingerprint": rate(c("tag_fingerprints", 0), c("parsed", 0)),
+            "content_hash": rate(c("hash_cache_hits", 0), c("hashed_files", 0)),
+            "fpcalc": rate(c("fpcalc_runs", 0), c("files", 0)),
+            "chromaprint": rate(c("chromaprint_runs", 0), c("files", 0)),
+        }
+
+    def to_dict(self):
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "total_seconds": round(self.total_seconds, 4) if self.total_seconds is not None else None,
+            "outcome": self.outcome,
+            "info": dict(self.info),
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+            "tasks": {name: dict(task, seconds=round(task["seconds"], 4)) for name, task in self.tasks.items()},
+            "counters": dict(self.counters),
+            "hit_rates": self.hit_rates(),
+            "failures": {category: {"count": e["count"], "examples": [list(x) for x in e["examples"]]}
+                         for category, e in self.failures.items()},
+        }
+
+    def write_json(self, path=REPORT_PATH):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+def _percent(rate):
+    return "—" if rate is None else f"{rate * 100:.0f} %"
+
+
+def format_summary(report, lang="fr"):
+    """Résumé lisible d'un rapport (`ScanStats.to_dict()`), pour l'interface et la ligne de commande."""
+    outcome = translate(lang, f"stats.outcome.{report.get('outcome')}")
+    sep = " : " if lang == "fr" else ": "
+    lines = [translate(lang, "stats.title", outcome=outcome, total=report.get("total_seconds") or 0,
+                       files=report["counters"].get("files", 0))]
+    for key, value in report.get("info", {}).items():
+        lines.append(f"{translate(lang, 'stats.info.' + key)}{sep}{value}")
+    lines.append("")
+    lines.append(translate(lang, "stats.phases"))
+    for name, seconds in report["phases"].items():
+        lines.append(f"  {translate(lang, 'stats.phase.' + name)}{sep}{seconds:.2f} s")
+    if report["tasks"]:
+        lines.append(translate(lang, "stats.tasks"))
+        for name, task in report["tasks"].items():
+            key = "stats.task_line_bytes" if task["bytes"] else "stats.task_line"
+            lines.append("  " + translate(lang, key, name=translate(lang, "stats.task." + name),
+                                          files=task["files"], seconds=task["seconds"], mb=task["bytes"] / 1e6))
+    rates = {key: _percent(rate) for key, rate in report["hit_rates"].items()}
+    lines.append(translate(lang, "stats.hit_rates", **rates))
+    counters = report["counters"]
+    if "duration_skipped" in counters:
+        lines.append(translate(lang, "stats.duration_skipped", skipped=counters["duration_skipped"]))
+    if "two_phase_candidates" in counters:
+        lines.append(translate(lang, "stats.two_phase", short=counters.get("short_fingerprints", 0),
+                               candidates=counters["two_phase_candidates"],
+                               full=counters.get("fpcalc_full_runs", 0) + counters.get("chromaprint_full_runs", 0)))
+    fpcalc_files = counters.get("fpcalc_runs", 0) + counters.get("fpcalc_full_runs", 0)
+    if fpcalc_files:
+        lines.append(translate(lang, "stats.fpcalc_processes", processes=counters.get("fpcalc_processes", 0),
+                               files=fpcalc_files))
+    if report["failures"]:
+        lines.append(translate(lang, "stats.failures"))
+        for category, entry in report["failures"].items():
+            lines.append(f"  {translate(lang, 'stats.failure.' + category)}{sep}{entry['count']}")
+            for path, error in entry["examples"][:3]:
+                lines.append(f"    {path or ''} ({error})")
+    else:
+        lines.append(translate(lang, "stats.no_failures"))
+    return "\n".join(lines)
@@ -1,60 +1,583 @@
 import os
-import subprocess
+import sys
+import json
+import argparse
+import shutil
 from mutagen import File
 import acoustid
 import traceback
 import hashlib
+import functools
+import contextlib
 import difflib
+import threading
 import re
+import bisect
+import math
+import time
+from array import array
+from collections import namedtuple, deque, Counter
 from mutagen.id3 import ID3, TXXX, ID3NoHeaderError
 from mutagen.flac import FLAC
 from mutagen.oggvorbis import OggVorbis
 from mutagen.mp4 import MP4
+from fingerprint_index import FingerprintIndex, INDEX_PATH
+from scan_pipeline import get_pipeline, ScanCancelled
+from acoustic_match import (AcousticIndex, MIN_SUPPORTED_SIMILARITY, find_similar_pairs, pack_fingerprint,
+                            unpack_fingerprint)
+from clustering import cluster, EVIDENCE_CONTENT_HASH, EVIDENCE_FINGERPRINT, EVIDENCE_ACOUSTIC, EVIDENCE_TITLE
+from scan_stats import ScanStats, format_summary
+from library_watcher import LibraryWatcher
+from storage_devices import device_of, device_kind, ReadAhead, advise_sequential
+from fingerprint_backend import (get_backend, create_backend, BackendUnavailable, FpcalcBackend, BACKEND_AUTO,
+                                 FINGERPRINT_BACKENDS, FPCALC_BATCH_SIZE)
 
 # Path to the fpcalc executable (assuming it's in the same directory)
 FPCALC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fpcalc.exe")
 
-def file_sha1(path, block_size=65536):
+# Taille des échantillons (début + fin) hachés pour départager les fichiers de même taille
+SAMPLE_SIZE = 65536
+HASH_BLOCK_SIZE = 1024 * 1024
+# Début de fichier lu à l'avance avant la lecture des seules métadonnées
+METADATA_READ_AHEAD = 256 * 1024
+
+_hash_buffers = threading.local()
+
+def _hash_buffer(size):
+    """Tampon réutilisable par thread : évite une allocation par bloc lu."""
+    buf = getattr(_hash_buffers, 'buf', None)
+    if buf is None or len(buf) < size:
+        buf = _hash_buffers.buf = bytearray(size)
+    return memoryview(buf)[:size]
+
+def _open_for_read(path, read_ahead=None):
+    """Ouverture binaire non tamponnée, qui reprend le descripteur lu à l'avance par `read_ahead` (ReadAhead)."""
+    return read_ahead.open(path) if read_ahead is not None else open(path, 'rb', buffering=0)
+
+def file_sha1(path, block_size=HASH_BLOCK_SIZE, read_ahead=None):
     sha1 = hashlib.sha1()
+    view = _hash_buffer(block_size)
+    try:
+        with _open_for_read(path, read_ahead) as f:
+            advise_sequential(f.fileno())
+            while True:
+                n = f.readinto(view)
+                if not n:
+                    break
+                sha1.update(view[:n])
+        return sha1.hexdigest()
+    except Exception:
+        return None
+
+def file_sample_hash(path, size, sample_size=SAMPLE_SIZE, read_ahead=None):
+    """Hache le début et la fin du fichier (plus sa taille) : départage à moindre coût les fichiers de même taille."""
+    sha1 = hashlib.sha1(str(size).encode())
+    view = _hash_buffer(sample_size)
     try:
-        with open(path, 'rb') as f:
-            for block in iter(lambda: f.read(block_size), b''):
-                sha1.update(block)
+        with _open_for_read(path, read_ahead) as f:
+            n = f.readinto(view)
+            sha1.update(view[:n])
+            if size > 2 * sample_size:
+                f.seek(size - sample_size)
+                n = f.readinto(view)
+                sha1.update(view[:n])
+            elif size > sample_size:
+                n = f.readinto(view)
+                sha1.update(view[:n])
         return sha1.hexdigest()
     except Exception:
         return None
 
+# Valeur des tags absents (voir `read_metadata`) : un titre absent n'est pas un indice de doublon
+MISSING_TAG = 'N/A'
+
 def clean_title(title):
     """Nettoie le titre en supprimant ce qui est entre parenthèses ou crochets et en passant en minuscules."""
-    if not isinstance(title, str):
+    if not isinstance(title, str) or title == MISSING_TAG:
         return ''
     # Supprimer ce qui est entre parenthèses ou crochets
     cleaned = re.sub(r'\([^)]*\)|\[[^\]]*\]', '', title)
     # Supprimer les espaces en trop et passer en minuscules
     return cleaned.strip().lower()
 
+def _title_bigrams(title):
+    """Bigrammes du titre (bornés par des marqueurs de début/fin), numérotés par occurrence."""
+    padded = f"\x02{title}\x03"
+    seen = {}
+    grams = []
+    for k in range(len(padded) - 1):
+        g = padded[k:k + 2]
+        seen[g] = seen.get(g, 0) + 1
+        grams.append((g, seen[g]))
+    return grams
+
 def group_by_title_similarity(file_infos, threshold=0.8):
+    """
+    Regroupe les fichiers dont les titres nettoyés ont un ratio `difflib` >= threshold.
+
+    Chaque titre non encore groupé sert de référence (dans l'ordre de la liste) et
+    attire les titres suivants assez proches de lui. Les titres sont nettoyés une seule
+    fois et dédoublonnés (jointure exacte) : la comparaison se fait entre titres distincts.
+
+    Pour éviter la comparaison de toutes les paires, les candidats proviennent d'un index
+    inversé de bigrammes avec filtrage par préfixe. Les blocs appariés par `SequenceMatcher`
+    forment une sous-séquence commune, donc deux titres de longueurs la et lb dont le ratio
+    atteint t partagent au moins (la + lb) * (1.5 * t - 1) + 1 bigrammes. Pour un titre, le
+    minimum de cette borne sur les longueurs compatibles (la plus courte si 1.5 * t >= 1,
+    la plus longue sinon) donne le nombre de bigrammes partagés garanti avec tout candidat :
+    le titre est indexé, et cherche ses candidats, par ses bigrammes les plus rares en nombre
+    suffisant pour ne manquer aucune paire (filtrage par préfixe). Quand ce minimum est
+    inférieur à 1 (seuils bas, sous 2/3 environ), rien n'est garanti : le titre est comparé
+    à tous ceux de longueur compatible, comme sans index. Le résultat est donc celui de la
+    comparaison de toutes les paires. Les listes de l'index sont partitionnées par longueur
+    de titre (seules les longueurs compatibles avec le seuil sont parcourues), et la borne
+    sur les bigrammes partagés écarte la plupart des candidats avant la vérification par
+    `SequenceMatcher` contre `threshold`.
+    """
+    files_by_title = {}
+    for i, f in enumerate(file_infos):
+        title = clean_title(f['title'])
+        if title:
+            files_by_title.setdefault(title, []).append(i)
+    titles = list(files_by_title)
+    gram_lists = [_title_bigrams(t) for t in titles]
+    doc_freq = {}
+    for grams in gram_lists:
+        for g in grams:
+            doc_freq[g] = doc_freq.get(g, 0) + 1
+    shared_per_char = 1.5 * threshold - 1
+    # Fenêtre de longueurs compatibles : 2 * min / (la + lb) >= threshold
+    low_factor = threshold / (2 - threshold) if threshold < 2 else 0
+    gram_sets = []
+    prefixes = []     # bigrammes de recherche de chaque titre (vide : titre comparé à tous)
+    postings = {}     # {bigramme: {longueur: [titres]}}
+    unindexed = {}    # {longueur: [titres sans bigramme garanti]}
+    for t, grams in enumerate(gram_lists):
+        grams.sort(key=lambda g: (doc_freq[g], g))
+        gram_sets.append(frozenset(grams))
+        length = len(titles[t])
+        # Longueur de partenaire où la borne est la plus faible
+        if shared_per_char >= 0:
+            partner = length * low_factor
+        else:
+            partner = length / low_factor if low_factor else float('inf')
+        required = math.ceil((length + partner) * shared_per_char + 1 - 1e-9) if partner != float('inf') else 0
+        if required < 1:
+            prefixes.append(())
+            unindexed.setdefault(length, []).append(t)
+            continue
+        prefix = grams[:max(1, len(grams) - required + 1)]
+        prefixes.append(prefix)
+        for g in prefix:
+            postings.setdefault(g, {}).setdefault(length, []).append(t)
+
+    postings_by_length = {}
+    if unindexed:
+        for t, title in enumerate(titles):
+            postings_by_length.setdefault(len(title), []).append(t)
+
     groups = []
-    used = set()
-    for i, f1 in enumerate(file_infos):
-        if i in used:
+    used = bytearray(len(titles))
+    matcher = difflib.SequenceMatcher(None)
+    for t, title1 in enumerate(titles):
+        if used[t]:
             continue
-        group = [f1]
-        used.add(i)
-        title1 = clean_title(f1['title'])
-        for j, f2 in enumerate(file_infos):
-            if j <= i or j in used:
+        used[t] = 1
+        len1 = len(title1)
+        min_len = len1 * low_factor - 1e-9
+        max_len = len1 / low_factor + 1e-9 if low_factor else float('inf')
+        candidates = set()
+        # Titres sans bigramme garanti : candidats dès que leur longueur est compatible
+        for length, posting in unindexed.items():
+            if min_len <= length <= max_len:
+                candidates.update(posting[bisect.bisect_right(posting, t):])
+        if prefixes[t]:
+            for g in prefixes[t]:
+                for length, posting in postings.get(g, {}).items():
+                    if min_len <= length <= max_len:
+                        candidates.update(posting[bisect.bisect_right(posting, t):])
+        else:
+            # Rien de garanti pour ce titre : tous les titres de longueur compatible
+            for length, posting in postings_by_length.items():
+                if min_len <= length <= max_len:
+                    candidates.update(posting[bisect.bisect_right(posting, t):])
+        matcher.set_seq1(title1)
+        grams1 = gram_sets[t]
+        members = list(files_by_title[title1])
+        for c in candidates:
+            if used[c]:
                 continue
-            title2 = clean_title(f2['title'])
-            if title1 and title2:
-                ratio = difflib.SequenceMatcher(None, title1, title2).ratio()
-                if ratio >= threshold:
-                    group.append(f2)
-                    used.add(j)
-        if len(group) > 1:
-            groups.append(group)
+            title2 = titles[c]
+            # Borne sur le nombre de bigrammes partagés avant la comparaison complète
+            if len(grams1 & gram_sets[c]) < (len1 + len(title2)) * shared_per_char + 1 - 1e-9:
+                continue
+            matcher.set_seq2(title2)
+            if matcher.ratio() >= threshold:
+                members.extend(files_by_title[title2])
+                used[c] = 1
+        if len(members) > 1:
+            groups.append([file_infos[i] for i in sorted(members)])
     return groups
 
+class DuplicateGroup(list):
+    """
+    Groupe de doublons (liste de file_info) portant une clé stable entre deux mises à jour,
+    et les indices qui relient ses fichiers : {sorte (`clustering.EVIDENCE_KINDS`): nombre de liens}.
+    """
+    def __init__(self, files=(), key=None, evidence=None):
+        super().__init__(files)
+        self.key = key
+        self.evidence = dict(evidence or {})
+
+def _packed(fingerprint):
+    """Forme compacte (`pack_fingerprint`) d'une empreinte, déjà compacte ou None ; une chaîne
+    qui n'est pas du base64 (tag corrompu) est gardée telle quelle."""
+    if not isinstance(fingerprint, str):
+        return fingerprint
+    try:
+        return pack_fingerprint(fingerprint)
+    except ValueError:
+        return fingerprint
+
+def _unpacked(fingerprint):
+    """Chaîne fpcalc d'une empreinte gardée par `_packed` (pour l'index, les tags et les workers)."""
+    return unpack_fingerprint(fingerprint) if isinstance(fingerprint, bytes) else fingerprint
+
+def fingerprint_key(packed):
+    """Clé de regroupement de 16 octets d'une empreinte compacte : deux empreintes identiques ont la même."""
+    if isinstance(packed, str):
+        packed = packed.encode("utf-8")
+    return hashlib.blake2b(packed, digest_size=16).digest()
+
+class DuplicateLibrary:
+    """
+    État groupé de la bibliothèque (fichiers, empreintes, indices, groupes), conservé
+    après un scan pour être mis à jour fichier par fichier par la surveillance des
+    dossiers (voir `watch_duplicates`), sans tout regrouper.
+
+    Les groupes sont les composantes connexes d'un graphe d'indices entre fichiers,
+    calculées par union-find (`clustering.cluster`) : contenu identique (SHA-1), empreinte
+    identique, empreintes acoustiquement proches (voir `acoustic_match.AcousticIndex`) et
+    titres proches. Les liens par titre relient chaque fichier au titre de référence de
+    son groupe de titres, construit en lot par `group_by_title_similarity`, puis entretenu
+    de façon gloutonne : un fichier sans lien de titre rejoint la première référence assez
+    proche, ou en devient une pour les fichiers sans lien de titre proches. Le titre est un
+    indice faible (`clustering.WEAK_EVIDENCE`) : un groupe de titres qui touche un groupe
+    acoustique le rejoint, mais deux groupes reliés par contenu ou empreinte ne sont jamais
+    fusionnés par leurs titres. Chaque groupe note les indices qui relient ses fichiers
+    (`DuplicateGroup.evidence`).
+
+    À chaque mise à jour, seules les composantes autour des fichiers touchés sont
+    recalculées, ce qui fusionne ou scinde les groupes concernés.
+
+    Un fichier sans empreinte (None : écarté par le préfiltre par durée) ne peut être
+    relié que par son titre. Une empreinte courte (passe courte du scan, sans voisine)
+    n'est jamais reliée acoustiquement : elle ne couvre que le début du morceau, et doit
+    d'abord être remplacée par l'empreinte complète (voir `short_neighbours`).
+
+    Les empreintes ne sont gardées qu'une fois, sous forme compacte, dans `self.acoustic` ;
+    les dictionnaires les désignent par leur clé de 16 octets (`fingerprint_key`).
+    """
+    def __init__(self):
+        self.acoustic_threshold = 0.85
+        self.title_threshold = 0.8
+        self._reset()
+
+    def _reset(self):
+        self.files = {}          # {chemin: (file_info, clé d'empreinte ou None)} dans l'ordre de collecte
+        self.order = {}          # {chemin: rang de collecte}
+        self.titles = {}         # {chemin: titre nettoyé}
+        self.hashes = {}         # {chemin: SHA-1 (20 octets)} des fichiers hachés
+        self.paths_by_hash = {}  # {SHA-1: [chemins]}
+        self.paths_by_fp = {}    # {clé d'empreinte: [chemins]}
+        self.fp_ids = {}         # {clé d'empreinte: identifiant dans self.acoustic}
+        self.fp_keys = []        # {identifiant dans self.acoustic: clé d'empreinte}
+        self.links = {}          # {clé d'empreinte: {clés acoustiquement proches}}, seulement si non vide
+        self.short_keys = set()  # clés des empreintes courtes (passe courte du scan)
+        self.acoustic = AcousticIndex()
+        self.title_links = {}    # {chemin: {chemins liés par le titre}}, seulement si non vide
+        self.title_seeds = {}    # {chemin de référence d'un groupe de titres: titre nettoyé}
+        self.groups = {}         # {clé: DuplicateGroup} ; clé ("fp", id) ou ("title", premier chemin)
+        self.group_of = {}       # {chemin: clé de son groupe}
+        self._rank = 0
+
+    def build(self, entries, acoustic_threshold=0.85, title_threshold=0.8, stats=None, content_hashes=None,
+              short_keys=()):
+        """
+        Regroupe toute la bibliothèque en lot.
+
+        Args:
+            entries (list): Tuples (file_info, empreinte) dans l'ordre de collecte ; l'empreinte
+                            est une chaîne fpcalc, sa forme compacte (`pack_fingerprint`) ou None.
+            stats (ScanStats): Reçoit la durée des liens acoustiques, par titre et du regroupement.
+            content_hashes (dict): {chemin: SHA-1} des fichiers hachés pendant le scan.
+            short_keys (set): Clés (`fingerprint_key`) des empreintes courtes parmi celles de `entries`.
+        """
+        phase = stats.phase if stats is not None else (lambda name: contextlib.nullcontext())
+        content_hashes = content_hashes or {}
+        self._reset()
+        self.acoustic_threshold = acoustic_threshold
+        self.title_threshold = title_threshold
+        with phase("acoustic_grouping"):
+            for info, fp in entries:
+                self._insert(info, fp, content_hashes.get(info["path"]))
+            self.short_keys = set(short_keys) & self.paths_by_fp.keys()
+            for i, j, _ in self.acoustic.pairs(acoustic_threshold):
+                if self.fp_keys[i] not in self.short_keys and self.fp_keys[j] not in self.short_keys:
+                    self._link(self.fp_keys[i], self.fp_keys[j])
+        with phase("title_grouping"):
+            infos = [info for info, _ in self.files.values()]
+            for group in group_by_title_similarity(infos, threshold=title_threshold):
+                self._add_title_seed(group[0]["path"], [f["path"] for f in group[1:]])
+        with phase("clustering"):
+            self._regroup(self.files)
+
+    def update(self, changed, removed=(), content_hashes=None):
+        """
+        Applique des fichiers créés, modifiés ou supprimés et regroupe autour d'eux.
+
+        Args:
+            changed (dict): {chemin: (file_info, empreinte)} des fichiers créés ou modifiés.
+            removed (iterable): Chemins supprimés (fichiers, ou dossiers entiers).
+            content_hashes (dict): {chemin: SHA-1} des fichiers modifiés, s'ils ont été hachés.
+
+        Returns:
+            tuple: (groupes créés ou modifiés, clés des groupes disparus).
+        """
+        content_hashes = content_hashes or {}
+        changed = {path: (info, _packed(fp)) for path, (info, fp) in changed.items()}
+        changed = {path: entry for path, entry in changed.items()
+                   if self.files.get(path) != (entry[0], entry[1] and fingerprint_key(entry[1]))}
+        before = {key: [f["path"] for f in group] for key, group in self.groups.items()}
+        gone = {path for path in removed if path in self.files}
+        folders = tuple(os.path.join(path, "") for path in removed if path not in self.files)
+        if folders:
+            gone.update(path for path in self.files if path.startswith(folders))
+        touched = set(changed)  # chemins dont la composante est à recalculer
+        loose = set()  # fichiers ayant perdu leur lien de titre
+        for path in gone | (self.files.keys() & changed.keys()):
+            touched |= self._discard(path, loose)
+        for path, (info, fp) in changed.items():
+            self._insert(info, fp, content_hashes.get(path), query=True)
+            loose.add(path)
+        for path in sorted(loose & self.files.keys(), key=self.order.__getitem__):
+            if path not in self.title_links:
+                self._place_by_title(path)
+        self._regroup(self._component(touched | loose))
+        updated = [group for key, group in self.groups.items()
+                   if before.get(key) != [f["path"] for f in group]]
+        return updated, [key for key in before if key not in self.groups]
+
+    def unfingerprinted_near(self, durations, tolerance):
+        """
+        Fichiers sans empreinte dont la durée est proche (rapport min/max d'au moins
+        `tolerance`) de l'une de `durations` : ils peuvent désormais avoir un doublon.
+        Une durée inconnue (0) reste hors de la règle (voir `_without_close_duration`).
+        """
+        durations = [d for d in durations if d]
+        return [path for path, (info, fp) in self.files.items()
+                if fp is None and info["duration"]
+                and any(min(d, info["duration"]) / max(d, info["duration"]) >= tolerance for d in durations)]
+
+    def short_neighbours(self, fingerprints):
+        """
+        Fichiers n'ayant qu'une empreinte courte dont le début ressemble à l'une de
+        `fingerprints`, au seuil abaissé de la passe courte (`SHORT_FINGERPRINT_MARGIN`) :
+        comme lors du scan, leur empreinte complète décidera du lien.
+        """
+        if not self.short_keys:
+            return set()
+        threshold = self.acoustic_threshold - SHORT_FINGERPRINT_MARGIN
+        paths = set()
+        for fp in fingerprints:
+            packed = _packed(fp)
+            if packed is None:
+                continue
+            key = fingerprint_key(packed)
+            if key in self.short_keys:
+                paths.update(self.paths_by_fp[key])
+            for other_id, _ in self.acoustic.match(packed, threshold):
+                other = self.fp_keys[other_id]
+                if other in self.short_keys:
+                    paths.update(self.paths_by_fp[other])
+        return paths
+
+    def _insert(self, info, fp, content_hash=None, query=False):
+        path = info["path"]
+        packed = _packed(fp)
+        key = fingerprint_key(packed) if packed is not None else None
+        self.files[path] = (info, key)
+        self.order[path] = self._rank
+        self._rank += 1
+        self.titles[path] = sys.intern(clean_title(info["title"]))
+        if content_hash:
+            digest = bytes.fromhex(content_hash) if isinstance(content_hash, str) else content_hash
+            self.hashes[path] = digest
+            self.paths_by_hash.setdefault(digest, []).append(path)
+        if key is None:
+            return
+        paths = self.paths_by_fp.setdefault(key, [])
+        paths.append(path)
+        if len(paths) == 1:
+            fp_id = self.fp_ids[key] = self.acoustic.add(packed)
+            self.fp_keys.append(key)
+            if query:
+                for other_id, _ in self.acoustic.query(fp_id, self.acoustic_threshold):
+                    if self.fp_keys[other_id] not in self.short_keys:
+                        self._link(key, self.fp_keys[other_id])
+
+    def _link(self, key1, key2):
+        self.links.setdefault(key1, set()).add(key2)
+        self.links.setdefault(key2, set()).add(key1)
+
+    def _title_link(self, path1, path2):
+        self.title_links.setdefault(path1, set()).add(path2)
+        self.title_links.setdefault(path2, set()).add(path1)
+
+    def _add_title_seed(self, seed, members):
+        self.title_seeds[seed] = self.titles[seed]
+        for path in members:
+            self._title_link(seed, path)
+
+    def _discard(self, path, loose):
+        """Retire un fichier ; retourne les chemins dont la composante est à recalculer."""
+        # Son groupe et ses voisins (dont ceux d'un lien faible écarté, dans d'autres groupes)
+        neighbours = set(self._neighbours(path))
+        key = self.group_of.get(path)
+        if key is not None:
+            neighbours.update(self._drop_group(key))
+        neighbours.discard(path)
+        _, fp_key = self.files.pop(path)
+        del self.titles[path]
+        del self.order[path]
+        digest = self.hashes.pop(path, None)
+        if digest is not None:
+            paths = self.paths_by_hash[digest]
+            paths.remove(path)
+            if not paths:
+                del self.paths_by_hash[digest]
+        self.title_seeds.pop(path, None)
+        for other in self.title_links.pop(path, ()):
+            links = self.title_links[other]
+            links.discard(path)
+            if not links:
+                # Référence sans fichier lié, ou fichier dont la référence a disparu : à replacer
+                del self.title_links[other]
+                self.title_seeds.pop(other, None)
+                loose.add(other)
+        if fp_key is not None:
+            paths = self.paths_by_fp[fp_key]
+            paths.remove(path)
+            if not paths:
+                del self.paths_by_fp[fp_key]
+                self.short_keys.discard(fp_key)
+                self.acoustic.remove(self.fp_ids.pop(fp_key))
+                for other in self.links.pop(fp_key, ()):
+                    self.links[other].discard(fp_key)
+                    if not self.links[other]:
+                        del self.links[other]
+        return neighbours
+
+    def _neighbours(self, path):
+        fp_key = self.files[path][1]
+        if fp_key is not None:
+            yield from self.paths_by_fp[fp_key]
+            for other in self.links.get(fp_key, ()):
+                yield from self.paths_by_fp[other]
+        digest = self.hashes.get(path)
+        if digest is not None:
+            yield from self.paths_by_hash[digest]
+        yield from self.title_links.get(path, ())
+
+    def _component(self, paths):
+        """Composantes connexes (ensemble de chemins) contenant ces chemins."""
+        seen = {path for path in paths if path in self.files}
+        stack = list(seen)
+        while stack:
+            for other in self._neighbours(stack.pop()):
+                if other not in seen:
+                    seen.add(other)
+                    stack.append(other)
+        return seen
+
+    def _edges(self, paths, index):
+        """Liens (a, b, sorte d'indice) entre les fichiers `paths`, désignés par `index`."""
+        for path in paths:
+            k = index[path]
+            fp_key = self.files[path][1]
+            if fp_key is not None:
+                first = self.paths_by_fp[fp_key][0]
+                if first != path:
+                    yield k, index[first], EVIDENCE_FINGERPRINT
+                else:
+                    for other in self.links.get(fp_key, ()):
+                        if self.fp_ids[other] > self.fp_ids[fp_key]:
+                            yield k, index[self.paths_by_fp[other][0]], EVIDENCE_ACOUSTIC
+            digest = self.hashes.get(path)
+            if digest is not None:
+                first = self.paths_by_hash[digest][0]
+                if first != path:
+                    yield k, index[first], EVIDENCE_CONTENT_HASH
+            if path in self.title_seeds:
+                # Ordre de collecte : les liens faibles retenus n'en dépendent pas d'un ensemble
+                for other in sorted(self.title_links[path], key=self.order.__getitem__):
+                    yield k, index[other], EVIDENCE_TITLE
+
+    def _regroup(self, paths):
+        """
+        Recalcule les groupes d'un ensemble de composantes connexes entières du graphe
+        d'indices (voir `_component`) et remplace ceux qui les touchaient : le résultat est
+        celui d'un regroupement complet, les autres composantes n'y changeant rien.
+        """
+        paths = sorted(paths, key=self.order.__getitem__)
+        for path in paths:
+            key = self.group_of.get(path)
+            if key is not None:
+                self._drop_group(key)
+        index = {path: k for k, path in enumerate(paths)}
+        for members, evidence in cluster(len(paths), self._edges(paths, index)):
+            files = [self.files[paths[k]][0] for k in members]
+            fp_ids = [self.fp_ids[fp_key] for fp_key in (self.files[paths[k]][1] for k in members)
+                      if fp_key is not None]
+            if fp_ids and evidence.keys() & {EVIDENCE_FINGERPRINT, EVIDENCE_ACOUSTIC, EVIDENCE_CONTENT_HASH}:
+                key = ("fp", min(fp_ids))
+            else:
+                key = ("title", files[0]["path"])
+            self._add_group(key, files, evidence)
+
+    def _drop_group(self, key):
+        paths = [f["path"] for f in self.groups.pop(key)]
+        for path in paths:
+            self.group_of.pop(path, None)
+        return paths
+
+    def _add_group(self, key, files, evidence):
+        self.groups[key] = DuplicateGroup(files, key, evidence)
+        for f in files:
+            self.group_of[f["path"]] = key
+
+    def _place_by_title(self, path):
+        title = self.titles[path]
+        if not title:
+            return
+        matcher = difflib.SequenceMatcher(None)
+        matcher.set_seq2(title)
+
+        def close(other):
+            matcher.set_seq1(other)
+            return (matcher.real_quick_ratio() >= self.title_threshold
+                    and matcher.quick_ratio() >= self.title_threshold
+                    and matcher.ratio() >= self.title_threshold)
+
+        for seed, seed_title in self.title_seeds.items():
+            if seed != path and close(seed_title):
+                self._title_link(seed, path)
+                return
+        members = [p for p, other in self.titles.items()
+                   if p != path and other and p not in self.title_links and close(other)]
+        if members:
+            self._add_title_seed(path, members)
+
 FINGERPRINT_TAG = "ACOUSTID_FINGERPRINT"
 
 def get_fingerprint_from_tags(filepath):
@@ -80,9 +603,35 @@ def get_fingerprint_from_tags(filepath):
         return None
     return None
 
-def set_fingerprint_in_tags(filepath, fingerprint):
+# Politiques d'écriture de l'empreinte dans les tags des fichiers
+TAG_WRITE_OFF = "off"              # scan en lecture seule
+TAG_WRITE_DEFERRED = "deferred"    # écritures regroupées après le calcul des empreintes
+TAG_WRITE_IMMEDIATE = "immediate"  # écriture (et vérification) dès que l'empreinte est calculée
+TAG_WRITE_POLICIES = (TAG_WRITE_OFF, TAG_WRITE_DEFERRED, TAG_WRITE_IMMEDIATE)
+
+# Formats dont les tags peuvent recevoir l'empreinte (voir set_fingerprint_in_tags)
+TAGGABLE_EXTENSIONS = ('.mp3', '.flac', '.ogg', '.m4a', '.mp4')
+
+def can_hold_fingerprint_tag(filepath):
+    """Vrai si `set_fingerprint_in_tags` sait écrire l'empreinte dans ce format de fichier."""
+    return filepath.lower().endswith(TAGGABLE_EXTENSIONS)
+
+def _keep_padding(info):
+    """Politique de padding mutagen : réutiliser le padding existant tant que le tag y tient."""
+    return info.padding if info.padding >= 0 else info.get_default_padding()
+
+def set_fingerprint_in_tags(filepath, fingerprint, verify=True, preserve_padding=False):
+    """
+    Écrit l'empreinte dans les tags du fichier.
+
+    Args:
+        verify (bool): Relire le tag après écriture pour le contrôler.
+        preserve_padding (bool): Ne remplacer que la trame d'empreinte (MP3) et réutiliser
+                                 le padding existant, pour éviter la réécriture du fichier.
+    """
     try:
         written = False
+        save_kwargs = {"padding": _keep_padding} if preserve_padding else {}
         # S'assurer que fingerprint est une chaîne pour tous les formats sauf MP4/M4A
         fp_str = fingerprint.decode('utf-8') if isinstance(fingerprint, bytes) else fingerprint
         if filepath.lower().endswith('.mp3'):
@@ -90,157 +639,1374 @@ def set_fingerprint_in_tags(filepath, fingerprint):
                 tags = ID3(filepath)
             except ID3NoHeaderError:
                 tags = ID3()
-            tags.delall('TXXX')  # Pour éviter les doublons
+            if preserve_padding:
+                tags.delall(f'TXXX:{FINGERPRINT_TAG}')
+            else:
+                tags.delall('TXXX')  # Pour éviter les doublons
             tags.add(TXXX(encoding=3, desc=FINGERPRINT_TAG, text=fp_str))
-            tags.save(filepath)
+            tags.save(filepath, **save_kwargs)
             written = True
         elif filepath.lower().endswith('.flac'):
             audio = FLAC(filepath)
             audio[FINGERPRINT_TAG] = fp_str
-            audio.save()
+            audio.save(**save_kwargs)
             written = True
         elif filepath.lower().endswith('.ogg'):
             audio = OggVorbis(filepath)
             audio[FINGERPRINT_TAG] = fp_str
-            audio.save()
+            audio.save(**save_kwargs)
             written = True
         elif filepath.lower().endswith(('.m4a', '.mp4')):
             audio = MP4(filepath)
             # Pour MP4/M4A, il faut des bytes
             fp_bytes = fingerprint.encode('utf-8') if isinstance(fingerprint, str) else fingerprint
             audio.tags[f"----:{FINGERPRINT_TAG}"] = [fp_bytes]
-            audio.save()
+            audio.save(**save_kwargs)
             written = True
         # Vérification immédiate après écriture
-        if written:
+        if written and verify:
             check = get_fingerprint_from_tags(filepath)
             if check != fp_str:
                 print(f"[WARNING] L'empreinte n'a pas été retrouvée dans le tag après écriture pour : {filepath}")
-        else:
+        elif not written:
             print(f"[WARNING] Format non supporté pour l'écriture de l'empreinte : {filepath}")
+        return written
     except Exception as e:
         print(f"[ERROR] Impossible d'écrire l'empreinte dans le tag pour {filepath} : {e}")
+        return False
+
+def write_deferred_tags(pending, index, queue, stats=None, control=None):
+    """
+    Écrit en un seul lot, après le calcul des empreintes, les tags mis en attente par
+    la politique TAG_WRITE_DEFERRED (padding conservé, pas de relecture de contrôle).
+    L'entrée d'index de chaque fichier écrit prend son nouveau stat et perd sa marque
+    `tag_pending` ; les fichiers restants à l'annulation la gardent et sont repris au
+    scan suivant. Un échec (fichier en lecture seule, tag illisible...) est relevé dans
+    `stats` et retire aussi la marque : l'écriture n'est retentée que si le fichier change
+    et que son empreinte est recalculée.
+
+    Args:
+        pending (list): Couples (chemin, empreinte).
+        stats (ScanStats): Reçoit la durée des écritures et les échecs.
+        control (ScanControl): Pause / annulation, consultées entre deux fichiers.
+    """
+    queue.put(("status", f"Écriture des empreintes dans les tags ({len(pending)} fichiers)..."))
+    queue.put(("progress_max", len(pending)))
+    progress = ProgressReporter(queue, len(pending))
+    progress.flush()
+    for path, fp in pending:
+        if control is not None:
+            control.checkpoint(index.commit)
+        start = time.perf_counter()
+        written = set_fingerprint_in_tags(path, fp, verify=False, preserve_padding=True)
+        if stats is not None:
+            stats.add_task("tag_write", time.perf_counter() - start)
+            if not written:
+                stats.failure("tag_write", path, "écriture du tag impossible")
+        if written:
+            try:
+                index.tag_written(path, os.stat(path))
+            except FileNotFoundError:
+                index.forget(path)
+        else:
+            index.tag_abandoned(path)
+        progress.file_done()
+    progress.flush()
+    index.commit()
+
+AudioMetadata = namedtuple("AudioMetadata", "fingerprint duration bitrate title artist album")
+
+# Clés de tags par famille de conteneur : (titre, artiste, album, empreinte)
+_ID3_KEYS = ("TIT2", "TPE1", "TALB", f"TXXX:{FINGERPRINT_TAG}")
+_MP4_KEYS = ("\xa9nam", "\xa9ART", "\xa9alb", f"----:{FINGERPRINT_TAG}")
+_VORBIS_KEYS = ("title", "artist", "album", FINGERPRINT_TAG)
+
+def _first_tag_value(tags, key):
+    try:
+        value = tags.get(key)
+    except Exception:
+        return None
+    if value is None:
+        return None
+    # Trames ID3 (.text) ou listes de valeurs (Vorbis / MP4)
+    values = getattr(value, 'text', value)
+    if isinstance(values, (list, tuple)):
+        if not values:
+            return None
+        values = values[0]
+    if isinstance(values, bytes):
+        values = values.decode('utf-8', errors='replace')
+    return str(values)
+
+def read_metadata(filepath, read_ahead=None):
+    """
+    Lit en une seule ouverture du fichier l'empreinte stockée en tag, la durée,
+    le bitrate, le titre, l'artiste et l'album (le conteneur n'est analysé qu'une fois).
+    Avec `read_ahead` (ReadAhead), le descripteur lu à l'avance est repris.
+    """
+    try:
+        if read_ahead is None:
+            audio = File(filepath)
+        else:
+            with read_ahead.open(filepath) as f:
+                audio = File(f)
+    except Exception:
+        audio = None
+    if audio is None:
+        return AudioMetadata(None, 0, 0, MISSING_TAG, MISSING_TAG, MISSING_TAG)
+    info = getattr(audio, 'info', None)
+    try:
+        duration = float(info.length) if info is not None and hasattr(info, 'length') else 0
+    except Exception:
+        duration = 0
+    try:
+        bitrate = int(info.bitrate / 1000) if info is not None and hasattr(info, 'bitrate') else 0
+    except Exception:
+        bitrate = 0
+    tags = getattr(audio, 'tags', None)
+    if tags is None:
+        return AudioMetadata(None, duration, bitrate, MISSING_TAG, MISSING_TAG, MISSING_TAG)
+    if isinstance(tags, ID3):
+        keys = _ID3_KEYS
+    elif isinstance(audio, MP4):
+        keys = _MP4_KEYS
+    else:
+        keys = _VORBIS_KEYS
+    title, artist, album, fingerprint = (_first_tag_value(tags, k) for k in keys)
+    return AudioMetadata(fingerprint or None, duration, bitrate, title or MISSING_TAG, artist or MISSING_TAG,
+                         album or MISSING_TAG)
+
+SUPPORTED_EXTENSIONS = ('.mp3', '.flac', '.wav', '.m4a', '.ogg')
+
+# Sous-ensemble de os.stat_result transmis du parcours jusqu'à l'index (aucun second stat)
+FileStat = namedtuple("FileStat", "st_size st_mtime_ns st_mtime st_ctime st_ino st_dev")
+
+def _scan_directory(path, extensions):
+    """
+    Liste un dossier (tâche du pool de threads) : fichiers audio avec leur stat, et sous-dossiers.
+
+    Les fichiers sont triés par inode, ordre proche de leur placement sur le disque : sur
+    un disque rotatif, les lectures qui suivent se font avec moins de déplacements de tête.
+    Les liens symboliques vers des dossiers ne sont pas suivis (comme `os.walk`) et les
+    dossiers illisibles sont ignorés.
+    """
+    files, subdirs = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith(extensions):
+                        st = entry.stat()
+                        # DirEntry.stat() ne renseigne pas l'inode sous Windows : on le demande à part
+                        files.append((entry.path, FileStat(st.st_size, st.st_mtime_ns, st.st_mtime,
+                                                           st.st_ctime, st.st_ino or entry.inode(), st.st_dev)))
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    files.sort(key=lambda f: f[1].st_ino)
+    return files, subdirs
+
+def iter_audio_files(paths, extensions, executor):
+    """
+    Parcourt les dossiers avec `os.scandir`, en répartissant les sous-dossiers sur `executor`.
+
+    Les fichiers sont produits au fur et à mesure, avec le stat issu du `DirEntry`
+    (taille, mtime, ctime, inode, périphérique) : sur un partage réseau, la latence des
+    métadonnées des dossiers est ainsi masquée par le parallélisme. Les dossiers sont
+    consommés dans leur ordre de découverte, et les fichiers d'un dossier par inode, de
+    sorte que l'ordre des fichiers est déterministe.
+
+    Yields:
+        tuple: (chemin, FileStat)
+    """
+    pending = deque(executor.submit(_scan_directory, path, extensions) for path in paths)
+    while pending:
+        files, subdirs = pending.popleft().result()
+        pending.extend(executor.submit(_scan_directory, d, extensions) for d in subdirs)
+        yield from files
+
+def _write_fingerprint_tag(full_path, fp, report):
+    """Écrit l'empreinte calculée dans les tags (mesures dans `report`) et retourne le nouveau stat."""
+    start = time.perf_counter()
+    report["tag_written"] = set_fingerprint_in_tags(full_path, fp)
+    # L'écriture du tag modifie mtime/taille : re-stat pour que l'index reste valide
+    new_stat = os.stat(full_path)
+    report["tag_write"] = time.perf_counter() - start
+    return new_stat
+
+def _fingerprint_and_parse(full_path, fp, duration, fpcalc_path, meta=None, write_tag=True, backend=BACKEND_AUTO,
+                           batch_fpcalc=False, length=None):
+    """
+    Étape CPU (pool de processus) : lit les métadonnées en une seule ouverture,
+    puis génère l'empreinte avec le moteur `backend` (voir `fingerprint_backend`) si
+    elle n'est ni en tag ni connue. L'empreinte calculée n'est écrite dans les tags
+    que si write_tag est vrai.
+
+    Avec `length` (secondes), seul le début du fichier est décodé : l'empreinte
+    calculée est courte (mesures["short"] vrai) si le fichier est plus long, et
+    n'est alors jamais écrite dans les tags.
+
+    `meta` (`AudioMetadata`) évite de relire des métadonnées déjà lues (préfiltre par
+    durée, index) ; mesures["metadata"] vaut alors None.
+
+    Avec batch_fpcalc, un fichier qui demanderait fpcalc est rendu sans empreinte
+    (mesures["deferred"] vrai) : l'appelant le regroupe avec d'autres pour un seul
+    appel de fpcalc (`_fingerprint_batch`), puis complète le résultat avec
+    `_complete_deferred`.
+
+    Returns:
+        tuple: (fp, durée, titre, artiste, album, bitrate, nouveau stat ou None, empreinte calculée ?,
+                mesures {"metadata", "fingerprint", "tag_write": secondes, "backend": moteur utilisé,
+                "from_tag", "tag_written", "deferred", "fpcalc_processes", "short"}).
+    """
+    start = time.perf_counter()
+    if meta is None:
+        meta = read_metadata(full_path)
+        read_seconds = time.perf_counter() - start
+    else:
+        read_seconds = None
+    report = {"metadata": read_seconds, "fingerprint": 0.0, "tag_write": 0.0, "backend": None,
+              "from_tag": bool(meta.fingerprint), "tag_written": None, "deferred": False, "fpcalc_processes": 0,
+              "short": False}
+    new_stat = None
+    computed = False
+    if meta.fingerprint:
+        # On ne stocke pas la durée dans le tag : on garde celle de l'en-tête
+        fp, duration = meta.fingerprint, None
+    elif fp is None:
+        start = time.perf_counter()
+        engine = get_backend(backend, fpcalc_path)
+        maxlength = length or acoustid.MAX_AUDIO_LENGTH
+        result = (engine.fingerprint_in_process(full_path, maxlength) if batch_fpcalc
+                  else engine.fingerprint(full_path, maxlength))
+        if result is None:
+            report["deferred"] = True
+            return None, meta.duration, meta.title, meta.artist, meta.album, meta.bitrate, None, False, report
+        duration, fp, report["backend"] = result
+        report["fingerprint"] = time.perf_counter() - start
+        report["fpcalc_processes"] = int(report["backend"] == FpcalcBackend.name)
+        report["short"] = _is_short(duration, length)
+        computed = True
+        if write_tag and not report["short"]:
+            new_stat = _write_fingerprint_tag(full_path, fp, report)
+    if duration is None:
+        duration = meta.duration
+    return fp, duration, meta.title, meta.artist, meta.album, meta.bitrate, new_stat, computed, report
+
+def _is_short(duration, length):
+    """Vrai si une empreinte limitée à `length` secondes ne couvre pas tout le fichier (durée `duration`)."""
+    return bool(length) and (not duration or duration > length)
+
+def _fingerprint_batch(batch, write_tag=True, length=None):
+    """
+    Étape CPU par lots : empreintes des fichiers différés par `_fingerprint_and_parse`,
+    en un appel `fpcalc -json` par lot au lieu d'un processus par fichier (voir
+    `FpcalcBackend.fingerprint_batch` : un fichier en échec est isolé et relancé seul).
+
+    Args:
+        batch (list): [(chemin, chemin de fpcalc), ...]
+        length (int): Secondes décodées par fichier (empreinte courte), comme pour
+                      `_fingerprint_and_parse` ; None pour l'empreinte complète.
+
+    Returns:
+        list: Par fichier, (durée, empreinte, nouveau stat ou None, mesures) ou l'exception levée.
+              Les processus fpcalc du lot (mesures["fpcalc_processes"]) sont comptés sur le
+              premier fichier réussi, moins un par fichier en échec (relancé seul).
+    """
+    paths = [path for path, _ in batch]
+    start = time.perf_counter()
+    results, processes = FpcalcBackend(batch[0][1]).fingerprint_batch(paths, length or acoustid.MAX_AUDIO_LENGTH)
+    share = (time.perf_counter() - start) / len(paths)
+    processes -= sum(1 for result in results if isinstance(result, BaseException))
+    out = []
+    for path, result in zip(paths, results):
+        if isinstance(result, BaseException):
+            out.append(result)
+            continue
+        duration, fp, name = result
+        report = {"fingerprint": share, "backend": name, "tag_write": 0.0, "tag_written": None,
+                  "fpcalc_processes": processes, "short": _is_short(duration, length)}
+        processes = 0
+        new_stat = _write_fingerprint_tag(path, fp, report) if write_tag and not report["short"] else None
+        out.append((duration, fp, new_stat, report))
+    return out
 
-def scan_duplicates(paths_to_scan, date_type, queue, title_similarity_threshold=0.8):
+def _complete_deferred(parsed, fingerprinted):
+    """Résultat de `_fingerprint_and_parse` pour un fichier différé, une fois son empreinte calculée par lot."""
+    _, _, title, artist, album, bitrate, _, _, report = parsed
+    duration, fp, new_stat, batch_report = fingerprinted
+    return fp, duration, title, artist, album, bitrate, new_stat, True, dict(report, deferred=False, **batch_report)
+
+# Empreinte en deux passes : secondes décodées par la passe courte (0 : une seule passe complète)
+SHORT_FINGERPRINT_LENGTH = 30
+# Marge retirée au seuil acoustique pour retenir les candidats de la passe complète :
+# mesurée sur moins de trames, la similarité des empreintes courtes est plus dispersée
+SHORT_FINGERPRINT_MARGIN = 0.05
+
+def passes_duration_filter(files, tolerance):
+    """
+    Filtre de durée des groupes affichés : vrai si le rapport entre la plus courte et
+    la plus longue durée du groupe atteint `tolerance` (une durée inconnue ne filtre pas).
+    """
+    durations = [f.get("duration", 0) or 0 for f in files]
+    if durations:
+        min_d = min(durations)
+        max_d = max(durations)
+        if min_d and max_d and min_d / max_d < tolerance:
+            return False
+    return True
+
+def _without_close_duration(durations, indices, tolerance):
+    """
+    Préfiltre par durée : parmi `indices`, les fichiers dont aucun autre fichier n'a
+    une durée proche (rapport min/max d'au moins `tolerance`, voir `passes_duration_filter`).
+    Tout groupe les contenant serait masqué : leur empreinte est inutile.
+    Une durée inconnue (0) reste hors de la règle : le fichier n'est jamais écarté (le
+    calcul d'empreinte donnera sa vraie durée) et ne compte comme voisin de personne.
+
+    Args:
+        durations (dict): {indice: durée en secondes, 0 si inconnue} de tous les fichiers.
+        indices (iterable): Fichiers candidats à l'écartement.
+
+    Returns:
+        list: Indices écartés.
+    """
+    known = sorted(d for d in durations.values() if d)
+    lonely = []
+    for i in indices:
+        duration = durations.get(i)
+        if not duration:
+            continue
+        # Voisins possibles : durées dans [d * tolerance, d / tolerance] ; le fichier y figure lui-même
+        if bisect.bisect_right(known, duration / tolerance) - bisect.bisect_left(known, duration * tolerance) < 2:
+            lonely.append(i)
+    return lonely
+
+def _short_fingerprint_candidates(entries, short_fps, threshold):
+    """
+    Fichiers dont l'empreinte courte rencontre une autre empreinte (courte ou complète)
+    identique ou acoustiquement proche : seuls ceux-là ont besoin de l'empreinte complète.
+    Une empreinte courte sans voisine ne peut former aucun groupe acoustique.
+
+    Args:
+        entries (list): (file_info, empreinte ou None) par indice, None pour un fichier illisible ;
+                        l'empreinte est une chaîne fpcalc ou sa forme compacte (`pack_fingerprint`).
+        short_fps (set): Clés (`fingerprint_key`) des empreintes courtes parmi celles de `entries`.
+        threshold (float): Similarité minimale d'une paire candidate.
+
+    Returns:
+        list: Indices des candidats, dans l'ordre de collecte.
+    """
+    keys = [fingerprint_key(entry[1]) if entry is not None and entry[1] is not None else None for entry in entries]
+    counts = Counter(key for key in keys if key is not None)
+    fingerprints = {}
+    for entry, key in zip(entries, keys):
+        if key is not None:
+            fingerprints.setdefault(key, entry[1])
+    distinct = list(fingerprints)
+    matched = {key for key, count in counts.items() if count > 1}
+    for i, j, _ in find_similar_pairs(list(fingerprints.values()), threshold):
+        matched.add(distinct[i])
+        matched.add(distinct[j])
+    return [i for i, key in enumerate(keys) if key in short_fps and key in matched]
+
+def _interned(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+class FileRecord:
+    """
+    file_info compact d'un fichier scanné : attributs en `__slots__` plutôt qu'un dict
+    par fichier, et titre / artiste / album internés (une seule copie des chaînes
+    répétées d'un album à l'autre). Se lit comme le dict qu'il remplace (`record["path"]`,
+    `record.get("duration", 0)`, `dict(record)`) ; deux fiches aux mêmes valeurs sont égales.
+    """
+    __slots__ = ("path", "date", "title", "artist", "album", "bitrate", "duration")
+
+    def __init__(self, path, date, title, artist, album, bitrate, duration):
+        self.path = path
+        self.date = date
+        self.title = _interned(title)
+        self.artist = _interned(artist)
+        self.album = _interned(album)
+        self.bitrate = bitrate
+        self.duration = duration
+
+    def keys(self):
+        return self.__slots__
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def _values(self):
+        return tuple(getattr(self, key) for key in self.__slots__)
+
+    def __eq__(self, other):
+        if not isinstance(other, FileRecord):
+            return NotImplemented
+        return self._values() == other._values()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"FileRecord({dict(self)!r})"
+
+def _file_info(path, stat, date_type, title, artist, album, bitrate, duration):
+    return FileRecord(path, stat.st_mtime if date_type == "modification" else stat.st_ctime,
+                      title, artist, album, bitrate, duration)
+
+# Nombre maximal de mises à jour de progression envoyées à l'interface par seconde
+PROGRESS_UPDATES_PER_SECOND = 10
+
+class ProgressReporter:
+    """
+    Regroupe la progression côté scanner : au plus PROGRESS_UPDATES_PER_SECOND envois
+    par seconde, quel que soit le débit de fichiers.
+
+    Chaque envoi comprend ("progress", fichiers traités) pour la barre, puis
+    ("progress_detail", dict) avec done, total, rate (fichiers/s depuis le début de
+    l'étape), eta (secondes restantes ou None) et stages (tâches terminées par étape).
+    """
+    def __init__(self, queue, total, done=0, stages=None, max_rate=PROGRESS_UPDATES_PER_SECOND):
+        self.queue = queue
+        self.total = total
+        self.done = done
+        self.stages = dict(stages or {})
+        self._done_at_start = done
+        self._started = time.monotonic()
+        self._min_interval = 1.0 / max_rate
+        self._last_sent = None
+
+    def stage_done(self, stage):
+        self.stages[stage] = self.stages.get(stage, 0) + 1
+        self._maybe_send()
+
+    def file_done(self):
+        self.done += 1
+        self._maybe_send()
+
+    def flush(self):
+        self._maybe_send(force=True)
+
+    def _maybe_send(self, force=False):
+        now = time.monotonic()
+        if not force and self._last_sent is not None and now - self._last_sent < self._min_interval:
+            return
+        self._last_sent = now
+        elapsed = now - self._started
+        rate = (self.done - self._done_at_start) / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else None
+        self.queue.put(("progress", self.done))
+        self.queue.put(("progress_detail", {"done": self.done, "total": self.total, "rate": rate,
+                                            "eta": eta, "stages": dict(self.stages)}))
+
+def scan_duplicates(paths_to_scan, date_type, queue, title_similarity_threshold=0.8, index_path=INDEX_PATH,
+                    io_workers=None, cpu_workers=None, acoustic_similarity_threshold=0.85,
+                    tag_write_policy=TAG_WRITE_IMMEDIATE, control=None, library=None, report_path=None,
+                    fingerprint_backend=BACKEND_AUTO, short_fingerprint_length=SHORT_FINGERPRINT_LENGTH,
+                    duration_tolerance=None):
     """
     Scanne les dossiers à la recherche de fichiers musicaux en double en utilisant
     la technologie d'empreinte acoustique pour une précision maximale.
 
     Ce processus se déroule en trois étapes :
-    1.  Collecte de tous les fichiers audio compatibles.
-    2.  Génération d'une empreinte acoustique unique pour chaque fichier via fpcalc.
-    3.  Groupement des fichiers par empreinte identique pour trouver les doublons.
+    1.  Collecte de tous les fichiers audio compatibles (parcours `os.scandir` parallèle,
+        dont le stat sert aussi à valider l'index persistant).
+    2.  Génération d'une empreinte acoustique unique pour chaque fichier (libchromaprint
+        en processus ou fpcalc), dans un pipeline parallèle : hachage et lecture des
+        tags dans un pool de threads, empreinte et parsing dans un pool de processus.
+    3.  Groupement des fichiers par empreinte identique ou acoustiquement proche
+        (taux d'erreur binaire des empreintes décodées) pour trouver les doublons.
+
+    L'empreinte se calcule en deux passes : d'abord sur les `short_fingerprint_length`
+    premières secondes de chaque fichier, puis en entier pour les seuls fichiers dont
+    l'empreinte courte en rencontre une autre identique ou proche (voir
+    `_short_fingerprint_candidates`). Les deux empreintes sont conservées dans l'index.
+
+    Avec `duration_tolerance`, les durées d'en-tête sont lues avant toute empreinte :
+    un fichier sans autre fichier de durée proche n'est pas empreinté (voir
+    `_without_close_duration`) et ne peut rejoindre qu'un groupe par titre.
 
     La fonction est conçue pour être exécutée dans un thread afin de ne pas bloquer
     l'interface utilisateur et communique sa progression via une file d'attente.
+    Les doublons exacts sont envoyés dès qu'ils apparaissent (messages "group_added"
+    puis "group_updated", avec (clé, [file_info, ...]), et "group_removed" avec la clé) ;
+    pendant la passe courte, ce sont les copies de même contenu (SHA-1), les groupes
+    d'empreintes identiques attendant l'empreinte complète. Le message "results" final
+    contient la liste complète des groupes et fait foi.
 
     Args:
         paths_to_scan (list): Liste des chemins de dossier à analyser.
         date_type (str): Le critère de date à utiliser ('modification' ou 'creation').
         queue (queue.Queue): La file d'attente pour envoyer des messages (statut,
                              progression, résultats) à l'interface utilisateur.
+        index_path (str): Base SQLite de l'index persistant des empreintes ; les
+                          fichiers inchangés depuis le scan précédent y sont relus
+                          sans être rouverts.
+        io_workers (int): Threads pour le hachage et la lecture des tags (défaut : 4 par cœur).
+        cpu_workers (int): Processus pour l'empreinte et le parsing (défaut : un par cœur).
+        acoustic_similarity_threshold (float): Similarité minimale (1 - taux d'erreur
+                          binaire) pour regrouper deux empreintes différentes.
+        tag_write_policy (str): Écriture des empreintes calculées dans les tags :
+                          TAG_WRITE_OFF (lecture seule), TAG_WRITE_DEFERRED (en lot après
+                          le calcul des empreintes) ou TAG_WRITE_IMMEDIATE (dans le pipeline).
+        control (ScanControl): Jeton de pause / annulation consulté entre deux fichiers.
+                          Un scan annulé peut être relancé : les fichiers déjà traités
+                          sont relus depuis l'index, validé au moins toutes les
+                          `fingerprint_index.COMMIT_INTERVAL` secondes et à chaque pause.
+        library (DuplicateLibrary): Reçoit l'état groupé de la bibliothèque, à passer
+                          ensuite à `watch_duplicates` pour les mises à jour incrémentales.
+                          Chaque groupe de "results" porte la clé (`DuplicateGroup.key`)
+                          utilisée par ces mises à jour.
+        report_path (str): Fichier où écrire le rapport JSON du scan (voir `scan_stats.ScanStats`) ;
+                          le même rapport est envoyé à l'interface ("scan_stats") en fin de scan.
+        fingerprint_backend (str): Moteur d'empreinte, parmi `fingerprint_backend.FINGERPRINT_BACKENDS` ;
+                          le moteur retenu figure dans le rapport du scan.
+        short_fingerprint_length (int): Secondes décodées par la passe courte ; 0 (ou une
+                          durée d'au moins `acoustid.MAX_AUDIO_LENGTH`) calcule directement
+                          l'empreinte complète de chaque fichier.
+        duration_tolerance (float): Rapport minimal des durées (min/max) d'un groupe affiché,
+                          comme le filtre de durée de l'interface ; None (défaut) empreinte
+                          tous les fichiers. Abaisser ensuite le filtre sous cette valeur
+                          demande un nouveau scan.
     """
+    index = None
+    short_length = short_fingerprint_length if 0 < (short_fingerprint_length or 0) < acoustid.MAX_AUDIO_LENGTH else None
+    stats = ScanStats()
+    outcome = "error"
     try:
-        if not os.path.exists(FPCALC_PATH):
-            queue.put(("message", ("error", f"fpcalc.exe non trouvé. Veuillez le placer dans le dossier de l'application.")))
+        try:
+            stats.info["backend"] = create_backend(fingerprint_backend, FPCALC_PATH).describe()
+        except BackendUnavailable as e:
+            queue.put(("message", ("error", str(e))))
             return
+        if short_length:
+            stats.info["short_fingerprint"] = f"{short_length} s"
+        if duration_tolerance:
+            stats.info["duration_tolerance"] = f"{duration_tolerance * 100:g} %"
 
-        # Set the path to fpcalc for the acoustid library
-        acoustid.FPCOMMAND = FPCALC_PATH
-
-        # Étape 1: Collecte des fichiers
+        # Étape 1: Collecte des fichiers (parcours parallèle, stat réutilisé) et consultation de l'index
         queue.put(("status", "Étape 1/3: Recherche des fichiers musicaux..."))
-        supported_extensions = ('.mp3', '.flac', '.wav', '.m4a', '.ogg')
-
+        index = FingerprintIndex(index_path)
+        pipeline = get_pipeline(io_workers, cpu_workers)
         all_files_to_process = []
-        for path in paths_to_scan:
-            for root, _, files in os.walk(path):
-                for f in files:
-                    if f.lower().endswith(supported_extensions):
-                        all_files_to_process.append(os.path.join(root, f))
-        
+        fp_cache = {}  # {sha1: (duration, empreinte compacte)}
+        hashes_in_flight = {}  # {sha1: [indices en attente de l'empreinte en cours de calcul]}
+        prepared = {}  # {indice: [stat, sha1 ou None]}
+        indexed_sizes = array('q')  # taille par indice des fichiers servis par l'index, -1 pour les autres
+        file_infos = []  # (FileRecord, empreinte compacte ou None) par indice
+        live_groups = {}  # {clé d'empreinte ou de contenu: [indices]} pour l'affichage des doublons exacts au fil du scan
+        live_keys = {}  # {indice: clé de son entrée dans live_groups}
+        pending_tags = []  # écritures de tags différées (politique TAG_WRITE_DEFERRED)
+        short_fps = set()  # clés des empreintes courtes (passe 1), à confirmer si elles ont une voisine
+        short_files = {}  # {indice: (stat, sha1 ou None)} des fichiers n'ayant qu'une empreinte courte
+        metas = {}  # {indice: AudioMetadata} déjà lues (index, préfiltre par durée)
+        metas_from_index = set()
+        content_hashes = {}  # {chemin: SHA-1} des fichiers hachés, indice de contenu identique pour le regroupement
+        processed = 0  # fichiers servis par l'index pendant le parcours
+        progress = None
+        devices = set()  # périphériques des fichiers à lire
+
+        # Les étapes répartissent leurs lectures par périphérique et lisent à l'avance les fichiers suivants
+        def prepared_device(i):
+            return device_of(all_files_to_process[i], prepared[i][0])
+
+        def bucket_stat(i):
+            # Panier de taille : fichiers à traiter, et fichiers indexés de même taille (`indexed`)
+            return prepared[i][0] if i in prepared else indexed[i]
+
+        def bucket_device(i):
+            return device_of(all_files_to_process[i], bucket_stat(i))
+
+        def short_device(i):
+            return device_of(all_files_to_process[i], short_files[i][0])
+
+        def prefetch(ahead):
+            # Lecture anticipée des fichiers suivants d'une étape, sur le descripteur qu'elle reprendra
+            return lambda i: ahead(all_files_to_process[i])
+
+        def by_device(indices, file_device):
+            # {périphérique: indices dans l'ordre} : le pipeline lit chaque périphérique à son rythme
+            sources = {}
+            for i in indices:
+                sources.setdefault(file_device(i), []).append(i)
+            return sources
+
+        def make_info(i, stat, fp, duration, title, artist, album, bitrate, content_hash=None):
+            packed = _packed(fp)
+            file_infos[i] = (_file_info(all_files_to_process[i], stat, date_type, title, artist, album,
+                                        bitrate, duration), packed)
+            if packed is None:
+                return
+            key = fingerprint_key(packed)
+            if key in short_fps:
+                # Deux débuts identiques ne font pas encore un doublon ; deux contenus identiques (même SHA-1), si
+                key = "sha1:" + content_hash if content_hash else None
+            previous = live_keys.get(i)
+            if key == previous:
+                return
+            if previous is not None:
+                # Empreinte complète de la passe 2 : le fichier quitte son groupe de copies
+                members = live_groups[previous]
+                members.remove(i)
+                if len(members) > 1:
+                    queue.put(("group_updated", (previous, [file_infos[j][0] for j in members])))
+                elif members:
+                    queue.put(("group_removed", previous))
+            if key is None:
+                live_keys.pop(i, None)
+                return
+            live_keys[i] = key
+            # Doublon exact connu dès maintenant : l'interface l'affiche sans attendre la fin
+            members = live_groups.setdefault(key, [])
+            members.append(i)
+            if len(members) > 1:
+                queue.put(("group_added" if len(members) == 2 else "group_updated",
+                           (key, [file_infos[j][0] for j in members])))
+
+        with stats.phase("walk"):
+            for full_path, stat in iter_audio_files(paths_to_scan, SUPPORTED_EXTENSIONS, pipeline.io_executor):
+                if control is not None:
+                    control.checkpoint(index.commit)
+                i = len(all_files_to_process)
+                all_files_to_process.append(full_path)
+                file_infos.append(None)
+                cached = index.lookup(full_path, stat)
+                fp = cached and cached["fingerprint"]
+                if cached and not fp and short_length and cached["short_length"] == short_length:
+                    # Seule l'empreinte courte est connue : la passe complète décidera s'il en faut plus
+                    fp = cached["short_fingerprint"]
+                    if fp:
+                        short_fps.add(fingerprint_key(_packed(fp)))
+                        short_files[i] = (stat, cached["content_hash"])
+                if fp:
+                    if (cached["fingerprint"] and cached["tag_pending"] and tag_write_policy != TAG_WRITE_OFF
+                            and can_hold_fingerprint_tag(full_path)):
+                        # Écriture différée d'un scan interrompu avant la fin
+                        pending_tags.append((full_path, cached["fingerprint"]))
+                    # Fichier inchangé depuis le dernier scan : le stat du parcours suffit
+                    make_info(i, stat, fp, cached["duration"] or 0, cached["title"],
+                              cached["artist"], cached["album"], cached["bitrate"] or 0, cached["content_hash"])
+                    if cached["content_hash"]:
+                        content_hashes[full_path] = cached["content_hash"]
+                        if cached["content_hash"] not in fp_cache:
+                            fp_cache[cached["content_hash"]] = (cached["duration"] or 0, file_infos[i][1])
+                    indexed_sizes.append(stat.st_size)
+                    processed += 1
+                else:
+                    indexed_sizes.append(-1)
+                    prepared[i] = [stat, None]
+                    devices.add(device_of(full_path, stat))
+                    if cached:
+                        # Métadonnées encore valides (fichier écarté par durée, autre passe courte)
+                        metas[i] = AudioMetadata(None, cached["duration"] or 0, cached["bitrate"] or 0,
+                                                 cached["title"], cached["artist"], cached["album"])
+                        metas_from_index.add(i)
+        stats.count("files", len(all_files_to_process))
+        stats.count("index_hits", processed)
+        if devices:
+            kinds = Counter(device_kind(device) for device in devices)
+            stats.info["devices"] = ", ".join(f"{count} {kind}" for kind, count in sorted(kinds.items()))
+
         # Étape 2: Génération des empreintes
         queue.put(("status", f"Étape 2/3: Génération des empreintes pour {len(all_files_to_process)} fichiers..."))
         queue.put(("progress_max", len(all_files_to_process)))
+        progress = ProgressReporter(queue, len(all_files_to_process), done=processed,
+                                    stages={"cache": processed} if processed else None)
+        progress.flush()
 
-        fingerprint_map = {}
-        fp_cache = {}  # {sha1: (duration, fp)}
-        all_file_infos = []
-        for i, full_path in enumerate(all_files_to_process):
-            queue.put(("progress", i + 1))
-            try:
-                file_hash = file_sha1(full_path)
-                # Vérifier si l'empreinte est déjà stockée dans les tags
-                fp_from_tag = get_fingerprint_from_tags(full_path)
-                duration = None
-                if fp_from_tag:
-                    fp = fp_from_tag
-                    duration = None  # On ne stocke pas la durée dans le tag, donc on la laisse à None
-                elif file_hash and file_hash in fp_cache:
-                    duration, fp = fp_cache[file_hash]
+        def file_done():
+            progress.file_done()
+
+        # Préfiltre par durée : sans autre fichier de durée proche, tout groupe contenant
+        # le fichier serait masqué par le filtre de durée ; son empreinte est inutile
+        if duration_tolerance and prepared:
+            def metadata_route(stage, i, result):
+                progress.stage_done(stage)
+                if isinstance(result, BaseException):
+                    stats.failure("metadata", all_files_to_process[i], result)
                 else:
-                    duration, fp = acoustid.fingerprint_file(full_path)
-                    if file_hash:
-                        fp_cache[file_hash] = (duration, fp)
-                    set_fingerprint_in_tags(full_path, fp)
-                # Toujours essayer de lire la durée si elle est absente
-                if duration is None:
-                    try:
-                        audio = File(full_path)
-                        if audio and hasattr(audio, 'info') and hasattr(audio.info, 'length'):
-                            duration = float(audio.info.length)
-                        else:
-                            duration = 0
-                    except Exception:
-                        duration = 0
-                stat = os.stat(full_path)
+                    metas[i] = result
+                return []
+
+            with stats.phase("duration_prefilter"):
+                ahead = ReadAhead(METADATA_READ_AHEAD)
+                stage = pipeline.io_stage("metadata", functools.partial(read_metadata, read_ahead=ahead),
+                                          device_of=prepared_device, prefetch=prefetch(ahead))
+                sources = by_device([i for i in sorted(prepared) if i not in metas], prepared_device)
                 try:
-                    audio = File(full_path, easy=True)
-                    title, artist, album, bitrate = (audio.get('title', ['N/A'])[0], 
-                                                     audio.get('artist', ['N/A'])[0], 
-                                                     audio.get('album', ['N/A'])[0], 
-                                                     int(audio.info.bitrate / 1000) if hasattr(audio, 'info') and hasattr(audio.info, 'bitrate') else 0) if audio else ('N/A', 'N/A', 'N/A', 0)
-                except Exception:
-                    title, artist, album, bitrate = 'N/A', 'N/A', 'N/A', 0
-                file_info = {
-                    "path": full_path,
-                    "date": stat.st_mtime if date_type == "modification" else stat.st_ctime,
-                    "title": title,
-                    "artist": artist,
-                    "album": album,
-                    "bitrate": bitrate,
-                    "duration": duration
-                }
-                all_file_infos.append(file_info)
-                if fp not in fingerprint_map:
-                    fingerprint_map[fp] = []
-                fingerprint_map[fp].append(file_info)
-            except (acoustid.FingerprintGenerationError, subprocess.CalledProcessError) as e:
-                print(f"Could not process file {full_path}: {e}")
-                continue
-            except FileNotFoundError:
-                continue
-        # Étape 3: Filtrer les groupes pour ne garder que les doublons acoustiques
+                    pipeline.run({device: [("metadata", i, (all_files_to_process[i],)) for i in indices]
+                                  for device, indices in sources.items()},
+                                 {"metadata": stage}, metadata_route, control=control, on_pause=index.commit)
+                finally:
+                    ahead.close()
+                stats.add_task(stage.name, stage.busy, files=stage.completed)
+                durations = {i: entry[0]["duration"] for i, entry in enumerate(file_infos) if entry is not None}
+                durations.update((i, meta.duration) for i, meta in metas.items())
+                skipped = _without_close_duration(
+                    durations, [i for i in prepared if i in metas and not metas[i].fingerprint], duration_tolerance)
+            stats.count("duration_skipped", len(skipped))
+            for i in skipped:
+                stat = prepared.pop(i)[0]
+                meta = metas[i]
+                if i not in metas_from_index:
+                    index.store(all_files_to_process[i], stat, duration=meta.duration, title=meta.title,
+                                artist=meta.artist, album=meta.album, bitrate=meta.bitrate)
+                make_info(i, stat, None, meta.duration, meta.title, meta.artist, meta.album, meta.bitrate)
+                file_done()
+
+        # Identité du contenu par paliers : taille unique -> aucun hachage ; taille partagée ->
+        # échantillon début+fin ; collision d'échantillon -> hachage complet.
+        size_buckets = {}
+        for i, (stat, _) in prepared.items():
+            size_buckets.setdefault(stat.st_size, []).append(i)
+        # Les fichiers indexés comptent dans les paniers : une nouvelle copie d'un fichier déjà
+        # indexé est hachée, et réutilise son empreinte (fp_cache) comme son indice de contenu
+        indexed = {}  # {indice: stat} des fichiers indexés de même taille qu'un fichier à traiter
+        for i, size in enumerate(indexed_sizes):
+            if size in size_buckets:
+                try:
+                    stat = os.stat(all_files_to_process[i])
+                except OSError:
+                    continue
+                if stat.st_size == size:
+                    indexed[i] = stat
+                    size_buckets[size].append(i)
+        del indexed_sizes
+        bucket_pending = {size: len(members) for size, members in size_buckets.items() if len(members) > 1}
+        samples = {}
+        # {indice en cours de hachage complet: [hachages restants, nouveaux fichiers]} des collisions
+        # d'échantillon avec un fichier indexé encore sans SHA-1 : le groupe attend tous ses hachages
+        hash_barriers = {}
+        deferred = {}  # {indice: résultat de parsing en attente de son lot fpcalc}
+
+        def dispatch_parse(i):
+            file_hash = prepared[i][1]
+            full_path = all_files_to_process[i]
+            if file_hash:
+                stats.count("hashed_files")
+            if file_hash and file_hash in fp_cache:
+                stats.count("hash_cache_hits")
+                duration, fp = fp_cache[file_hash]
+                return [("parse", i, (full_path, _unpacked(fp), duration, FPCALC_PATH, metas.get(i)))]
+            if file_hash and file_hash in hashes_in_flight:
+                stats.count("hash_cache_hits")
+                hashes_in_flight[file_hash].append(i)
+                return []
+            if file_hash:
+                hashes_in_flight[file_hash] = []
+            return [("parse", i, (full_path, None, None, FPCALC_PATH, metas.get(i)))]
+
+        def parse_failed(i, error):
+            full_path = all_files_to_process[i]
+            file_hash = prepared.pop(i, (None, None))[1]
+            if isinstance(error, acoustid.FingerprintGenerationError):
+                stats.failure("fingerprint", full_path, error)
+            elif isinstance(error, FileNotFoundError):
+                stats.failure("missing", full_path, error)
+            else:
+                raise error
+            file_done()
+            # Les copies qui attendaient cette empreinte la calculent elles-mêmes
+            waiters = hashes_in_flight.pop(file_hash, []) if file_hash else []
+            return [("parse", j, (all_files_to_process[j], None, None, FPCALC_PATH, metas.get(j))) for j in waiters]
+
+        def parse_done(i, result):
+            full_path = all_files_to_process[i]
+            stat, file_hash = prepared.pop(i)
+            fp, duration, title, artist, album, bitrate, new_stat, computed, report = result
+            if computed and report["short"]:
+                short_fps.add(fingerprint_key(_packed(fp)))
+            short = fingerprint_key(_packed(fp)) in short_fps
+            stats.count("parsed")
+            if report["metadata"] is not None:
+                stats.add_task("metadata", report["metadata"])
+            if report["from_tag"]:
+                stats.count("tag_fingerprints")
+            if computed:
+                stats.count(f"{report['backend']}_runs")
+                if short:
+                    stats.count("short_fingerprints")
+                stats.count("fpcalc_processes", report["fpcalc_processes"])
+                stats.add_task(report["backend"], report["fingerprint"], bytes_read=stat.st_size)
+            if report["tag_written"] is not None:
+                stats.add_task("tag_write", report["tag_write"])
+                if not report["tag_written"]:
+                    stats.failure("tag_write", full_path, "écriture du tag impossible")
+            stat = new_stat or stat
+            fields = dict(duration=duration, title=title, artist=artist, album=album, bitrate=bitrate,
+                          content_hash=file_hash)
+            if short:
+                short_files[i] = (stat, file_hash)
+                index.store(full_path, stat, short_fingerprint=fp, short_length=short_length, **fields)
+            else:
+                tag_pending = (computed and tag_write_policy == TAG_WRITE_DEFERRED
+                               and can_hold_fingerprint_tag(full_path))
+                index.store(full_path, stat, fingerprint=fp, tag_pending=tag_pending or None, **fields)
+                if tag_pending:
+                    pending_tags.append((full_path, fp))
+            make_info(i, stat, fp, duration, title, artist, album, bitrate, file_hash)
+            file_done()
+            if file_hash:
+                content_hashes[full_path] = file_hash
+                if computed or file_hash not in fp_cache:
+                    fp_cache[file_hash] = (duration, file_infos[i][1])
+                waiters = hashes_in_flight.pop(file_hash, [])
+                return [("parse", j, (all_files_to_process[j], fp, duration, FPCALC_PATH, metas.get(j)))
+                        for j in waiters]
+            return []
+
+        def route(stage, i, result):
+            full_path = all_files_to_process[i]
+            progress.stage_done(stage)
+            if stage == "sample":
+                size = bucket_stat(i).st_size
+                samples[i] = None if isinstance(result, BaseException) else result
+                if isinstance(result, BaseException):
+                    stats.failure("hash", full_path, result)
+                else:
+                    stats.add_task("sample", files=0, bytes_read=min(size, 2 * SAMPLE_SIZE))
+                bucket_pending[size] -= 1
+                if bucket_pending[size]:
+                    return []
+                by_sample = {}
+                for j in size_buckets[size]:
+                    if j in samples:
+                        by_sample.setdefault(samples.pop(j), []).append(j)
+                nexts = []
+                for sample, members in by_sample.items():
+                    fresh = [j for j in members if j not in indexed]
+                    if not fresh:
+                        continue
+                    if sample is not None and len(members) > 1:
+                        hashing = [j for j in members
+                                   if j not in indexed or all_files_to_process[j] not in content_hashes]
+                        if len(hashing) > len(fresh):
+                            barrier = [len(hashing), fresh]
+                            hash_barriers.update((j, barrier) for j in hashing)
+                        nexts.extend(("full", j, (all_files_to_process[j],)) for j in hashing)
+                    else:
+                        for j in fresh:
+                            nexts.extend(dispatch_parse(j))
+                return nexts
+            if stage == "full":
+                file_hash = None if isinstance(result, BaseException) else result
+                if file_hash is None:
+                    stats.failure("hash", full_path, result)
+                else:
+                    stats.add_task("full", files=0, bytes_read=bucket_stat(i).st_size)
+                if i in indexed:
+                    if file_hash:
+                        # Fichier indexé : son empreinte devient réutilisable par les copies
+                        content_hashes[full_path] = file_hash
+                        fp_cache.setdefault(file_hash, (file_infos[i][0]["duration"], file_infos[i][1]))
+                        index.content_hashed(full_path, file_hash)
+                else:
+                    prepared[i][1] = file_hash
+                barrier = hash_barriers.pop(i, None)
+                if barrier is None:
+                    return dispatch_parse(i)
+                barrier[0] -= 1
+                if barrier[0]:
+                    return []
+                return [item for j in barrier[1] for item in dispatch_parse(j)]
+            if stage == "fpcalc_batch":
+                parsed = deferred.pop(i)
+                if isinstance(result, BaseException):
+                    stats.count("fpcalc_processes")  # fichier isolé du lot et relancé seul
+                    return parse_failed(i, result)
+                return parse_done(i, _complete_deferred(parsed, result))
+            # stage == "parse"
+            if isinstance(result, BaseException):
+                return parse_failed(i, result)
+            if result[-1]["deferred"]:
+                # fpcalc nécessaire : le fichier rejoint le prochain lot
+                deferred[i] = result
+                return [("fpcalc_batch", i, (full_path, FPCALC_PATH))]
+            return parse_done(i, result)
+
+        def initial_items(indices):
+            for i in indices:
+                size = bucket_stat(i).st_size
+                if size in bucket_pending:
+                    yield "sample", i, (all_files_to_process[i], size)
+                else:
+                    yield "parse", i, (all_files_to_process[i], None, None, FPCALC_PATH, metas.get(i))
+
+        def fingerprint_stages(length, file_device):
+            write_tag = tag_write_policy == TAG_WRITE_IMMEDIATE
+            return {
+                "parse": pipeline.cpu_stage("parse", functools.partial(
+                    _fingerprint_and_parse, write_tag=write_tag, backend=fingerprint_backend, batch_fpcalc=True,
+                    length=length), device_of=file_device),
+                "fpcalc_batch": pipeline.batch_stage("fpcalc_batch", functools.partial(
+                    _fingerprint_batch, write_tag=write_tag, length=length), FPCALC_BATCH_SIZE),
+            }
+
+        sample_ahead, full_ahead = ReadAhead(SAMPLE_SIZE), ReadAhead(0)
+        stages = {
+            "sample": pipeline.io_stage("sample", functools.partial(file_sample_hash, read_ahead=sample_ahead),
+                                        device_of=bucket_device, prefetch=prefetch(sample_ahead)),
+            "full": pipeline.io_stage("full", functools.partial(file_sha1, read_ahead=full_ahead),
+                                      device_of=bucket_device, prefetch=prefetch(full_ahead)),
+            **fingerprint_stages(short_length, prepared_device),
+        }
+        with stats.phase("fingerprint"):
+            try:
+                pipeline.run({device: initial_items(indices)
+                              for device, indices in by_device(sorted(prepared.keys() | indexed.keys()),
+                                                               bucket_device).items()},
+                             stages, route, control=control, on_pause=index.commit)
+            finally:
+                sample_ahead.close()
+                full_ahead.close()
+        progress.flush()
+        for stage in stages.values():
+            stats.add_task(stage.name, stage.busy, files=stage.completed)
+
+        # Étape 2 bis: Empreinte complète des seuls fichiers dont l'empreinte courte a une voisine
+        if short_files:
+            if control is not None:
+                control.checkpoint(index.commit)
+            with stats.phase("candidates"):
+                candidates = _short_fingerprint_candidates(
+                    file_infos, short_fps, acoustic_similarity_threshold - SHORT_FINGERPRINT_MARGIN)
+            stats.count("two_phase_candidates", len(candidates))
+            # Copies identiques (même SHA-1) : une seule empreinte complète pour toutes
+            copies = {}
+            first_with_hash = {}
+            for i in candidates:
+                file_hash = short_files[i][1]
+                if file_hash in first_with_hash:
+                    copies[first_with_hash[file_hash]].append(i)
+                    continue
+                if file_hash:
+                    first_with_hash[file_hash] = i
+                copies[i] = []
+            queue.put(("status", f"Étape 2/3: Empreintes complètes de {len(candidates)} fichiers candidats..."))
+            queue.put(("progress_max", len(candidates)))
+            progress = ProgressReporter(queue, len(candidates))
+            progress.flush()
+
+            def confirm_done(i, result):
+                fp, duration, title, artist, album, bitrate, new_stat, computed, report = result
+                if computed:
+                    stats.count(f"{report['backend']}_full_runs")
+                    stats.count("fpcalc_processes", report["fpcalc_processes"])
+                    stats.add_task(f"{report['backend']}_full", report["fingerprint"],
+                                   bytes_read=short_files[i][0].st_size)
+                if report["tag_written"] is not None:
+                    stats.add_task("tag_write", report["tag_write"])
+                    if not report["tag_written"]:
+                        stats.failure("tag_write", all_files_to_process[i], "écriture du tag impossible")
+                for j in [i] + copies[i]:
+                    full_path = all_files_to_process[j]
+                    stat, file_hash = short_files.pop(j)
+                    if j == i:
+                        stat = new_stat or stat
+                    fields = dict(duration=duration, title=title, artist=artist, album=album, bitrate=bitrate,
+                                  content_hash=file_hash)
+                    short_fp = _unpacked(file_infos[j][1])
+                    tag_pending = (j == i and computed and tag_write_policy == TAG_WRITE_DEFERRED
+                                   and can_hold_fingerprint_tag(full_path))
+                    index.store(full_path, stat, fingerprint=fp, short_fingerprint=short_fp,
+                                short_length=short_length, tag_pending=tag_pending or None, **fields)
+                    if tag_pending:
+                        pending_tags.append((full_path, fp))
+                    make_info(j, stat, fp, duration, title, artist, album, bitrate, file_hash)
+                    file_done()
+
+            def confirm_route(stage, i, result):
+                progress.stage_done(stage)
+                parsed = deferred.pop(i) if stage == "fpcalc_batch" else None
+                if isinstance(result, BaseException):
+                    if stage == "fpcalc_batch":
+                        stats.count("fpcalc_processes")
+                    if not isinstance(result, (acoustid.FingerprintGenerationError, FileNotFoundError)):
+                        raise result
+                    # L'empreinte courte reste celle du fichier (et de ses copies)
+                    stats.failure("fingerprint" if isinstance(result, acoustid.FingerprintGenerationError)
+                                  else "missing", all_files_to_process[i], result)
+                    for _ in [i] + copies[i]:
+                        file_done()
+                    return []
+                if parsed is not None:
+                    result = _complete_deferred(parsed, result)
+                elif result[-1]["deferred"]:
+                    deferred[i] = result
+                    return [("fpcalc_batch", i, (all_files_to_process[i], FPCALC_PATH))]
+                confirm_done(i, result)
+                return []
+
+            stages = fingerprint_stages(None, short_device)
+            with stats.phase("full_fingerprint"):
+                pipeline.run({device: [("parse", i, (all_files_to_process[i], None, None, FPCALC_PATH, metas.get(i)))
+                                       for i in indices]
+                              for device, indices in by_device(copies, short_device).items()},
+                             stages, confirm_route, control=control, on_pause=index.commit)
+            progress.flush()
+            for stage in stages.values():
+                stats.add_task(stage.name, stage.busy, files=stage.completed)
+
+        # Étape 3: Regrouper les doublons acoustiques (exacts ou proches), puis par titre
+        if control is not None:
+            control.checkpoint(index.commit)
         queue.put(("status", "Étape 3/3: Finalisation..."))
-        duplicate_groups = [group for group in fingerprint_map.values() if len(group) > 1]
-        # Ajout : groupes par similarité de titre
-        title_sim_groups = group_by_title_similarity(all_file_infos, threshold=title_similarity_threshold)
-        # Fusionner les deux types de groupes (en évitant les doublons)
-        all_groups = duplicate_groups[:]
-        # On évite d'ajouter deux fois les mêmes fichiers
-        already_in_group = set(f["path"] for group in duplicate_groups for f in group)
-        for group in title_sim_groups:
-            if any(f["path"] in already_in_group for f in group):
-                continue
-            all_groups.append(group)
-            already_in_group.update(f["path"] for f in group)
+        if library is None:
+            library = DuplicateLibrary()
+        # Ordre de collecte : résultats déterministes
+        library.build([entry for entry in file_infos if entry is not None],
+                      acoustic_threshold=acoustic_similarity_threshold, title_threshold=title_similarity_threshold,
+                      stats=stats, content_hashes=content_hashes, short_keys=short_fps)
+        # Copies : la bibliothèque peut continuer d'évoluer (surveillance) pendant l'affichage
+        all_groups = [DuplicateGroup(group, group.key, group.evidence) for group in library.groups.values()]
         if not all_groups:
             queue.put(("message", ("info", "Analyse terminée. Aucun doublon trouvé.")))
         else:
             queue.put(("results", all_groups))
+        outcome = "completed"
+        if pending_tags:
+            # Les résultats sont déjà affichés : les tags sont écrits ensuite, en un seul lot
+            try:
+                with stats.phase("tag_write"):
+                    write_deferred_tags(pending_tags, index, queue, stats, control)
+            except ScanCancelled:
+                outcome = "cancelled"
+                queue.put(("message", ("info", "Écriture des tags annulée : les résultats restent valables, les "
+                                               "tags restants seront écrits au prochain scan.")))
+    except ScanCancelled:
+        outcome = "cancelled"
+        queue.put(("message", ("info", "Scan annulé. Les fichiers déjà traités sont conservés dans l'index : "
+                                       "relancez le scan pour reprendre là où il s'est arrêté.")))
     except Exception as e:
         tb = traceback.format_exc()
         print(tb)
+        stats.failure("scan", None, e)
         queue.put(("message", ("error", f"Erreur lors du scan : {e}\n\n{tb}")))
     finally:
+        if index is not None:
+            try:
+                index.close()
+            except Exception:
+                pass
+        stats.finish(outcome)
+        queue.put(("scan_stats", stats.to_dict()))
+        if report_path:
+            try:
+                stats.write_json(report_path)
+            except OSError as e:
+                print(f"[WARNING] Impossible d'écrire le rapport du scan {report_path} : {e}")
         queue.put(("finished", None))
+
+def _fingerprint_paths(paths, date_type, queue, index, pipeline, tag_write_policy, control, fingerprint_backend):
+    """
+    Empreintes d'une poignée de fichiers modifiés : relues depuis l'index si le fichier
+    n'a pas changé, sinon calculées par les étapes CPU du pipeline (fpcalc par lots).
+
+    Returns:
+        dict: {chemin: (file_info, empreinte)} des fichiers lisibles.
+    """
+    entries = {}
+    file_stats = {}
+    deferred = {}
+    pending_tags = []
+    items = []
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        cached = index.lookup(path, stat)
+        if cached and cached["fingerprint"]:
+            entries[path] = (_file_info(path, stat, date_type, cached["title"], cached["artist"], cached["album"],
+                                        cached["bitrate"] or 0, cached["duration"] or 0), cached["fingerprint"])
+            if cached["tag_pending"] and tag_write_policy != TAG_WRITE_OFF and can_hold_fingerprint_tag(path):
+                pending_tags.append((path, cached["fingerprint"]))
+        else:
+            file_stats[path] = stat
+            items.append(("parse", path, (path, None, None, FPCALC_PATH)))
+
+    def route(stage, path, result):
+        parsed = deferred.pop(path, None) if stage == "fpcalc_batch" else None
+        if isinstance(result, BaseException):
+            if not isinstance(result, (acoustid.FingerprintGenerationError, FileNotFoundError)):
+                raise result
+            return []  # fichier illisible : absent des résultats, comme lors du scan
+        if parsed is not None:
+            result = _complete_deferred(parsed, result)
+        elif result[-1]["deferred"]:
+            deferred[path] = result
+            return [("fpcalc_batch", path, (path, FPCALC_PATH))]
+        fp, duration, title, artist, album, bitrate, new_stat, computed, _ = result
+        stat = new_stat or file_stats[path]
+        tag_pending = computed and tag_write_policy == TAG_WRITE_DEFERRED and can_hold_fingerprint_tag(path)
+        index.store(path, stat, fingerprint=fp, duration=duration, title=title, artist=artist, album=album,
+                    bitrate=bitrate, tag_pending=tag_pending or None)
+        if tag_pending:
+            pending_tags.append((path, fp))
+        entries[path] = (_file_info(path, stat, date_type, title, artist, album, bitrate, duration), fp)
+        return []
+
+    if items:
+        write_tag = tag_write_policy == TAG_WRITE_IMMEDIATE
+        stages = {
+            "parse": pipeline.cpu_stage("parse", functools.partial(
+                _fingerprint_and_parse, write_tag=write_tag, backend=fingerprint_backend, batch_fpcalc=True),
+                device_of=lambda path: device_of(path, file_stats[path])),
+            "fpcalc_batch": pipeline.batch_stage("fpcalc_batch", functools.partial(
+                _fingerprint_batch, write_tag=write_tag), FPCALC_BATCH_SIZE),
+        }
+        pipeline.run(items, stages, route, control=control)
+    if pending_tags:
+        write_deferred_tags(pending_tags, index, queue, control=control)
+    index.commit()
+    return entries
+
+def watch_duplicates(library, paths_to_watch, date_type, queue, control, index_path=INDEX_PATH,
+                     io_workers=None, cpu_workers=None, tag_write_policy=TAG_WRITE_IMMEDIATE,
+                     fingerprint_backend=BACKEND_AUTO, duration_tolerance=None):
+    """
+    Surveille les dossiers après un scan et tient les groupes à jour au fil des
+    créations, modifications, déplacements et suppressions de fichiers.
+
+    Seuls les fichiers touchés sont relus (index, puis moteur d'empreinte), et `library` ne
+    regroupe que autour d'eux. À exécuter dans un thread, comme `scan_duplicates` ;
+    envoie ("group_updated", (clé, [file_info, ...])) pour chaque groupe créé ou
+    modifié et ("group_removed", clé) pour chaque groupe disparu.
+
+    Args:
+        library (DuplicateLibrary): Bibliothèque remplie par `scan_duplicates`.
+        paths_to_watch (list): Dossiers à surveiller (ceux du scan).
+        control (ScanControl): La surveillance s'arrête quand il est annulé.
+        duration_tolerance (float): Celle du scan : un fichier qu'elle avait écarté sans
+                          empreinte est empreinté dès qu'un fichier de durée proche apparaît.
+    """
+    watcher = None
+    index = None
+    try:
+        watcher = LibraryWatcher(paths_to_watch, SUPPORTED_EXTENSIONS)
+        index = FingerprintIndex(index_path)
+        pipeline = get_pipeline(io_workers, cpu_workers)
+        while True:
+            batch = watcher.wait_changes(control)
+            if batch is None:
+                return
+            removed = set(batch.removed)
+            if batch.resync:
+                removed.update(path for path in library.files if not os.path.exists(path))
+            entries = _fingerprint_paths(batch.changed, date_type, queue, index, pipeline, tag_write_policy, control,
+                                         fingerprint_backend)
+            if duration_tolerance:
+                near = library.unfingerprinted_near([info["duration"] for info, _ in entries.values()],
+                                                    duration_tolerance)
+                entries.update(_fingerprint_paths(set(near) - entries.keys(), date_type, queue, index, pipeline,
+                                                  tag_write_policy, control, fingerprint_backend))
+            # Empreintes courtes du scan proches d'une nouvelle empreinte : empreinte complète
+            # avant de les relier, y compris pour leurs propres voisines courtes
+            tried = set(entries)
+            fresh = entries
+            while True:
+                short = library.short_neighbours(fp for _, fp in fresh.values()) - tried
+                if not short:
+                    break
+                tried |= short
+                fresh = _fingerprint_paths(short, date_type, queue, index, pipeline, tag_write_policy, control,
+                                           fingerprint_backend)
+                entries.update(fresh)
+            # Fichier devenu illisible : il sort de ses groupes
+            removed.update(batch.changed - entries.keys())
+            updated, removed_keys = library.update(entries, removed)
+            for key in removed_keys:
+                queue.put(("group_removed", key))
+            for group in updated:
+                queue.put(("group_updated", (group.key, list(group))))
+            queue.put(("status", f"Dossiers surveillés : {len(entries)} fichier(s) relu(s), "
+                                 f"{len(removed)} supprimé(s), {len(updated) + len(removed_keys)} groupe(s) mis à jour."))
+    except ScanCancelled:
+        pass
+    except Exception as e:
+        tb = traceback.format_exc()
+        print(tb)
+        queue.put(("message", ("error", f"Erreur lors de la surveillance des dossiers : {e}\n\n{tb}")))
+    finally:
+        if index is not None:
+            try:
+                index.close()
+            except Exception:
+                pass
+        if watcher is not None:
+            watcher.close()
+
+# Intervalle minimal (s) entre deux lignes de progression de la ligne de commande
+CLI_PROGRESS_INTERVAL = 5.0
+
+class JsonLinesSink:
+    """
+    Remplace la file de l'interface pour la ligne de commande : chaque groupe est écrit en
+    JSON Lines ({"key": ..., "evidence": {...}, "files": [file_info, ...]}) dès sa
+    réception, le statut et la progression vont sur `log` (stderr). Avec `duration_tolerance`,
+    seuls les groupes passant le filtre de durée sont écrits, comme dans l'interface.
+
+    Les doublons exacts envoyés pendant le scan sont écrits aussitôt avec "partial": true :
+    une ligne partielle de même clé remplace la précédente, "files": [] la retire. Les groupes
+    finaux suivent, sans "partial", et font foi (`partial=False` n'écrit qu'eux).
+    """
+    def __init__(self, out, log=sys.stderr, quiet=False, duration_tolerance=None, partial=True):
+        self.out = out
+        self.duration_tolerance = duration_tolerance
+        self.log = log
+        self.quiet = quiet
+        self.partial = partial
+        self.groups = 0
+        self.failed = False
+        self._last_progress = 0.0
+        self._partial_keys = set()  # clés des groupes partiels écrits et non retirés
+
+    def _write(self, record):
+        key = record["key"]
+        if isinstance(key, bytes):
+            record["key"] = key.hex()  # clé d'empreinte (octets) des groupes partiels
+        self.out.write(json.dumps(record) + "\n")
+
+    def put(self, message):
+        msg_type, data = message
+        if msg_type in ("group_added", "group_updated", "group_removed"):
+            if not self.partial:
+                return
+            key, files = (data, []) if msg_type == "group_removed" else data
+            if files and self.duration_tolerance and not passes_duration_filter(files, self.duration_tolerance):
+                files = []
+            if files:
+                self._partial_keys.add(key)
+            elif key in self._partial_keys:
+                self._partial_keys.discard(key)
+            else:
+                return
+            self._write({"key": key, "partial": True, "evidence": {}, "files": [dict(f) for f in files]})
+            self.out.flush()
+        elif msg_type == "results":
+            for group in data:
+                if self.duration_tolerance and not passes_duration_filter(group, self.duration_tolerance):
+                    continue
+                self._write({"key": getattr(group, "key", None), "evidence": getattr(group, "evidence", {}),
+                             "files": [dict(f) for f in group]})
+                self.groups += 1
+            self.out.flush()
+        elif msg_type == "scan_stats":
+            if not self.quiet:
+                print(format_summary(data), file=self.log)
+        elif msg_type == "message":
+            level, text = data
+            self.failed = self.failed or level == "error"
+            print(f"[{level.upper()}] {text}", file=self.log)
+        elif self.quiet:
+            return
+        elif msg_type == "status":
+            print(data, file=self.log)
+        elif msg_type == "progress_detail":
+            now = time.monotonic()
+            if now - self._last_progress >= CLI_PROGRESS_INTERVAL or data["done"] == data["total"]:
+                self._last_progress = now
+                eta = f"{data['eta']:.0f} s" if data["eta"] is not None else "?"
+                print(f"{data['done']}/{data['total']} fichiers ({data['rate']:.1f}/s, reste {eta})", file=self.log)
+
+def main(argv=None):
+    """
+    Scan sans interface (serveur, NAS) : `python -m scanner scan DOSSIER...`.
+
+    Même pipeline que l'interface, sans importer tkinter ; les groupes de doublons
+    sont écrits en JSON Lines sur la sortie standard ou dans un fichier. Un scan
+    interrompu (Ctrl+C) reprend au lancement suivant grâce à l'index.
+    """
+    global FPCALC_PATH
+    parser = argparse.ArgumentParser(prog="python -m scanner",
+                                     description="Recherche de doublons musicaux sans interface graphique.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    scan = commands.add_parser("scan", help="scanner des dossiers et écrire les groupes en JSON Lines")
+    scan.add_argument("roots", nargs="+", metavar="ROOT", help="dossier à analyser")
+    scan.add_argument("-o", "--output", help="fichier JSON Lines à écrire (défaut : sortie standard)")
+    scan.add_argument("--date", dest="date_type", choices=("modification", "creation"), default="modification",
+                      help="date reportée pour chaque fichier (défaut : modification)")
+    scan.add_argument("--title-threshold", type=float, default=0.8,
+                      help="similarité minimale des titres, entre 0 et 1 (défaut : 0.8)")
+    scan.add_argument("--acoustic-threshold", type=float, default=0.85,
+                      help=f"similarité acoustique minimale, entre {MIN_SUPPORTED_SIMILARITY:g} et 1 (défaut : 0.85)")
+    scan.add_argument("--tag-write", choices=TAG_WRITE_POLICIES, default=TAG_WRITE_IMMEDIATE,
+                      help="écriture des empreintes calculées dans les tags (défaut : immediate)")
+    scan.add_argument("--index", default=INDEX_PATH, help="base SQLite de l'index des empreintes")
+    scan.add_argument("--report", help="fichier où écrire le rapport JSON du scan (temps, caches, échecs)")
+    scan.add_argument("--fpcalc", help="chemin de fpcalc (défaut : à côté de l'application, sinon dans le PATH)")
+    scan.add_argument("--backend", choices=FINGERPRINT_BACKENDS, default=BACKEND_AUTO,
+                      help="moteur d'empreinte : auto (libchromaprint si disponible, sinon fpcalc), "
+                           "chromaprint (en processus, fpcalc en repli) ou fpcalc (défaut : auto)")
+    scan.add_argument("--short-length", type=int, default=SHORT_FINGERPRINT_LENGTH,
+                      help="secondes de la passe courte de l'empreinte en deux passes ; 0 pour calculer "
+                           f"directement l'empreinte complète (défaut : {SHORT_FINGERPRINT_LENGTH})")
+    scan.add_argument("--duration-tolerance", type=float,
+                      help="rapport minimal des durées (min/max, entre 0 et 1) des groupes écrits ; un fichier sans "
+                           "autre fichier de durée proche n'est alors pas empreinté (défaut : aucun filtre)")
+    scan.add_argument("--io-workers", type=int, help="threads pour le hachage et la lecture des tags")
+    scan.add_argument("--cpu-workers", type=int, help="processus pour l'empreinte et le parsing")
+    scan.add_argument("--final-only", action="store_true",
+                      help="n'écrire que les groupes finaux, sans les doublons exacts partiels écrits pendant le scan")
+    scan.add_argument("-q", "--quiet", action="store_true", help="n'afficher que les erreurs sur stderr")
+    args = parser.parse_args(argv)
+
+    for name in ("title_threshold", "acoustic_threshold"):
+        if not 0 <= getattr(args, name) <= 1:
+            parser.error(f"--{name.replace('_', '-')} doit être compris entre 0 et 1")
+    if args.acoustic_threshold < MIN_SUPPORTED_SIMILARITY:
+        parser.error(f"--acoustic-threshold doit valoir au moins {MIN_SUPPORTED_SIMILARITY:g} : en dessous, "
+                     "l'index acoustique ne retrouve pas toutes les paires proches")
+    if args.duration_tolerance is not None and not 0 < args.duration_tolerance <= 1:
+        parser.error("--duration-tolerance doit être compris entre 0 (exclu) et 1")
+    if args.short_length < 0:
+        parser.error("--short-length doit être positif ou nul")
+    missing = [root for root in args.roots if not os.path.isdir(root)]
+    if missing:
+        parser.error(f"dossier introuvable : {', '.join(missing)}")
+    if args.fpcalc:
+        FPCALC_PATH = args.fpcalc
+    elif not os.path.exists(FPCALC_PATH):
+        FPCALC_PATH = shutil.which("fpcalc") or FPCALC_PATH
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    sink = JsonLinesSink(out, quiet=args.quiet, duration_tolerance=args.duration_tolerance,
+                         partial=not args.final_only)
+    try:
+        scan_duplicates([os.path.abspath(root) for root in args.roots], args.date_type, sink,
+                        title_similarity_threshold=args.title_threshold, index_path=args.index,
+                        io_workers=args.io_workers, cpu_workers=args.cpu_workers,
+                        acoustic_similarity_threshold=args.acoustic_threshold, tag_write_policy=args.tag_write,
+                        report_path=args.report, fingerprint_backend=args.backend,
+                        short_fingerprint_length=args.short_length, duration_tolerance=args.duration_tolerance)
+    except KeyboardInterrupt:
+        print("Scan interrompu : relancez la même commande pour reprendre.", file=sys.stderr)
+        return 130
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if not args.quiet:
+        print(f"\n{sink.groups} groupe(s) de doublons écrit(s).", file=sys.stderr)
+    return 1 if sink.failed else 0
+
+if __name__ == "__main__":
+    # Passer par le module importé : les workers du pipeline référencent `scanner`, pas `__main__`
+    from scanner import main as _main
+    sys.exit(_main())
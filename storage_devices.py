@@ -0,0 +1,149 @@
+import os
+import functools
+import threading
+
+# Sortes de périphériques de stockage
+DEVICE_HDD = "hdd"          # disque rotatif : chaque lecture concurrente coûte un déplacement de tête
+DEVICE_SSD = "ssd"
+DEVICE_NETWORK = "network"  # partage NFS / SMB / sshfs... : la latence se masque par le parallélisme
+DEVICE_UNKNOWN = "unknown"
+
+# Lectures simultanées par périphérique dans les étapes d'E/S du scan (None : limite de l'étape)
+IO_CONCURRENCY = {
+    DEVICE_HDD: 1,
+    DEVICE_SSD: None,
+    DEVICE_NETWORK: 16,
+    DEVICE_UNKNOWN: None,
+}
+
+# Systèmes de fichiers réseau (type de montage dans /proc/self/mountinfo)
+NETWORK_FILESYSTEMS = ("nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "ceph", "glusterfs", "lustre",
+                       "fuse.sshfs", "fuse.rclone", "fuse.s3fs", "davfs", "fuse.davfs2")
+
+
+def _mount_types():
+    """{(majeur, mineur): type de système de fichiers} des montages du processus (Linux)."""
+    types = {}
+    try:
+        with open("/proc/self/mountinfo", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                fields = line.split()
+                try:
+                    major, minor = fields[2].split(":")
+                    types[(int(major), int(minor))] = fields[fields.index("-") + 1]
+                except (ValueError, IndexError):
+                    continue
+    except OSError:
+        pass
+    return types
+
+
+def _rotational(major, minor):
+    """Vrai / faux d'après /sys/dev/block (une partition hérite de son disque), None si inconnu."""
+    device = os.path.realpath(f"/sys/dev/block/{major}:{minor}")
+    for candidate in (device, os.path.dirname(device)):
+        try:
+            with open(os.path.join(candidate, "queue", "rotational")) as f:
+                return f.read().strip() == "1"
+        except OSError:
+            continue
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def device_kind(device):
+    """
+    Sorte (DEVICE_*) du périphérique `device` : un `st_dev`, ou une lettre de lecteur
+    quand le système n'en donne pas. Seul Linux est reconnu (mountinfo et sysfs) ;
+    ailleurs, le périphérique est DEVICE_UNKNOWN.
+    """
+    if not isinstance(device, int) or not os.path.exists("/proc/self/mountinfo"):
+        return DEVICE_UNKNOWN
+    major, minor = os.major(device), os.minor(device)
+    fstype = _mount_types().get((major, minor), "")
+    if fstype in NETWORK_FILESYSTEMS or fstype.startswith("nfs"):
+        return DEVICE_NETWORK
+    rotational = _rotational(major, minor) if major else None
+    if rotational is None:
+        return DEVICE_UNKNOWN
+    return DEVICE_HDD if rotational else DEVICE_SSD
+
+
+def io_limit(device):
+    """Lectures simultanées permises sur `device` (None : pas de limite propre)."""
+    return IO_CONCURRENCY[device_kind(device)]
+
+
+def device_of(path, stat):
+    """Identifiant du périphérique d'un fichier : `st_dev`, ou la lettre de lecteur si st_dev vaut 0 (Windows)."""
+    return getattr(stat, "st_dev", 0) or os.path.splitdrive(path)[0].lower() or None
+
+
+class ReadAhead:
+    """
+    Lecture anticipée des prochains fichiers d'une étape d'E/S (`prefetch` du pipeline) :
+    le fichier est ouvert, le noyau prié d'en lire `length` octets à l'avance (0 : tout),
+    et le descripteur gardé pour l'étape, qui le reprend par `open` au lieu de rouvrir
+    le fichier. Chaque fichier n'est ainsi ouvert qu'une fois, ce qui compte sur un
+    partage réseau (une ouverture y coûte un aller-retour).
+
+    Au plus `limit` descripteurs sont gardés (les plus anciens, jamais repris, sont
+    fermés) ; `close` ferme ceux qui restent en fin d'étape. Sans effet hors POSIX :
+    `open` ouvre alors simplement le fichier.
+    """
+    def __init__(self, length=0, limit=64):
+        self.length = length
+        self.limit = limit
+        self._fds = {}  # {chemin: descripteur ouvert à l'avance}, du plus ancien au plus récent
+        self._lock = threading.Lock()
+
+    def __call__(self, path):
+        if not hasattr(os, "posix_fadvise"):
+            return
+        with self._lock:
+            if path in self._fds:
+                return
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.posix_fadvise(fd, 0, self.length, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        stale = []
+        with self._lock:
+            if path in self._fds:
+                stale.append(fd)
+            else:
+                self._fds[path] = fd
+                while len(self._fds) > self.limit:
+                    stale.append(self._fds.pop(next(iter(self._fds))))
+        for fd in stale:
+            os.close(fd)
+
+    def open(self, path):
+        """Fichier binaire non tamponné : le descripteur lu à l'avance s'il y en a un, sinon une ouverture."""
+        with self._lock:
+            fd = self._fds.pop(path, None)
+        if fd is None:
+            fd = os.open(path, os.O_RDONLY)
+        f = open(fd, 'rb', buffering=0)
+        f.name = path  # mutagen identifie le format par le nom du fichier
+        return f
+
+    def close(self):
+        with self._lock:
+            fds = list(self._fds.values())
+            self._fds.clear()
+        for fd in fds:
+            os.close(fd)
+
+
+def advise_sequential(fd):
+    """Indique une lecture séquentielle de tout le fichier (fenêtre de lecture anticipée agrandie)."""
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
@@ -0,0 +1,42 @@
+"""Encodeur Chromaprint minimal pour les tests : l'inverse de `acoustic_match.decode_fingerprint`."""
+import base64
+
+
+def _pack_bits(values, width):
+    bits = 0
+    for k, value in enumerate(values):
+        bits |= value << (k * width)
+    return bits.to_bytes((len(values) * width + 7) // 8, "little")
+
+
+def encode_fingerprint(values, algorithm=1):
+    """Empreinte compressée (base64, comme fpcalc) des sous-empreintes uint32 `values`."""
+    normal, exceptions = [], []
+    previous = 0
+    for value in values:
+        xored = value ^ previous
+        previous = value
+        last = 0
+        for bit in range(32):
+            if xored >> bit & 1:
+                gap = bit + 1 - last
+                last = bit + 1
+                if gap >= 7:
+                    normal.append(7)
+                    exceptions.append(gap - 7)
+                else:
+                    normal.append(gap)
+        normal.append(0)
+    data = bytes([algorithm]) + len(values).to_bytes(3, "big") + _pack_bits(normal, 3) + _pack_bits(exceptions, 5)
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def random_values(rng, count=200):
+    """Sous-empreintes d'un morceau fictif : chaque trame modifie quelques bits de la précédente."""
+    value = rng.getrandbits(32)
+    values = []
+    for _ in range(count):
+        for _ in range(rng.randint(0, 3)):
+            value ^= 1 << rng.randrange(32)
+        values.append(value)
+    return values
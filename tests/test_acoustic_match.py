@@ -0,0 +1,81 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from acoustic_match import (MIN_OVERLAP, MIN_SUPPORTED_SIMILARITY, AcousticIndex, best_similarity, bit_error_rate,
+                            decode_fingerprint, find_similar_pairs)
+from fingerprints import encode_fingerprint, random_values
+
+
+def variant(rng, values, noise=0.03, shift=0):
+    """Autre encodage du même morceau : quelques bits changés, début décalé de `shift` trames."""
+    values = [v ^ (1 << rng.randrange(32)) if rng.random() < noise else v for v in values]
+    return values[shift:] if shift >= 0 else [rng.getrandbits(32) for _ in range(-shift)] + values
+
+
+def flip_bits(rng, values, ber):
+    """Chaque bit changé indépendamment avec la probabilité `ber` (taux d'erreur binaire visé)."""
+    return [v ^ sum(1 << bit for bit in range(32) if rng.random() < ber) for v in values]
+
+
+def test_bit_error_rate():
+    a = np.zeros(MIN_OVERLAP, dtype=np.uint32)
+    b = a.copy()
+    b[0] = 0xF
+    assert bit_error_rate(a, a) == 0
+    assert bit_error_rate(a, b) == 4 / (32 * MIN_OVERLAP)
+    assert bit_error_rate(a[1:], a[1:]) is None  # recouvrement trop court
+
+
+def test_pairs_match_exhaustive_comparison():
+    rng = random.Random(6)
+    songs = [random_values(rng, 400) for _ in range(5)]
+    fingerprints = [encode_fingerprint(variant(rng, rng.choice(songs), shift=rng.randint(-10, 10)))
+                    for _ in range(15)]
+    decoded = [decode_fingerprint(fp) for fp in fingerprints]
+    threshold = 0.85
+    expected = {(i, j) for i, j in itertools.combinations(range(len(decoded)), 2)
+                if best_similarity(decoded[i], decoded[j]) >= threshold}
+    found = find_similar_pairs(fingerprints, threshold)
+    assert expected
+    assert {(i, j) for i, j, _ in found} == expected
+    for i, j, similarity in found:
+        assert similarity == best_similarity(decoded[i], decoded[j])
+
+
+def exhaustive_pairs(fingerprints, threshold):
+    decoded = [decode_fingerprint(fp) for fp in fingerprints]
+    return {(i, j): best_similarity(decoded[i], decoded[j]) for i, j in itertools.combinations(range(len(decoded)), 2)
+            if best_similarity(decoded[i], decoded[j]) >= threshold}
+
+
+@pytest.mark.parametrize("threshold", [MIN_SUPPORTED_SIMILARITY, 0.85, 0.9])
+def test_pairs_near_threshold_match_exhaustive_comparison(threshold):
+    # Encodages dont le taux d'erreur binaire encadre le seuil : une partie des paires le passe de peu
+    rng = random.Random(threshold)
+    fingerprints = []
+    for _ in range(6):
+        song = random_values(rng, 400)
+        fingerprints.append(encode_fingerprint(song))
+        for _ in range(2):
+            ber = rng.uniform(1 - threshold - 0.03, 1 - threshold + 0.02)
+            fingerprints.append(encode_fingerprint(variant(rng, flip_bits(rng, song, ber), noise=0, shift=rng.randint(-10, 10))))
+    expected = exhaustive_pairs(fingerprints, threshold)
+    assert len(expected) >= 6
+    found = find_similar_pairs(fingerprints, threshold)
+    assert {(i, j): similarity for i, j, similarity in found} == expected
+
+    index = AcousticIndex()
+    for fp in fingerprints:
+        index.add(fp)
+    for fp_id in range(len(fingerprints)):
+        assert {other: similarity for other, similarity in index.query(fp_id, threshold)} == \
+            {j if i == fp_id else i: similarity for (i, j), similarity in expected.items() if fp_id in (i, j)}
+
+
+def test_identical_fingerprints_still_match():
+    # Comportement d'origine : deux empreintes identiques forment un groupe
+    fp = encode_fingerprint(random_values(random.Random(2)))
+    assert [(i, j) for i, j, _ in find_similar_pairs([fp, fp])] == [(0, 1)]
@@ -0,0 +1,121 @@
+import random
+
+from acoustic_match import pack_fingerprint
+from clustering import (EVIDENCE_ACOUSTIC, EVIDENCE_CONTENT_HASH, EVIDENCE_FINGERPRINT, EVIDENCE_TITLE,
+                        WEAK_EVIDENCE, cluster)
+from fingerprints import encode_fingerprint, random_values
+from scanner import DuplicateLibrary, fingerprint_key, group_by_title_similarity
+
+
+def components(count, edges):
+    """Composantes connexes par parcours en largeur (référence du union-find)."""
+    neighbours = {i: set() for i in range(count)}
+    for a, b, _ in edges:
+        neighbours[a].add(b)
+        neighbours[b].add(a)
+    seen, result = set(), []
+    for start in range(count):
+        if start in seen:
+            continue
+        seen.add(start)
+        todo, members = [start], []
+        while todo:
+            i = todo.pop()
+            members.append(i)
+            for j in neighbours[i] - seen:
+                seen.add(j)
+                todo.append(j)
+        if len(members) > 1:
+            result.append(sorted(members))
+    return result
+
+
+def test_strong_links_give_connected_components():
+    rng = random.Random(21)
+    for _ in range(50):
+        count = rng.randint(2, 60)
+        edges = [(a, b, rng.choice((EVIDENCE_CONTENT_HASH, EVIDENCE_FINGERPRINT, EVIDENCE_ACOUSTIC)))
+                 for a, b in (rng.sample(range(count), 2) for _ in range(rng.randint(0, count)))]
+        groups = cluster(count, edges)
+        assert [members for members, _ in groups] == components(count, edges)
+        assert sum(sum(evidence.values()) for _, evidence in groups) == len(edges)
+
+
+def test_weak_links_never_merge_strong_groups():
+    assert WEAK_EVIDENCE == {EVIDENCE_TITLE}
+    edges = [(0, 1, EVIDENCE_FINGERPRINT), (2, 3, EVIDENCE_ACOUSTIC), (1, 2, EVIDENCE_TITLE), (3, 4, EVIDENCE_TITLE),
+             (5, 6, EVIDENCE_TITLE)]
+    assert cluster(7, edges) == [
+        ([0, 1], {EVIDENCE_FINGERPRINT: 1}),
+        ([2, 3, 4], {EVIDENCE_ACOUSTIC: 1, EVIDENCE_TITLE: 1}),
+        ([5, 6], {EVIDENCE_TITLE: 1}),
+    ]
+
+
+def info(path, title):
+    return {"path": path, "title": title, "artist": "", "album": "", "bitrate": 0, "duration": 200, "date": 0}
+
+
+def paths(groups):
+    return sorted(sorted(f["path"] for f in group) for group in groups)
+
+
+def test_identical_fingerprints_group_as_before():
+    # Avant le union-find : un groupe par empreinte identique (titres tous différents)
+    rng = random.Random(5)
+    songs = [encode_fingerprint(random_values(rng)) for _ in range(8)]
+    entries = [(info(f"/m/{k}.mp3", "".join(rng.choice("abcdefghijklmnop") for _ in range(12))), rng.choice(songs))
+               for k in range(40)]
+    library = DuplicateLibrary()
+    library.build(entries)
+    by_fp = {}
+    for entry, fp in entries:
+        by_fp.setdefault(fp, []).append(entry)
+    assert paths(library.groups.values()) == paths(g for g in by_fp.values() if len(g) > 1)
+    assert all(set(g.evidence) == {EVIDENCE_FINGERPRINT} for g in library.groups.values())
+
+
+def test_titles_alone_group_as_before():
+    rng = random.Random(7)
+    words = ["rain", "blue", "night", "intro", "live", "song"]
+    entries = [(info(f"/m/{k}.mp3", " ".join(rng.choice(words) for _ in range(rng.randint(1, 3)))), None)
+               for k in range(60)]
+    library = DuplicateLibrary()
+    library.build(entries)
+    assert paths(library.groups.values()) == paths(group_by_title_similarity([e for e, _ in entries]))
+
+
+def test_title_joins_acoustic_group_but_does_not_merge_two():
+    rng = random.Random(9)
+    a, b = encode_fingerprint(random_values(rng)), encode_fingerprint(random_values(rng))
+    entries = [(info("/m/a1.mp3", "Intro"), a), (info("/m/a2.mp3", "Intro"), a),
+               (info("/m/b1.mp3", "Intro"), b), (info("/m/b2.mp3", "Other"), b),
+               (info("/m/live.mp3", "Intro (Live)"), None)]
+    library = DuplicateLibrary()
+    library.build(entries, content_hashes={"/m/b1.mp3": "00" * 20, "/m/b2.mp3": "00" * 20})
+    groups = {tuple(f["path"] for f in g): g.evidence for g in library.groups.values()}
+    # Le live rejoint le premier groupe « Intro » ; les deux groupes établis restent séparés
+    assert groups == {
+        ("/m/a1.mp3", "/m/a2.mp3", "/m/live.mp3"): {EVIDENCE_FINGERPRINT: 1, EVIDENCE_TITLE: 2},
+        ("/m/b1.mp3", "/m/b2.mp3"): {EVIDENCE_FINGERPRINT: 1, EVIDENCE_CONTENT_HASH: 1},
+    }
+
+
+def test_short_fingerprint_is_confirmed_before_linking():
+    # Deux morceaux au même début : l'empreinte courte de l'un ressemble à toute empreinte de l'autre
+    rng = random.Random(12)
+    intro = random_values(rng, 60)
+    song, other = intro + random_values(rng, 300), intro + random_values(rng, 300)
+    short = encode_fingerprint(song[:60])
+    library = DuplicateLibrary()
+    library.build([(info("/m/song.mp3", "Northern lights"), short)],
+                  short_keys={fingerprint_key(pack_fingerprint(short))})
+    other_fp = encode_fingerprint(other)
+    assert library.short_neighbours([other_fp]) == {"/m/song.mp3"}
+    library.update({"/m/other.mp3": (info("/m/other.mp3", "Quiet harbour"), other_fp)})
+    assert not library.groups
+    # Empreinte complète (surveillance) : les deux morceaux restent séparés, une copie est reliée
+    library.update({"/m/song.mp3": (info("/m/song.mp3", "Northern lights"), encode_fingerprint(song)),
+                    "/m/copy.mp3": (info("/m/copy.mp3", "Paper moons"), encode_fingerprint(song))})
+    assert not library.short_keys
+    assert paths(library.groups.values()) == [["/m/copy.mp3", "/m/song.mp3"]]
@@ -0,0 +1,18 @@
+from scanner import _without_close_duration, passes_duration_filter
+
+
+def test_lonely_durations_are_skipped():
+    durations = {0: 100, 1: 101, 2: 300}
+    assert _without_close_duration(durations, [0, 1, 2], 0.95) == [2]
+
+
+def test_unknown_duration_is_never_skipped():
+    assert passes_duration_filter([{"duration": 300}, {"duration": 0}], 0.95)
+    assert _without_close_duration({0: 0}, [0], 0.95) == []
+    assert _without_close_duration({0: 100, 1: 0}, [1], 0.95) == []
+
+
+def test_unreadable_file_does_not_disable_prefilter():
+    # Un fichier illisible (durée inconnue) dans la bibliothèque : les autres restent filtrés
+    durations = {0: 100, 1: 101, 2: 300, 3: 0}
+    assert _without_close_duration(durations, [0, 1, 2], 0.95) == [2]
@@ -0,0 +1,79 @@
+import os
+import queue
+import sqlite3
+
+from fingerprint_index import SCHEMA_VERSION, FingerprintIndex
+from scanner import can_hold_fingerprint_tag, write_deferred_tags
+
+# Schéma de la version 2 (avant `tag_pending`)
+V2_SCHEMA = ("CREATE TABLE files (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+             " inode INTEGER NOT NULL, fingerprint TEXT, duration REAL, title TEXT, artist TEXT, album TEXT,"
+             " bitrate INTEGER, content_hash TEXT, short_fingerprint TEXT, short_length INTEGER)")
+
+
+def make_index(path, version, schema):
+    conn = sqlite3.connect(path)
+    conn.execute(schema)
+    conn.execute("INSERT INTO files (path, size, mtime_ns, inode, fingerprint, title) VALUES (?, ?, ?, ?, ?, ?)",
+                 ("song.mp3", 10, 20, 30, "AQAA", "Song"))
+    conn.execute(f"PRAGMA user_version={version}")
+    conn.commit()
+    conn.close()
+
+
+class FakeStat:
+    def __init__(self, size=10, mtime_ns=20, ino=30):
+        self.st_size, self.st_mtime_ns, self.st_ino = size, mtime_ns, ino
+
+
+def test_version_2_index_is_migrated_in_place(tmp_path):
+    db = str(tmp_path / "index.sqlite3")
+    make_index(db, 2, V2_SCHEMA)
+    with FingerprintIndex(db) as index:
+        cached = index.lookup("song.mp3", FakeStat())
+        assert cached["fingerprint"] == "AQAA" and cached["title"] == "Song"
+        assert cached["tag_pending"] is None
+    conn = sqlite3.connect(db)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    conn.close()
+
+
+def test_index_without_migration_is_recreated(tmp_path):
+    db = str(tmp_path / "index.sqlite3")
+    make_index(db, 1, "CREATE TABLE files (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+                      " inode INTEGER NOT NULL, fingerprint TEXT, duration REAL, title TEXT)")
+    with FingerprintIndex(db) as index:
+        assert index.lookup("song.mp3", FakeStat()) is None
+        index.store("song.mp3", FakeStat(), fingerprint="AQAA", tag_pending=True)
+        assert index.lookup("song.mp3", FakeStat())["tag_pending"] == 1
+
+
+def test_pending_tag_survives_until_written(tmp_path):
+    db = str(tmp_path / "index.sqlite3")
+    with FingerprintIndex(db) as index:
+        index.store("song.mp3", FakeStat(), fingerprint="AQAA", title="Song", tag_pending=True)
+    with FingerprintIndex(db) as index:
+        assert index.lookup("song.mp3", FakeStat())["tag_pending"] == 1
+        index.tag_written("song.mp3", FakeStat(mtime_ns=40))
+        assert index.lookup("song.mp3", FakeStat()) is None
+        cached = index.lookup("song.mp3", FakeStat(mtime_ns=40))
+        assert cached["tag_pending"] is None and cached["title"] == "Song"
+
+
+def test_failed_tag_write_is_not_retried(tmp_path):
+    assert can_hold_fingerprint_tag("Song.FLAC") and not can_hold_fingerprint_tag("song.wav")
+    path = str(tmp_path / "song.flac")
+    os.mkdir(path)  # illisible par mutagen : l'écriture échoue
+    with FingerprintIndex(str(tmp_path / "index.sqlite3")) as index:
+        index.store(path, FakeStat(), fingerprint="AQAA", title="Song", tag_pending=True)
+        write_deferred_tags([(path, "AQAA")], index, queue.Queue())
+        cached = index.lookup(path, FakeStat())
+        assert cached["fingerprint"] == "AQAA" and cached["tag_pending"] is None
+
+
+def test_content_hash_added_later_keeps_entry(tmp_path):
+    with FingerprintIndex(str(tmp_path / "index.sqlite3")) as index:
+        index.store("song.mp3", FakeStat(), fingerprint="AQAA", title="Song")
+        index.content_hashed("song.mp3", "ab" * 20)
+        cached = index.lookup("song.mp3", FakeStat())
+        assert cached["content_hash"] == "ab" * 20 and cached["fingerprint"] == "AQAA" and cached["title"] == "Song"
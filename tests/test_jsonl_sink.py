@@ -0,0 +1,42 @@
+import io
+import json
+
+from scanner import DuplicateGroup, JsonLinesSink
+
+
+def song(path, duration=200):
+    return {"path": path, "duration": duration}
+
+
+def records(out):
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_partial_groups_are_written_as_they_arrive():
+    out = io.StringIO()
+    sink = JsonLinesSink(out, quiet=True)
+    sink.put(("group_added", (b"\x01\x02", [song("a"), song("b")])))
+    assert records(out) == [{"key": "0102", "partial": True, "evidence": {}, "files": [song("a"), song("b")]}]
+    sink.put(("group_updated", (b"\x01\x02", [song("a"), song("b"), song("c")])))
+    sink.put(("group_removed", b"\x01\x02"))
+    sink.put(("results", [DuplicateGroup([song("a"), song("b")], ("fp", 0), {"fingerprint": 1})]))
+    lines = records(out)
+    assert [len(r["files"]) for r in lines] == [2, 3, 0, 2]
+    assert lines[-1] == {"key": ["fp", 0], "evidence": {"fingerprint": 1}, "files": [song("a"), song("b")]}
+    assert sink.groups == 1
+
+
+def test_final_only_and_duration_filter():
+    out = io.StringIO()
+    sink = JsonLinesSink(out, quiet=True, partial=False)
+    sink.put(("group_added", ("sha1:00", [song("a"), song("b")])))
+    assert out.getvalue() == ""
+
+    out = io.StringIO()
+    sink = JsonLinesSink(out, quiet=True, duration_tolerance=0.9)
+    sink.put(("group_added", ("sha1:00", [song("a", 100), song("b", 200)])))
+    sink.put(("group_removed", "sha1:00"))
+    assert out.getvalue() == ""
+    sink.put(("group_added", ("sha1:01", [song("a"), song("b")])))
+    sink.put(("group_updated", ("sha1:01", [song("a"), song("b"), song("c", 100)])))
+    assert [len(r["files"]) for r in records(out)] == [2, 0]
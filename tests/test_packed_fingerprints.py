@@ -0,0 +1,68 @@
+import random
+
+import numpy as np
+import pytest
+
+from acoustic_match import (decode_fingerprint, decode_packed, find_similar_pairs, pack_fingerprint,
+                            unpack_fingerprint)
+from fingerprints import encode_fingerprint, random_values
+from scanner import FileRecord, _packed, _unpacked, fingerprint_key
+
+
+def test_pack_round_trip_and_decode():
+    rng = random.Random(20)
+    for count in [0, 1, 2, 3, 50, 400]:
+        values = random_values(rng, count)
+        fp = encode_fingerprint(values)
+        packed = pack_fingerprint(fp)
+        assert isinstance(packed, bytes) and len(packed) <= len(fp)
+        assert unpack_fingerprint(packed) == fp
+        assert decode_packed(packed).tolist() == values
+        assert decode_fingerprint(fp).tolist() == values
+        assert decode_packed(packed).dtype == np.uint32
+
+
+def test_large_gaps_use_exception_values():
+    values = [1 << 31, 1, (1 << 31) | 1, 0]
+    assert decode_fingerprint(encode_fingerprint(values)).tolist() == values
+
+
+@pytest.mark.parametrize("data", [b"", b"\x01\x00", b"\x01\x00\x00\x05\x00"])
+def test_truncated_fingerprints_are_rejected(data):
+    with pytest.raises(ValueError):
+        decode_packed(data)
+
+
+def test_scanner_keeps_packed_fingerprints():
+    fp = encode_fingerprint(random_values(random.Random(1)))
+    packed = _packed(fp)
+    assert packed == pack_fingerprint(fp)
+    assert _packed(packed) is packed and _packed(None) is None
+    assert _unpacked(packed) == fp and _unpacked(fp) == fp
+    # Tag corrompu : la chaîne est gardée telle quelle
+    assert _packed("pas du base64 !") == "pas du base64 !"
+    assert fingerprint_key(packed) == fingerprint_key(pack_fingerprint(fp)) != fingerprint_key(b"other")
+
+
+def test_similar_pairs_same_for_strings_and_packed():
+    rng = random.Random(3)
+    songs = [random_values(rng, 300) for _ in range(4)]
+    fingerprints = []
+    for _ in range(12):
+        values = [v ^ (1 << rng.randrange(32)) if rng.random() < 0.05 else v for v in rng.choice(songs)]
+        fingerprints.append(encode_fingerprint(values))
+    fingerprints.append("not a fingerprint")
+    pairs = find_similar_pairs(fingerprints)
+    assert pairs
+    assert find_similar_pairs([_packed(fp) for fp in fingerprints]) == pairs
+
+
+def test_file_record_reads_like_a_dict():
+    info = {"path": "/m/a.mp3", "date": 1.5, "title": "Song", "artist": "A", "album": "B", "bitrate": 320,
+            "duration": 200.0}
+    record = FileRecord(**info)
+    assert dict(record) == info
+    assert record["title"] == "Song" and record.get("missing", 0) == 0 and "path" in record
+    assert record == FileRecord(**info) and record != FileRecord(**dict(info, bitrate=128))
+    with pytest.raises(KeyError):
+        record["missing"]
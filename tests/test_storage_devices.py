@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+from storage_devices import ReadAhead
+
+
+@pytest.mark.skipif(not hasattr(os, "posix_fadvise"), reason="lecture anticipée POSIX uniquement")
+def test_read_ahead_hands_over_its_descriptor(tmp_path, monkeypatch):
+    paths = []
+    for k in range(3):
+        path = tmp_path / f"{k}.bin"
+        path.write_bytes(bytes([k]) * 100)
+        paths.append(str(path))
+    opens = []
+    real_open = os.open
+    monkeypatch.setattr(os, "open", lambda *args, **kwargs: opens.append(args[0]) or real_open(*args, **kwargs))
+    ahead = ReadAhead(limit=2)
+    for path in paths:
+        ahead(path)
+    # Le plus ancien descripteur, au-delà de la limite, a été fermé : le fichier est rouvert
+    for k, path in enumerate(paths):
+        with ahead.open(path) as f:
+            assert f.name == path and f.read() == bytes([k]) * 100
+    assert opens == paths + paths[:1]
+    # Descripteur jamais repris : fermé par close, l'étape rouvre le fichier
+    ahead(paths[1])
+    ahead.close()
+    with ahead.open(paths[1]):
+        pass
+    assert opens[-2:] == [paths[1], paths[1]]
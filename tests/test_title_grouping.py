@@ -0,0 +1,70 @@
+import difflib
+import random
+
+import pytest
+
+from scanner import clean_title, group_by_title_similarity
+
+
+def pairwise_title_groups(file_infos, threshold=0.8):
+    """Implémentation de référence : comparaison de toutes les paires (version d'origine)."""
+    groups = []
+    used = set()
+    for i, f1 in enumerate(file_infos):
+        if i in used:
+            continue
+        group = [f1]
+        used.add(i)
+        title1 = clean_title(f1['title'])
+        for j, f2 in enumerate(file_infos):
+            if j <= i or j in used:
+                continue
+            title2 = clean_title(f2['title'])
+            if title1 and title2:
+                if difflib.SequenceMatcher(None, title1, title2).ratio() >= threshold:
+                    group.append(f2)
+                    used.add(j)
+        if len(group) > 1:
+            groups.append(group)
+    return groups
+
+
+WORDS = ["a", "b", "the", "in", "rain", "red", "blue", "dance", "love", "night", "intro", "live", "remix"]
+
+
+def random_library(rng, count):
+    infos = []
+    for k in range(count):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 5)))
+        if rng.random() < 0.1:
+            title += " (Live)"
+        if rng.random() < 0.05:
+            title = rng.choice(["N/A", "", "[Bonus]"])
+        infos.append({"path": f"/music/{k}.mp3", "title": title})
+    return infos
+
+
+def paths(groups):
+    return [[f["path"] for f in g] for g in groups]
+
+
+@pytest.mark.parametrize("threshold", [0.5, 0.6, 0.65, 0.7, 0.8, 0.9, 1.0])
+def test_same_groups_as_pairwise_comparison(threshold):
+    rng = random.Random(threshold)
+    for _ in range(60):
+        infos = random_library(rng, rng.randint(2, 40))
+        assert paths(group_by_title_similarity(infos, threshold)) == paths(pairwise_title_groups(infos, threshold))
+
+
+@pytest.mark.parametrize("title1, title2, threshold", [
+    ("a b dance a", "dance", 0.6),
+    ("b the in rain rain", "blue in rain red", 0.7),
+])
+def test_low_threshold_pairs_are_not_missed(title1, title2, threshold):
+    infos = [{"path": "1", "title": title1}, {"path": "2", "title": title2}]
+    assert paths(group_by_title_similarity(infos, threshold)) == [["1", "2"]]
+
+
+def test_missing_titles_are_not_grouped():
+    infos = [{"path": str(k), "title": t} for k, t in enumerate(["N/A", "N/A", "", "Song", "song (Live)"])]
+    assert paths(group_by_title_similarity(infos, 0.8)) == [["3", "4"]]
@@ -3,6 +3,9 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import tksheet
 from translations import translate
+from scanner import TAG_WRITE_OFF, TAG_WRITE_DEFERRED, TAG_WRITE_IMMEDIATE, SHORT_FINGERPRINT_LENGTH
+from acoustic_match import MIN_SUPPORTED_SIMILARITY
+from fingerprint_backend import BACKEND_AUTO, BACKEND_CHROMAPRINT, BACKEND_FPCALC
 
 from column_manager import ColumnManagerMixin
 from selection_mixin import SelectionMixin
@@ -32,6 +35,12 @@ class DuplicateMusicFinder(tk.Tk,
         self.filter_var = tk.StringVar()
         self.similarity_var = tk.IntVar(value=80)
         self.duration_similarity_var = tk.IntVar(value=95)
+        self.acoustic_similarity_var = tk.IntVar(value=85)
+        self.tag_write_policy = TAG_WRITE_IMMEDIATE  # peut être remplacé par la config
+        self.fingerprint_backend = BACKEND_AUTO  # moteur d'empreinte (config)
+        self.two_phase_fingerprint = True  # empreinte courte puis complète des seuls candidats (config)
+        self.short_fingerprint_length = SHORT_FINGERPRINT_LENGTH  # secondes de la passe courte (config)
+        self.watch_folders = False  # surveillance des dossiers après le scan (config)
         self.audio_player_path = None
 
         # Initialiser sous-systèmes
@@ -48,7 +57,7 @@ class DuplicateMusicFinder(tk.Tk,
         self._apply_language_texts()
 
         # Observers
-        self.filter_var.trace_add("write", lambda *_: self.redisplay_results())
+        self.filter_var.trace_add("write", lambda *_: self.schedule_filter())
 
         # Raccourcis globaux
         self.bind("<Control-e>", lambda e: self.select_rows_selection())
@@ -68,7 +77,34 @@ class DuplicateMusicFinder(tk.Tk,
                                           variable=self._highlight_var,
                                           onvalue=True, offvalue=False,
                                           command=self.toggle_highlight_differences)
+        # Sous-menu écriture des empreintes dans les tags
+        self.tag_write_var = tk.StringVar(value=self.tag_write_policy)
+        self.tag_write_menu = tk.Menu(self.options_menu, tearoff=0)
+        for policy, key in [(TAG_WRITE_OFF, 'menu.tag_write_off'), (TAG_WRITE_DEFERRED, 'menu.tag_write_deferred'),
+                            (TAG_WRITE_IMMEDIATE, 'menu.tag_write_immediate')]:
+            self.tag_write_menu.add_radiobutton(label=translate(self.language, key), value=policy, variable=self.tag_write_var,
+                                                command=lambda p=policy: self.set_tag_write_policy(p))
+        self.options_menu.add_cascade(label=translate(self.language, 'menu.tag_write'), menu=self.tag_write_menu)
+        # Sous-menu moteur d'empreinte
+        self.backend_var = tk.StringVar(value=self.fingerprint_backend)
+        self.backend_menu = tk.Menu(self.options_menu, tearoff=0)
+        for backend, key in [(BACKEND_AUTO, 'menu.backend_auto'), (BACKEND_CHROMAPRINT, 'menu.backend_chromaprint'),
+                             (BACKEND_FPCALC, 'menu.backend_fpcalc')]:
+            self.backend_menu.add_radiobutton(label=translate(self.language, key), value=backend, variable=self.backend_var,
+                                              command=lambda b=backend: self.set_fingerprint_backend(b))
+        self.options_menu.add_cascade(label=translate(self.language, 'menu.fingerprint_backend'), menu=self.backend_menu)
+        self._two_phase_var = tk.BooleanVar(value=self.two_phase_fingerprint)
+        self.options_menu.add_checkbutton(label=translate(self.language, 'menu.two_phase_fingerprint'),
+                                          variable=self._two_phase_var,
+                                          onvalue=True, offvalue=False,
+                                          command=lambda: self.set_two_phase_fingerprint(self._two_phase_var.get()))
+        self._watch_var = tk.BooleanVar(value=self.watch_folders)
+        self.options_menu.add_checkbutton(label=translate(self.language, 'menu.watch_folders'),
+                                          variable=self._watch_var,
+                                          onvalue=True, offvalue=False,
+                                          command=lambda: self.set_watch_folders(self._watch_var.get()))
         self.options_menu.add_separator()
+        self.options_menu.add_command(label=translate(self.language, 'menu.scan_summary'), command=self.show_scan_summary)
         self.options_menu.add_command(label=translate(self.language, 'menu.reset_columns'), command=self.reset_columns)
         # Sous-menu langue
         self.language_var = tk.StringVar(value=self.language)
@@ -79,6 +115,24 @@ class DuplicateMusicFinder(tk.Tk,
         self.options_menu.add_separator()
         self.options_menu.add_cascade(label=translate(self.language, 'menu.language'), menu=self.lang_menu)
 
+    def set_tag_write_policy(self, policy):
+        self.tag_write_policy = policy
+        self.save_column_config()
+
+    def set_fingerprint_backend(self, backend):
+        self.fingerprint_backend = backend
+        self.save_column_config()
+
+    def set_two_phase_fingerprint(self, enabled):
+        self.two_phase_fingerprint = bool(enabled)
+        self.save_column_config()
+
+    def set_watch_folders(self, enabled):
+        self.watch_folders = bool(enabled)
+        self.save_column_config()
+        if not self.watch_folders:
+            self.stop_watching()
+
     def _rebuild_menus(self):
         # Supprimer menubar et recréer
         try:
@@ -106,11 +160,16 @@ class DuplicateMusicFinder(tk.Tk,
         try:
             self.similarity_frame.config(text=translate(lang, 'ui.similarity_frame'))
             self.similarity_hint.config(text=translate(lang, 'ui.similarity_hint'))
+            self.acoustic_frame.config(text=translate(lang, 'ui.acoustic_frame'))
+            self.acoustic_hint.config(text=translate(lang, 'ui.acoustic_hint'))
             self.duration_frame.config(text=translate(lang, 'ui.duration_frame'))
             self.duration_hint.config(text=translate(lang, 'ui.duration_hint'))
         except Exception: pass
         try:
             self.scan_button.config(text=translate(lang, 'ui.scan'))
+            paused = self.scan_control is not None and self.scan_control.paused
+            self.pause_button.config(text=translate(lang, 'ui.resume' if paused else 'ui.pause'))
+            self.cancel_button.config(text=translate(lang, 'ui.cancel'))
         except Exception: pass
         try:
             self.filter_results_label.config(text=translate(lang, 'ui.filter_results'))
@@ -155,6 +214,11 @@ class DuplicateMusicFinder(tk.Tk,
         tk.Scale(self.similarity_frame, from_=50, to=100, orient="horizontal", variable=self.similarity_var, resolution=1).pack(anchor="w")
         self.similarity_hint = tk.Label(self.similarity_frame, text=translate(lang,'ui.similarity_hint'))
         self.similarity_hint.pack(anchor="w")
+        self.acoustic_frame = tk.LabelFrame(opt, text=translate(lang,'ui.acoustic_frame'))
+        self.acoustic_frame.pack(side="left", padx=5)
+        tk.Scale(self.acoustic_frame, from_=round(MIN_SUPPORTED_SIMILARITY * 100), to=100, orient="horizontal", variable=self.acoustic_similarity_var, resolution=1).pack(anchor="w")
+        self.acoustic_hint = tk.Label(self.acoustic_frame, text=translate(lang,'ui.acoustic_hint'))
+        self.acoustic_hint.pack(anchor="w")
         self.duration_frame = tk.LabelFrame(opt, text=translate(lang,'ui.duration_frame'))
         self.duration_frame.pack(side="left", padx=5)
         tk.Scale(self.duration_frame, from_=80, to=100, orient="horizontal", variable=self.duration_similarity_var, resolution=1,
@@ -163,6 +227,10 @@ class DuplicateMusicFinder(tk.Tk,
         self.duration_hint.pack(anchor="w")
         self.scan_button = tk.Button(opt, text=translate(lang,'ui.scan'), command=self.start_scan_thread)
         self.scan_button.pack(side="left", padx=20, ipady=8)
+        self.pause_button = tk.Button(opt, text=translate(lang,'ui.pause'), command=self.toggle_pause_scan, state='disabled')
+        self.pause_button.pack(side="left", padx=5, ipady=8)
+        self.cancel_button = tk.Button(opt, text=translate(lang,'ui.cancel'), command=self.cancel_scan, state='disabled')
+        self.cancel_button.pack(side="left", padx=5, ipady=8)
 
         # Progression
         pf = tk.Frame(self); pf.pack(fill="x", padx=10, pady=5)
@@ -206,6 +274,8 @@ class DuplicateMusicFinder(tk.Tk,
         self.sheet.bind("<space>", self._on_space_toggle)
         self.sheet.bind("<Control-i>", lambda e: self.invert_rows_selection())
         self.sheet.bind("<Control-g>", lambda e: self.toggle_current_group())
+        # Pagination : charger les groupes suivants quand le défilement approche de la fin des lignes chargées
+        self.sheet.bind("<<SheetRedrawn>>", self.load_visible_rows)
 
         self._apply_readonly_except_select()
 
@@ -262,8 +332,9 @@ class DuplicateMusicFinder(tk.Tk,
         self._set_dynamic_reference_from_row(row)
         # Ouvrir le fichier (comportement d’origine)
         try:
-            if row in self.row_to_path_map:
-                os.startfile(os.path.normpath(self.row_to_path_map[row]))
+            path = self.result_model.path(row)
+            if path:
+                os.startfile(os.path.normpath(path))
         except Exception as e:
             messagebox.showerror("Erreur", f"{translate(self.language,'msg.open_error')} {e}")
 
@@ -282,9 +353,10 @@ class DuplicateMusicFinder(tk.Tk,
         if col == self._select_column_index():
             self._toggle_checkbox(row)
             return "break"
-        if row in self.row_to_path_map:
+        path = self.result_model.path(row)
+        if path:
             try:
-                os.startfile(os.path.normpath(self.row_to_path_map[row]))
+                os.startfile(os.path.normpath(path))
             except Exception as e:
                 messagebox.showerror("Erreur", f"{translate(self.language,'msg.open_error')} {e}")
         return "break"
@@ -302,7 +374,8 @@ class DuplicateMusicFinder(tk.Tk,
             except Exception:
                 pass
         for r in selected:
-            self._set_checkbox(r, not self.checkbox_states.get(r, False))
+            self._set_checkbox(r, not self._is_checked(r), redraw=False)
+        self._redraw_sheet()
         self.update_delete_button()
         return "break"
 
@@ -339,12 +412,12 @@ class DuplicateMusicFinder(tk.Tk,
         menu.add_command(label=translate(lang,'ctx.uncheck_row'), command=lambda: self._set_row_checkbox(row, False))
         menu.add_separator()
         menu.add_command(label=translate(lang,'ctx.invert_selection'), command=self.invert_rows_selection)
-        if "group" in self.visible_columns and row is not None:
+        if row is not None and 0 <= row < len(self.result_model):
             try:
-                g_val = self.sheet.get_cell_data(row, self.visible_columns.index("group"))
+                gi = self.result_model.row_group[row]
                 menu.add_separator()
-                menu.add_command(label=translate(lang,'ctx.check_group'), command=lambda gv=g_val: self._set_group_checkbox(gv, True))
-                menu.add_command(label=translate(lang,'ctx.uncheck_group'), command=lambda gv=g_val: self._set_group_checkbox(gv, False))
+                menu.add_command(label=translate(lang,'ctx.check_group'), command=lambda g=gi: self._set_group_checkbox(g, True))
+                menu.add_command(label=translate(lang,'ctx.uncheck_group'), command=lambda g=gi: self._set_group_checkbox(g, False))
                 menu.add_command(label=translate(lang,'ctx.toggle_group'), command=self.toggle_current_group)
             except Exception:
                 pass